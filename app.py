@@ -5,12 +5,17 @@ Aplicação modular com predição de produtividade, leite e detecção de gado
 
 import streamlit as st
 import os
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from dotenv import load_dotenv
 
-# Imports dos módulos
+# Imports dos módulos (leves). Os pesados - LangChain/httpx (chat), scikit-learn
+# (treino), statsmodels (leite), OpenCV/ultralytics (gado) - são importados
+# só quando a funcionalidade é usada; veja benchmarks/inicio_app.py
 from modules.agente_roi import AgenteROI
-from modules.agente_chat import AgenteChat
+from modules.cache_respostas import cache_padrao
+from modules.instrumentacao import configurar_por_ambiente, span
 from modules.simulador import carregar_dados, ModeloML, traduzir, original, MAPA
 from modules.predicao_leite import show_milk_prediction
 from modules.deteccao_gado import show_cattle_detection
@@ -22,6 +27,7 @@ MODELS_DIR = BASE_DIR / "models"
 CONFIG_DIR = BASE_DIR / "config"
 
 load_dotenv(CONFIG_DIR / ".env")
+configurar_por_ambiente()  # SIA_METRICAS/SIA_PERFIL_* definidos no .env
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL = "llama-3.3-70b-versatile"
@@ -109,121 +115,167 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# ==================== FUNÇÃO PRINCIPAL ====================
-def main():
-    """Aplicação principal"""
-    
-    # Título visível
-    st.markdown("""
-    <div class="main-title">
-        <h1>🌾 SIA - Sistema Inteligente Agronômico</h1>
-        <p>Predição de Produtividade com Inteligência Artificial</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # Carregar dados
-    df = carregar_dados(DATASET_PATH)
-    
-    # Treinar modelo (silencioso)
+# ==================== INICIALIZAÇÃO SOB DEMANDA ====================
+def obter_modelo(df):
+    """Treina o Random Forest na primeira simulação da sessão (não na abertura do app)"""
     if 'modelo_ml' not in st.session_state:
-        st.session_state.modelo_ml = ModeloML(df)
-        st.session_state.modelo_ml.treinar()
-    
-    simulador = st.session_state.modelo_ml
-    
-    # Inicializar agente chat
+        with st.spinner("🔄 Treinando modelo..."):
+            modelo = ModeloML(df)
+            modelo.treinar()
+        st.session_state.modelo_ml = modelo
+    return st.session_state.modelo_ml
+
+def obter_agente_chat():
+    """Cria o agente de chat (LangChain + cliente HTTP) na primeira pergunta"""
     if 'agente_chat' not in st.session_state:
+        from modules.agente_chat import AgenteChat
         st.session_state.agente_chat = AgenteChat(GROQ_API_KEY, GROQ_MODEL)
-    
-    agente = st.session_state.agente_chat
-    
-    # ==================== SIDEBAR: CHAT ====================
-    with st.sidebar:
+    return st.session_state.agente_chat
+
+def opcoes_simulador(df):
+    """Opções traduzidas e limites dos sliders, calculados uma vez por sessão"""
+    if 'opcoes_simulador' not in st.session_state:
+        def limites(coluna):
+            return int(df[coluna].min()), int(df[coluna].max()), int(df[coluna].mean())
+        
+        st.session_state.opcoes_simulador = {
+            'regiao': traduzir(df['Region'].unique()),
+            'solo': traduzir(df['Soil_Type'].unique()),
+            'clima': traduzir(df['Weather_Condition'].unique()),
+            'cultura': traduzir(df['Crop'].unique()),
+            'chuva': limites('Rainfall_mm'),
+            'temperatura': limites('Temperature_Celsius'),
+            'dias': limites('Days_to_Harvest')
+        }
+    return st.session_state.opcoes_simulador
+
+# ==================== MEDIÇÃO DE RERUNS ====================
+@contextmanager
+def medir_secao(nome):
+    """Guarda em st.session_state.tempos_secoes o tempo da última execução de cada seção"""
+    t0 = time.perf_counter()
+    try:
+        with span('app_secao', perfilavel=True, secao=nome):
+            yield
+    finally:
+        if 'tempos_secoes' not in st.session_state:
+            st.session_state.tempos_secoes = {}
+        st.session_state.tempos_secoes[nome] = time.perf_counter() - t0
+
+# ==================== SIDEBAR: CHAT ====================
+def limpar_chat():
+    """Callback do botão Limpar"""
+    st.session_state.chat_history = []
+
+# Cada seção é um fragmento: interagir com ela reexecuta só a própria função,
+# não o app inteiro (benchmarks/reruns_app.py mede a diferença)
+@st.fragment
+def chat_sidebar():
+    """Chat IA na barra lateral"""
+    with medir_secao('chat'):
         st.markdown("### 💬 Chat IA")
         
         if not GROQ_API_KEY or GROQ_API_KEY == "your_groq_api_key_here":
             st.warning("⚠️ Configure GROQ_API_KEY")
-        else:
-            # Mostrar dados disponíveis
-            if 'contexto_json' in st.session_state and st.session_state.contexto_json:
-                ctx = st.session_state.contexto_json
-                
-                dados_disponiveis = []
-                if 'simulacao' in ctx:
-                    dados_disponiveis.append("🌾 Simulador")
-                if 'predicao_leite' in ctx:
-                    dados_disponiveis.append("🥛 Leite")
-                if 'deteccao_gado' in ctx:
-                    dados_disponiveis.append("🐄 Gado")
-                
-                if dados_disponiveis:
-                    st.success("✅ Dados: " + " | ".join(dados_disponiveis))
+            return
+        
+        # Mostrar dados disponíveis
+        if 'contexto_json' in st.session_state and st.session_state.contexto_json:
+            ctx = st.session_state.contexto_json
             
-            # Histórico
-            if 'chat_history' not in st.session_state:
-                st.session_state.chat_history = []
+            dados_disponiveis = []
+            if 'simulacao' in ctx:
+                dados_disponiveis.append("🌾 Simulador")
+            if 'predicao_leite' in ctx:
+                dados_disponiveis.append("🥛 Leite")
+            if 'deteccao_gado' in ctx:
+                dados_disponiveis.append("🐄 Gado")
             
-            chat_container = st.container(height=400)
+            if dados_disponiveis:
+                st.success("✅ Dados: " + " | ".join(dados_disponiveis))
+        
+        # Histórico
+        if 'chat_history' not in st.session_state:
+            st.session_state.chat_history = []
+        
+        chat_container = st.container(height=400)
+        
+        with chat_container:
+            for msg in st.session_state.chat_history:
+                with st.chat_message(msg["role"]):
+                    st.markdown(msg["content"])
+                    lat = msg.get("latencia")
+                    if lat and lat['origem'] == "llm":
+                        tam = msg.get("prompt") or {}
+                        st.caption(f"⏱️ 1º token {lat['ttft_s']:.2f}s · total {lat['total_s']:.2f}s"
+                                   f" · ~{tam.get('tokens_total', 0)} tokens")
+        
+        # Input
+        if prompt := st.chat_input("Pergunte..."):
+            st.session_state.chat_history.append({"role": "user", "content": prompt})
+            agente = obter_agente_chat()
             
-            with chat_container:
-                for msg in st.session_state.chat_history:
-                    with st.chat_message(msg["role"]):
-                        st.markdown(msg["content"])
+            contexto = st.session_state.get('contexto_json', None)
             
-            # Input
-            if prompt := st.chat_input("Pergunte..."):
-                st.session_state.chat_history.append({"role": "user", "content": prompt})
-                
-                contexto = st.session_state.get('contexto_json', None)
-                
-                with st.spinner("⚡ Processando..."):
-                    resposta = agente.responder(prompt, contexto)
-                
-                st.session_state.chat_history.append({"role": "assistant", "content": resposta})
-                st.rerun()
+            # Mostra a resposta conforme os tokens chegam (sem esperar a resposta inteira);
+            # ela já fica na tela, então não é preciso rerun para exibi-la
+            with chat_container:
+                with st.chat_message("user"):
+                    st.markdown(prompt)
+                with st.chat_message("assistant"):
+                    area_resposta = st.empty()
+                    resposta = ""
+                    historico = st.session_state.chat_history[:-1]
+                    for pedaco in agente.responder_stream(prompt, contexto, historico):
+                        resposta += pedaco
+                        area_resposta.markdown(resposta + "▌")
+                    area_resposta.markdown(resposta)
             
-            if st.button("🗑️ Limpar", use_container_width=True):
-                st.session_state.chat_history = []
-                st.rerun()
-    
-    # ==================== ABAS PRINCIPAIS ====================
-    tab1, tab2, tab3 = st.tabs([
-        "🌾 Simulador de Produtividade", 
-        "🥛 Predição de Leite",
-        "🐄 Detecção de Gado"
-    ])
-    
-    # ==================== ABA 1: SIMULADOR ====================
-    with tab1:
+            st.session_state.chat_history.append({
+                "role": "assistant", "content": resposta,
+                "latencia": agente.ultima_latencia, "prompt": agente.ultimo_prompt
+            })
+        
+        # Callback roda antes do fragmento: o histórico já sai limpo, sem rerun extra
+        st.button("🗑️ Limpar", use_container_width=True, on_click=limpar_chat)
+        
+        cache = cache_padrao()
+        est = cache.estatisticas
+        hits = est['hits_memoria'] + est['hits_disco']
+        st.caption(f"⚡ Cache: {hits} acertos, {est['misses']} chamadas ao Groq ({cache.taxa_acerto():.0%})")
+
+# ==================== ABA 1: SIMULADOR ====================
+@st.fragment
+def aba_simulador(df):
+    """Formulário do simulador; o último resultado é servido do estado"""
+    with medir_secao('simulador'):
+        opcoes = opcoes_simulador(df)
+        
         with st.form("form_simulador"):
             col1, col2, col3 = st.columns(3)
             
             with col1:
                 st.markdown("#### 🌍 Localização e Solo")
-                opcoes_regiao = traduzir(df['Region'].unique())
-                region_selecionada = st.selectbox("Região:", opcoes_regiao)
+                region_selecionada = st.selectbox("Região:", opcoes['regiao'])
                 region = original(region_selecionada)
                 
-                opcoes_solo = traduzir(df['Soil_Type'].unique())
-                solo_selecionado = st.selectbox("Tipo de Solo:", opcoes_solo)
+                solo_selecionado = st.selectbox("Tipo de Solo:", opcoes['solo'])
                 soil_type = original(solo_selecionado)
                 
-                opcoes_clima = traduzir(df['Weather_Condition'].unique())
-                clima_selecionado = st.selectbox("Condição Climática:", opcoes_clima)
+                clima_selecionado = st.selectbox("Condição Climática:", opcoes['clima'])
                 weather = original(clima_selecionado)
             
             with col2:
                 st.markdown("#### 🌾 Cultura e Ambiente")
-                opcoes_cultura = traduzir(df['Crop'].unique())
-                cultura_selecionada = st.selectbox("Cultura:", opcoes_cultura)
+                cultura_selecionada = st.selectbox("Cultura:", opcoes['cultura'])
                 crop = original(cultura_selecionada)
                 
-                rainfall = st.slider("Precipitação (mm):", int(df['Rainfall_mm'].min()), int(df['Rainfall_mm'].max()), int(df['Rainfall_mm'].mean()))
-                temperature = st.slider("Temperatura (°C):", int(df['Temperature_Celsius'].min()), int(df['Temperature_Celsius'].max()), int(df['Temperature_Celsius'].mean()))
+                rainfall = st.slider("Precipitação (mm):", *opcoes['chuva'])
+                temperature = st.slider("Temperatura (°C):", *opcoes['temperatura'])
             
             with col3:
                 st.markdown("#### ⏱️ Práticas Agrícolas")
-                days_harvest = st.slider("Dias até Colheita:", int(df['Days_to_Harvest'].min()), int(df['Days_to_Harvest'].max()), int(df['Days_to_Harvest'].mean()))
+                days_harvest = st.slider("Dias até Colheita:", *opcoes['dias'])
                 
                 col_fert, col_irrig = st.columns(2)
                 with col_fert:
@@ -240,6 +292,7 @@ def main():
                 'Fertilizer_Used': fertilizer, 'Irrigation_Used': irrigation
             }
             
+            simulador = obter_modelo(df)
             resultado = simulador.predizer(input_data)
             
             if 'error' in resultado:
@@ -270,59 +323,111 @@ def main():
                     'roi': roi_analise
                 }
                 
-                prediction = resultado['prediction']
-                percentile = resultado['percentile']
-                
-                # Status visual
-                if percentile < 25:
-                    status, color, bg = "🔴 Baixo", "#D32F2F", "linear-gradient(135deg, #FFCDD2 0%, #EF9A9A 100%)"
-                elif percentile < 50:
-                    status, color, bg = "🟠 Moderado", "#F57C00", "linear-gradient(135deg, #FFE0B2 0%, #FFCC80 100%)"
-                elif percentile < 75:
-                    status, color, bg = "🟡 Bom", "#FBC02D", "linear-gradient(135deg, #FFF9C4 0%, #FFF59D 100%)"
-                else:
-                    status, color, bg = "🟢 Excelente", "#388E3C", "linear-gradient(135deg, #C8E6C9 0%, #A5D6A7 100%)"
-                
-                st.markdown(f"""
-                <div class="result-card" style="background: {bg}; border: 3px solid {color};">
-                    <p class="result-value" style="color: {color};">🎯 {prediction:.2f} t/ha</p>
-                    <p class="result-label" style="color: {color};">{status} - Percentil {percentile:.0f}º</p>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                # Métricas ROI
-                st.markdown("---")
-                st.markdown("### 💰 Análise Financeira")
-                
-                fin = roi_analise['financeiro']
-                
-                col_a, col_b, col_c, col_d = st.columns(4)
-                
-                with col_a:
-                    st.metric("💵 Receita", f"R$ {fin['receita_bruta']:,.0f}")
-                with col_b:
-                    st.metric("💸 Custo", f"R$ {fin['custo_total']:,.0f}")
-                with col_c:
-                    st.metric("💚 Lucro", f"R$ {fin['lucro_liquido']:,.0f}")
-                with col_d:
-                    st.metric("📊 ROI", f"{fin['roi_percentual']:.1f}%")
-                
-                # Recomendação
-                rec_color = "#C8E6C9" if fin['roi_percentual'] > 0 else "#FFCDD2"
-                st.markdown(f"""
-                <div style="background: {rec_color}; padding: 15px; border-radius: 10px; margin-top: 15px;">
-                    <h4 style="margin: 0 0 10px 0;">🤖 Recomendação:</h4>
-                    <p style="margin: 0; color: #333;">{roi_analise['recomendacao']}</p>
-                </div>
-                """, unsafe_allow_html=True)
+                st.session_state.resultado_simulacao = {
+                    'prediction': resultado['prediction'],
+                    'percentile': resultado['percentile'],
+                    'roi': roi_analise
+                }
+        
+        if 'resultado_simulacao' in st.session_state:
+            mostrar_simulacao(st.session_state.resultado_simulacao)
+
+def mostrar_simulacao(resultado):
+    """Cartão de produtividade e análise financeira da última simulação"""
+    prediction = resultado['prediction']
+    percentile = resultado['percentile']
+    roi_analise = resultado['roi']
     
-    # ==================== ABA 2: LEITE ====================
-    with tab2:
+    # Status visual
+    if percentile < 25:
+        status, color, bg = "🔴 Baixo", "#D32F2F", "linear-gradient(135deg, #FFCDD2 0%, #EF9A9A 100%)"
+    elif percentile < 50:
+        status, color, bg = "🟠 Moderado", "#F57C00", "linear-gradient(135deg, #FFE0B2 0%, #FFCC80 100%)"
+    elif percentile < 75:
+        status, color, bg = "🟡 Bom", "#FBC02D", "linear-gradient(135deg, #FFF9C4 0%, #FFF59D 100%)"
+    else:
+        status, color, bg = "🟢 Excelente", "#388E3C", "linear-gradient(135deg, #C8E6C9 0%, #A5D6A7 100%)"
+    
+    st.markdown(f"""
+    <div class="result-card" style="background: {bg}; border: 3px solid {color};">
+        <p class="result-value" style="color: {color};">🎯 {prediction:.2f} t/ha</p>
+        <p class="result-label" style="color: {color};">{status} - Percentil {percentile:.0f}º</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Métricas ROI
+    st.markdown("---")
+    st.markdown("### 💰 Análise Financeira")
+    
+    fin = roi_analise['financeiro']
+    
+    col_a, col_b, col_c, col_d = st.columns(4)
+    
+    with col_a:
+        st.metric("💵 Receita", f"R$ {fin['receita_bruta']:,.0f}")
+    with col_b:
+        st.metric("💸 Custo", f"R$ {fin['custo_total']:,.0f}")
+    with col_c:
+        st.metric("💚 Lucro", f"R$ {fin['lucro_liquido']:,.0f}")
+    with col_d:
+        st.metric("📊 ROI", f"{fin['roi_percentual']:.1f}%")
+    
+    # Recomendação
+    rec_color = "#C8E6C9" if fin['roi_percentual'] > 0 else "#FFCDD2"
+    st.markdown(f"""
+    <div style="background: {rec_color}; padding: 15px; border-radius: 10px; margin-top: 15px;">
+        <h4 style="margin: 0 0 10px 0;">🤖 Recomendação:</h4>
+        <p style="margin: 0; color: #333;">{roi_analise['recomendacao']}</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+# ==================== ABAS 2 E 3: LEITE E GADO ====================
+@st.fragment
+def aba_leite():
+    """Aba de predição de leite (SARIMAX)"""
+    with medir_secao('leite'):
         show_milk_prediction()
+
+@st.fragment
+def aba_gado():
+    """Aba de detecção de gado (YOLO)"""
+    with medir_secao('gado'):
+        show_cattle_detection(YOLO_MODEL_PATH)
+
+# ==================== FUNÇÃO PRINCIPAL ====================
+def main():
+    """Aplicação principal"""
+    
+    # Título visível
+    st.markdown("""
+    <div class="main-title">
+        <h1>🌾 SIA - Sistema Inteligente Agronômico</h1>
+        <p>Predição de Produtividade com Inteligência Artificial</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Carregar dados
+    df = carregar_dados(DATASET_PATH)
+    
+    with st.sidebar:
+        chat_sidebar()
+    
+    # ==================== ABAS PRINCIPAIS ====================
+    tab1, tab2, tab3 = st.tabs([
+        "🌾 Simulador de Produtividade", 
+        "🥛 Predição de Leite",
+        "🐄 Detecção de Gado"
+    ])
+    
+    with tab1:
+        aba_simulador(df)
+    
+    with tab2:
+        aba_leite()
     
-    # ==================== ABA 3: GADO ====================
     with tab3:
-        show_cattle_detection(YOLO_MODEL_PATH)
+        aba_gado()
 
 if __name__ == "__main__":
-    main()
+    with medir_secao('app'):
+        main()
@@ -0,0 +1 @@
+# Benchmarks do SIA - Sistema Inteligente Agronômico
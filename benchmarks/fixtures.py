@@ -0,0 +1,112 @@
+"""
+Dados Sintéticos para Benchmarks
+Gera arquivos no mesmo formato dos dados reais, sem depender de downloads
+"""
+
+import numpy as np
+import pandas as pd
+
+REGIOES = ['North', 'South', 'East', 'West']
+SOLOS = ['Clay', 'Sandy', 'Loam', 'Silt']
+CULTURAS = ['Rice', 'Wheat', 'Maize', 'Barley', 'Soybean', 'Cotton']
+CLIMAS = ['Sunny', 'Rainy', 'Cloudy']
+
+
+def gerar_crop_yield(caminho, linhas=2000, seed=42):
+    """CSV no formato do crop_yield.csv (Kaggle) com produtividade correlacionada às entradas"""
+    rng = np.random.default_rng(seed)
+    chuva = rng.uniform(100, 1000, linhas)
+    temperatura = rng.uniform(15, 40, linhas)
+    fertilizante = rng.random(linhas) < 0.5
+    irrigacao = rng.random(linhas) < 0.5
+    dias = rng.integers(60, 150, linhas)
+
+    producao = (1.5 + chuva * 0.004 + fertilizante * 1.5 + irrigacao * 1.2
+                - np.abs(temperatura - 27) * 0.03 + rng.normal(0, 0.5, linhas))
+
+    df = pd.DataFrame({
+        'Region': rng.choice(REGIOES, linhas),
+        'Soil_Type': rng.choice(SOLOS, linhas),
+        'Crop': rng.choice(CULTURAS, linhas),
+        'Rainfall_mm': chuva.round(2),
+        'Temperature_Celsius': temperatura.round(2),
+        'Fertilizer_Used': fertilizante,
+        'Irrigation_Used': irrigacao,
+        'Weather_Condition': rng.choice(CLIMAS, linhas),
+        'Days_to_Harvest': dias,
+        'Yield_tons_per_hectare': producao.clip(0.1).round(3)
+    })
+    df.to_csv(caminho, index=False)
+    return caminho
+
+
+def gerar_serie_leite(caminho, meses=168, seed=42):
+    """CSV de uma coluna, sem cabeçalho (formato do upload da aba de leite): tendência + sazonalidade"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(meses)
+    producao = 620 + 0.8 * t + 60 * np.sin(2 * np.pi * t / 12) + rng.normal(0, 8, meses)
+    pd.Series(producao.round(1)).to_csv(caminho, index=False, header=False)
+    return caminho
+
+
+def gerar_video_blobs(caminho, frames=90, largura=320, altura=240, blobs=4, fps=30, seed=42):
+    """MP4 curto com elipses claras se movendo sobre fundo escuro (stand-in de vacas no pasto)"""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    posicoes = rng.uniform([20, 20], [largura - 20, altura - 20], (blobs, 2))
+    velocidades = rng.uniform(-3, 3, (blobs, 2))
+    writer = cv2.VideoWriter(str(caminho), cv2.VideoWriter_fourcc(*'mp4v'), fps, (largura, altura))
+    try:
+        for _ in range(frames):
+            img = np.full((altura, largura, 3), (30, 70, 30), dtype=np.uint8)
+            for x, y in posicoes:
+                cv2.ellipse(img, (int(x), int(y)), (14, 9), 0, 0, 360, (235, 235, 235), -1)
+            writer.write(img)
+            posicoes += velocidades
+            # Rebate nas bordas
+            for eixo, limite in ((0, largura), (1, altura)):
+                fora = (posicoes[:, eixo] < 15) | (posicoes[:, eixo] > limite - 15)
+                velocidades[fora, eixo] *= -1
+    finally:
+        writer.release()
+    return caminho
+
+
+class _Caixa:
+    """Mesma interface de ultralytics Boxes usada por motor_deteccao.detectar_frame"""
+
+    def __init__(self, x1, y1, x2, y2, conf):
+        self.xyxy = np.array([[x1, y1, x2, y2]], dtype=np.float32)
+        self.conf = np.array(conf, dtype=np.float32)
+        self.cls = np.array(0)
+
+
+class _Resultado:
+    names = {0: 'cow'}
+
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class ModeloBlobs:
+    """
+    Detector minúsculo (limiar + componentes conexos) com a interface de chamada do YOLO
+
+    Mede o custo do laço de detecção (decodificar, desenhar, codificar) sem torch;
+    para medir a inferência real, passe um .pt ao benchmark.
+    """
+
+    def __init__(self, limiar=200, area_minima=40):
+        self.limiar = limiar
+        self.area_minima = area_minima
+
+    def __call__(self, img, verbose=False):
+        import cv2
+
+        cinza = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        _, mascara = cv2.threshold(cinza, self.limiar, 255, cv2.THRESH_BINARY)
+        n, _, stats, _ = cv2.connectedComponentsWithStats(mascara)
+        caixas = [_Caixa(x, y, x + w, y + h, 0.9)
+                  for x, y, w, h, area in stats[1:n] if area >= self.area_minima]
+        return [_Resultado(caixas)]
@@ -0,0 +1,151 @@
+"""
+Benchmark de Inicialização do SIA
+Mede o custo de importação de cada módulo e o tempo até a primeira renderização do app
+
+Uso:
+    python -m benchmarks.inicio_app
+    python -m benchmarks.inicio_app --repeticoes 5 --saida inicio.json
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.fixtures import gerar_crop_yield
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# Bibliotecas pesadas e módulos do SIA, cada um importado em um interpretador limpo
+MODULOS = [
+    'streamlit', 'pandas', 'numpy', 'matplotlib.pyplot', 'sklearn.ensemble',
+    'statsmodels.tsa.statespace.sarimax', 'cv2', 'ultralytics', 'langchain_core', 'httpx',
+    'modules.agente_roi', 'modules.simulador', 'modules.predicao_leite', 'modules.deteccao_gado',
+    'modules.agente_chat', 'modules.motor_deteccao'
+]
+
+# Executado em subprocesso: AppTest roda o app.py como uma sessão nova do Streamlit
+_SCRIPT_RENDER = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=300)
+t0 = time.perf_counter()
+at.run()
+primeira = time.perf_counter() - t0
+t0 = time.perf_counter()
+at.run()
+segunda = time.perf_counter() - t0
+mods = sorted(m for m in sys.modules if m.split('.')[0] in
+              ('sklearn', 'statsmodels', 'cv2', 'ultralytics', 'torch', 'langchain_core', 'httpx'))
+print(json.dumps({'primeira_s': primeira, 'rerun_s': segunda, 'excecoes': len(at.exception),
+                  'pesados_carregados': sorted({m.split('.')[0] for m in mods})}))
+"""
+
+
+def custo_importacao(modulo):
+    """
+    Importa `modulo` com `python -X importtime` em um interpretador limpo
+
+    Returns:
+        dict com tempo cumulativo (ms) e os submódulos mais caros, ou None se falhar
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+                          cwd=RAIZ, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None
+
+    total_us = 0
+    proprios = []
+    for linha in proc.stderr.splitlines():
+        if not linha.startswith("import time:") or "|" not in linha:
+            continue
+        partes = linha[len("import time:"):].split("|")
+        try:
+            proprio, cumulativo = int(partes[0]), int(partes[1])
+        except ValueError:
+            continue  # cabeçalho
+        nome = partes[2].strip()
+        proprios.append((proprio, nome))
+        if nome == modulo:
+            total_us = cumulativo
+
+    proprios.sort(reverse=True)
+    return {
+        'total_ms': round(total_us / 1000, 1),
+        'mais_caros': [{'modulo': n, 'proprio_ms': round(p / 1000, 1)} for p, n in proprios[:5]]
+    }
+
+
+def _copiar_app(destino):
+    """Cópia do app com um crop_yield.csv sintético (o dataset real não é versionado)"""
+    shutil.copy(RAIZ / "app.py", destino / "app.py")
+    shutil.copytree(RAIZ / "modules", destino / "modules",
+                    ignore=shutil.ignore_patterns("__pycache__"))
+    (destino / "data").mkdir()
+    gerar_crop_yield(destino / "data" / "crop_yield.csv")
+    return destino / "app.py"
+
+
+def tempo_primeira_renderizacao(repeticoes=3):
+    """Roda o app `repeticoes` vezes em processos novos; mede 1ª renderização e rerun"""
+    execucoes = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        app = _copiar_app(Path(temp_dir))
+        for _ in range(repeticoes):
+            t0 = time.perf_counter()
+            proc = subprocess.run([sys.executable, "-c", _SCRIPT_RENDER, str(app)],
+                                  cwd=temp_dir, capture_output=True, text=True)
+            processo_s = time.perf_counter() - t0
+            if proc.returncode != 0:
+                raise RuntimeError(proc.stderr[-2000:])
+            resultado = json.loads(proc.stdout.strip().splitlines()[-1])
+            resultado['processo_s'] = processo_s
+            execucoes.append(resultado)
+
+    return {
+        'primeira_renderizacao_s': round(statistics.median(e['primeira_s'] for e in execucoes), 3),
+        'rerun_s': round(statistics.median(e['rerun_s'] for e in execucoes), 3),
+        'processo_total_s': round(statistics.median(e['processo_s'] for e in execucoes), 3),
+        'excecoes': max(e['excecoes'] for e in execucoes),
+        'pesados_carregados': execucoes[-1]['pesados_carregados'],
+        'repeticoes': repeticoes
+    }
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    parser = argparse.ArgumentParser(description="Custo de importação e tempo até a primeira renderização")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções do app (mediana)")
+    parser.add_argument("--sem-render", action="store_true", help="Só o relatório de importação")
+    parser.add_argument("--saida", help="Grava o resultado em JSON")
+    args = parser.parse_args(argv)
+
+    resultado = {'python': platform.python_version(), 'importacao': {}}
+
+    print(f"{'Módulo':45s} {'Importação (ms)':>16s}")
+    for modulo in MODULOS:
+        custo = custo_importacao(modulo)
+        resultado['importacao'][modulo] = custo
+        print(f"{modulo:45s} {custo['total_ms'] if custo else 'indisponível':>16}")
+
+    if not args.sem_render:
+        render = tempo_primeira_renderizacao(args.repeticoes)
+        resultado['inicio_app'] = render
+        print(f"\n🚀 Primeira renderização: {render['primeira_renderizacao_s']}s "
+              f"(rerun {render['rerun_s']}s, processo {render['processo_total_s']}s)")
+        print(f"📦 Bibliotecas pesadas carregadas na abertura: {render['pesados_carregados'] or 'nenhuma'}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Benchmark de Reruns do SIA
+Mede a latência de cada interação (simular, perguntar ao LLM no chat, limpar o chat)
+
+O AppTest sempre reexecuta o script inteiro, então o tempo de parede de cada
+interação é o custo do desenho antigo (st.rerun() do app todo). O app grava em
+st.session_state.tempos_secoes quanto cada seção levou; com fragmentos, só a
+seção da interação é reexecutada no navegador, e esse é o custo novo.
+
+Uso:
+    python -m benchmarks.reruns_app
+    python -m benchmarks.reruns_app --ref 422f223 --saida reruns.json   # compara com outra versão
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.fixtures import gerar_crop_yield
+from benchmarks.inicio_app import RAIZ, _copiar_app
+
+# (nome, seção do app que a interação reexecuta)
+INTERACOES = [('abertura', 'app'), ('simular', 'simulador'), ('simular_de_novo', 'simulador'),
+              ('perguntar', 'chat'), ('limpar_chat', 'chat')]
+
+# Executado em subprocesso, com um servidor LLM falso no lugar do Groq
+_SCRIPT_INTERACOES = """
+import json, os, sys, time
+from streamlit.testing.v1 import AppTest
+from modules.servidor_llm_falso import ServidorLLMFalso
+
+servidor = ServidorLLMFalso(atraso=0.05, atraso_token=0.0)
+servidor.iniciar_em_thread()
+os.environ['GROQ_BASE_URL'] = servidor.url
+
+at = AppTest.from_file(sys.argv[1], default_timeout=300)
+medidas = {}
+
+def medir(nome, acao):
+    requisicoes = servidor.requisicoes
+    t0 = time.perf_counter()
+    acao()
+    total = time.perf_counter() - t0
+    tempos = dict(at.session_state['tempos_secoes']) if 'tempos_secoes' in at.session_state else {}
+    medidas[nome] = {'script_s': total, 'secoes': tempos, 'excecoes': len(at.exception),
+                     'chamadas_llm': servidor.requisicoes - requisicoes}
+
+def botao(rotulo):
+    return next(b for b in at.button if b.label == rotulo)
+
+medir('abertura', at.run)
+medir('simular', lambda: botao('🔮 Simular Produtividade').click().run())
+medir('simular_de_novo', lambda: botao('🔮 Simular Produtividade').click().run())
+# Pergunta fora das regras de palavras-chave: a resposta vem do LLM (servidor falso)
+medir('perguntar', lambda: at.chat_input[0].set_value('Explique a fisiologia da planta').run())
+medir('limpar_chat', lambda: botao('🗑️ Limpar').click().run())
+print(json.dumps(medidas))
+"""
+
+
+def _exportar_app(destino, ref):
+    """Cópia do app e módulos de um commit (`ref`) com dados sintéticos"""
+    arquivo = subprocess.run(["git", "archive", ref, "app.py", "modules"],
+                             cwd=RAIZ, capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", str(destino)], input=arquivo, check=True)
+    (destino / "data").mkdir()
+    gerar_crop_yield(destino / "data" / "crop_yield.csv")
+    return destino / "app.py"
+
+
+def medir_reruns(ref=None, repeticoes=3):
+    """
+    Roda a sequência de interações `repeticoes` vezes em processos novos
+
+    Returns:
+        dict por interação com a mediana do script inteiro e da seção reexecutada
+    """
+    execucoes = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        destino = Path(temp_dir)
+        app = _exportar_app(destino, ref) if ref else _copiar_app(destino)
+        ambiente = dict(os.environ, GROQ_API_KEY="teste")
+        ambiente.pop("SIA_CACHE_DISCO", None)
+        for _ in range(repeticoes):
+            proc = subprocess.run([sys.executable, "-c", _SCRIPT_INTERACOES, str(app)],
+                                  cwd=temp_dir, env=ambiente, capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise RuntimeError(proc.stderr[-2000:])
+            execucoes.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    resultado = {}
+    for nome, secao in INTERACOES:
+        medidas = [e[nome] for e in execucoes]
+        tempos_secao = [m['secoes'][secao] for m in medidas if secao in m['secoes']]
+        resultado[nome] = {
+            'script_inteiro_s': round(statistics.median(m['script_s'] for m in medidas), 4),
+            'secao': secao,
+            'secao_s': round(statistics.median(tempos_secao), 4) if tempos_secao else None,
+            # O que um fragmento deixa de reexecutar a cada interação
+            'resto_do_app_s': (round(statistics.median(m['script_s'] - m['secoes'][secao] for m in medidas), 4)
+                               if tempos_secao else None),
+            'excecoes': max(m['excecoes'] for m in medidas),
+            'chamadas_llm': max(m.get('chamadas_llm', 0) for m in medidas)
+        }
+    return resultado
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    parser = argparse.ArgumentParser(description="Latência de rerun por interação do app")
+    parser.add_argument("--ref", help="Commit para comparar (ex.: o anterior aos fragmentos)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções (mediana)")
+    parser.add_argument("--saida", help="Grava o resultado em JSON")
+    args = parser.parse_args(argv)
+
+    resultado = {'atual': medir_reruns(repeticoes=args.repeticoes)}
+    if args.ref:
+        resultado[args.ref] = medir_reruns(args.ref, args.repeticoes)
+
+    for versao, medidas in resultado.items():
+        print(f"\n📌 {versao}")
+        print(f"{'Interação':16s} {'Script inteiro (s)':>19s} {'Só a seção (s)':>15s} {'Resto do app (s)':>17s}")
+        for nome, m in medidas.items():
+            secao = f"{m['secao_s']:.4f}" if m['secao_s'] is not None else "-"
+            resto = f"{m['resto_do_app_s']:.4f}" if m['resto_do_app_s'] is not None else "-"
+            aviso = f"  ⚠️ {m['excecoes']} exceção(ões)" if m['excecoes'] else ""
+            if m['chamadas_llm']:
+                aviso += f"  🤖 {m['chamadas_llm']} chamada(s) ao LLM"
+            print(f"{nome:16s} {m['script_inteiro_s']:>19.4f} {secao:>15s} {resto:>17s}{aviso}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,379 @@
+"""
+Suíte de Benchmarks do SIA
+Gera dados sintéticos, mede as operações principais (tempo e pico de memória)
+e compara com uma baseline gravada
+
+Uso:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --linhas 40000 --saida resultados.json
+    python -m benchmarks.suite --baseline --tolerancia 0.25          # compara com benchmarks/baseline.json
+    python -m benchmarks.suite --baseline --delta-minimo 0.01        # ignora diferenças abaixo de 10 ms
+    python -m benchmarks.suite --salvar-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --apenas treinar predizer --yolo models/best.pt
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fixtures import (CLIMAS, CULTURAS, REGIOES, SOLOS, ModeloBlobs, gerar_crop_yield,
+                                 gerar_serie_leite, gerar_video_blobs)
+from benchmarks.inicio_app import RAIZ
+
+BASELINE_PADRAO = Path(__file__).parent / "baseline.json"
+CODIGO_PARAMETROS_DIVERGENTES = 3  # saída quando a baseline foi gravada com outros tamanhos
+
+CENARIO = {
+    'Region': 'North', 'Soil_Type': 'Clay', 'Crop': 'Rice', 'Weather_Condition': 'Sunny',
+    'Rainfall_mm': 500, 'Temperature_Celsius': 25, 'Days_to_Harvest': 100,
+    'Fertilizer_Used': True, 'Irrigation_Used': False
+}
+
+
+def _cenarios(n, seed=7):
+    """`n` cenários variados para predição em lote e ROI"""
+    rng = np.random.default_rng(seed)
+    return [{
+        'Region': rng.choice(REGIOES), 'Soil_Type': rng.choice(SOLOS), 'Crop': rng.choice(CULTURAS),
+        'Weather_Condition': rng.choice(CLIMAS), 'Rainfall_mm': float(rng.uniform(100, 1000)),
+        'Temperature_Celsius': float(rng.uniform(15, 40)), 'Days_to_Harvest': int(rng.integers(60, 150)),
+        'Fertilizer_Used': bool(rng.random() < 0.5), 'Irrigation_Used': bool(rng.random() < 0.5)
+    } for _ in range(n)]
+
+
+def medir(funcao, repeticoes=5, aquecimento=1, preparar=None):
+    """
+    Tempo (mediana, mín, máx) de `funcao` e o pico de memória alocada numa execução extra
+
+    O pico vem do tracemalloc (Python + NumPy/pandas), medido à parte para não
+    contaminar os tempos. `preparar` roda antes de cada chamada, fora do cronômetro,
+    e seu retorno é passado a `funcao`.
+    """
+    def chamar():
+        argumento = preparar() if preparar else None
+        gc.collect()
+        t0 = time.perf_counter()
+        resultado = funcao(argumento) if preparar else funcao()
+        return time.perf_counter() - t0, resultado
+
+    for _ in range(aquecimento):
+        chamar()
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        tempo, resultado = chamar()
+        tempos.append(tempo)
+
+    argumento = preparar() if preparar else None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        funcao(argumento) if preparar else funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'mediana_s': round(statistics.median(tempos), 6),
+        'min_s': round(min(tempos), 6),
+        'max_s': round(max(tempos), 6),
+        'repeticoes': repeticoes,
+        'pico_memoria_mb': round(pico / 1024 ** 2, 2)
+    }, resultado
+
+
+# ==================== OPERAÇÕES ====================
+
+def bench_carregar_dados(ctx):
+    """ler_dataset: o corpo de carregar_dados (sem o cache do Streamlit)"""
+    from modules.simulador import ler_dataset
+    r, df = medir(lambda: ler_dataset(ctx['csv']), ctx['repeticoes'])
+    ctx['df'] = df
+    r['linhas'] = len(df)
+    return r
+
+
+def bench_treinar(ctx):
+    from modules.simulador import ModeloML
+
+    def treinar(modelo):
+        modelo.treinar()
+        return modelo
+    r, modelo = medir(treinar, max(1, ctx['repeticoes'] // 2), preparar=lambda: ModeloML(ctx['df']))
+    ctx['modelo'] = modelo
+    return r
+
+
+def bench_predizer(ctx):
+    """Uma predição por chamada (como o formulário do simulador)"""
+    modelo = ctx['modelo']
+    chamadas = 50
+    r, _ = medir(lambda: [modelo.predizer(dict(CENARIO)) for _ in range(chamadas)], ctx['repeticoes'])
+    r['por_chamada_s'] = round(r['mediana_s'] / chamadas, 6)
+    return r
+
+
+def bench_predizer_lote(ctx):
+    modelo = ctx['modelo']
+    itens = _cenarios(ctx['itens_lote'])
+    r, resultados = medir(lambda: modelo.predizer_lote(itens), ctx['repeticoes'])
+    r['itens'] = len(itens)
+    r['itens_por_s'] = round(len(itens) / r['mediana_s'], 1)
+    r['erros'] = sum('error' in x for x in resultados)
+    return r
+
+
+def bench_calcular_roi(ctx):
+    from modules.agente_roi import AgenteROI
+    entradas = [{'crop': c['Crop'], 'prediction': 4.5, 'fertilizer': c['Fertilizer_Used'],
+                 'irrigation': c['Irrigation_Used']} for c in _cenarios(1000)]
+    r, _ = medir(lambda: [AgenteROI.calcular_roi(e) for e in entradas], ctx['repeticoes'])
+    r['por_chamada_s'] = round(r['mediana_s'] / len(entradas), 8)
+    return r
+
+
+def bench_sarimax(ctx):
+    """Decomposição + ajuste SARIMAX + previsão de 12 meses (prever_leite)"""
+    import warnings
+    from modules.predicao_leite import prever_leite
+    valores = pd.read_csv(ctx['leite'], header=None).iloc[:, 0].values
+
+    def prever():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return prever_leite(valores, '2011-01-01', 12)
+    r, _ = medir(prever, max(1, ctx['repeticoes'] // 2))
+    r['meses'] = len(valores)
+    return r
+
+
+def _bench_deteccao(ctx, com_video):
+    from modules.motor_deteccao import carregar_modelo, processar_video
+    model = carregar_modelo(ctx['yolo']) if ctx['yolo'] else ModeloBlobs()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        saida = os.path.join(temp_dir, "saida.mp4") if com_video else None
+        r, df = medir(lambda: processar_video(model, ctx['video'], saida), max(1, ctx['repeticoes'] // 2))
+    frames = len(df)
+    r['frames'] = frames
+    r['fps'] = round(frames / r['mediana_s'], 1)
+    r['inferencia_por_frame_s'] = round(float(df['Tempo_inferencia (s)'].median()), 6)
+    r['modelo'] = Path(ctx['yolo']).name if ctx['yolo'] else 'ModeloBlobs'
+    return r
+
+
+def bench_deteccao(ctx):
+    """Laço completo: decodificar, detectar, desenhar e codificar o MP4"""
+    return _bench_deteccao(ctx, com_video=True)
+
+
+def bench_deteccao_somente_contagem(ctx):
+    """Laço sem desenho nem codificação (modo somente contagem)"""
+    return _bench_deteccao(ctx, com_video=False)
+
+
+# Ordem importa: treinar usa o df de carregar_dados; predizer usa o modelo treinado
+OPERACOES = {
+    'carregar_dados': (bench_carregar_dados, []),
+    'treinar': (bench_treinar, ['carregar_dados']),
+    'predizer': (bench_predizer, ['treinar']),
+    'predizer_lote': (bench_predizer_lote, ['treinar']),
+    'calcular_roi': (bench_calcular_roi, []),
+    'sarimax': (bench_sarimax, []),
+    'deteccao': (bench_deteccao, []),
+    'deteccao_somente_contagem': (bench_deteccao_somente_contagem, [])
+}
+
+
+def _selecionar(apenas):
+    """Operações pedidas mais as dependências, na ordem de OPERACOES"""
+    if not apenas:
+        return list(OPERACOES)
+    escolhidas = set()
+    pendentes = list(apenas)
+    while pendentes:
+        nome = pendentes.pop()
+        if nome not in escolhidas:
+            escolhidas.add(nome)
+            pendentes.extend(OPERACOES[nome][1])
+    return [nome for nome in OPERACOES if nome in escolhidas]
+
+
+def _metadados(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    versoes = {}
+    for pacote in ('numpy', 'pandas', 'sklearn', 'statsmodels', 'cv2', 'ultralytics'):
+        if importlib.util.find_spec(pacote) is not None:
+            versoes[pacote] = getattr(__import__(pacote), '__version__', None)
+    return {
+        'commit': commit,
+        'data': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'versoes': versoes,
+        'parametros': {'linhas': args.linhas, 'meses_leite': args.meses_leite, 'frames': args.frames,
+                       'itens_lote': args.itens_lote, 'repeticoes': args.repeticoes, 'seed': args.seed}
+    }
+
+
+def executar(args):
+    """Gera os fixtures e roda as operações selecionadas"""
+    resultado = {'meta': _metadados(args), 'resultados': {}, 'ignorados': {}}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pasta = Path(temp_dir)
+        ctx = {
+            'csv': gerar_crop_yield(pasta / "crop_yield.csv", args.linhas, args.seed),
+            'leite': gerar_serie_leite(pasta / "leite.csv", args.meses_leite, args.seed),
+            'video': None,
+            'yolo': args.yolo,
+            'repeticoes': args.repeticoes,
+            'itens_lote': args.itens_lote
+        }
+        tem_cv2 = importlib.util.find_spec("cv2") is not None
+        if tem_cv2:
+            ctx['video'] = str(gerar_video_blobs(pasta / "blobs.mp4", args.frames, seed=args.seed))
+
+        for nome in _selecionar(args.apenas):
+            funcao, dependencias = OPERACOES[nome]
+            faltando = [d for d in dependencias if d not in resultado['resultados']]
+            if faltando:
+                resultado['ignorados'][nome] = f"depende de {', '.join(faltando)}"
+            elif nome.startswith('deteccao') and not tem_cv2:
+                resultado['ignorados'][nome] = "opencv-python não instalado"
+            elif nome.startswith('deteccao') and args.yolo and importlib.util.find_spec("ultralytics") is None:
+                resultado['ignorados'][nome] = "ultralytics não instalado"
+            else:
+                print(f"⏱️  {nome}...", flush=True)
+                resultado['resultados'][nome] = funcao(ctx)
+                continue
+            print(f"⏭️  {nome}: {resultado['ignorados'][nome]}")
+
+    if sys.platform != "win32":
+        import resource
+        # ru_maxrss: KB no Linux, bytes no macOS
+        fator = 1024 ** 2 if sys.platform == "darwin" else 1024
+        resultado['meta']['pico_rss_processo_mb'] = round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / fator, 1)
+    return resultado
+
+
+def parametros_divergentes(atual, baseline):
+    """Parâmetros da carga (tamanhos e seed) que diferem da baseline; repetições não mudam a carga"""
+    base = baseline.get('meta', {}).get('parametros', {})
+    return {nome: (base.get(nome), valor) for nome, valor in atual['meta']['parametros'].items()
+            if nome != 'repeticoes' and base.get(nome) != valor}
+
+
+def comparar(atual, baseline, tolerancia, delta_minimo=0.0):
+    """
+    Razão atual/baseline do tempo mínimo de cada operação presente nas duas
+
+    O mínimo é menos sensível a ruído da máquina que a mediana, e só é regressão
+    quando a diferença passa também de `delta_minimo` segundos (operações de
+    poucos ms oscilam dezenas de % entre execuções idênticas)
+
+    Returns:
+        (linhas da comparação, lista de operações que regrediram além da tolerância)
+    """
+    comparacao = []
+    regressoes = []
+    for nome, r in atual['resultados'].items():
+        base = baseline.get('resultados', {}).get(nome)
+        if not base:
+            continue
+        razao = r['min_s'] / base['min_s'] if base['min_s'] else float('inf')
+        memoria = (r['pico_memoria_mb'] / base['pico_memoria_mb']
+                   if base.get('pico_memoria_mb') else None)
+        regrediu = razao > 1 + tolerancia and r['min_s'] - base['min_s'] > delta_minimo
+        comparacao.append({'operacao': nome, 'baseline_s': base['min_s'], 'atual_s': r['min_s'],
+                           'razao_tempo': round(razao, 3),
+                           'razao_memoria': round(memoria, 3) if memoria is not None else None,
+                           'regressao': regrediu})
+        if regrediu:
+            regressoes.append(nome)
+    return comparacao, regressoes
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    parser = argparse.ArgumentParser(description="Benchmarks das operações principais do SIA")
+    parser.add_argument("--linhas", type=int, default=20000, help="Linhas do crop_yield sintético")
+    parser.add_argument("--meses-leite", type=int, default=168, help="Meses da série de leite")
+    parser.add_argument("--frames", type=int, default=90, help="Frames do vídeo sintético")
+    parser.add_argument("--itens-lote", type=int, default=1000, help="Cenários na predição em lote")
+    parser.add_argument("--repeticoes", type=int, default=5, help="Repetições por operação (mediana)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--yolo", help="Pesos .pt reais para a detecção (padrão: detector de blobs)")
+    parser.add_argument("--apenas", nargs="+", choices=list(OPERACOES), help="Só estas operações")
+    parser.add_argument("--saida", help="Grava o resultado em JSON")
+    parser.add_argument("--baseline", nargs="?", const=str(BASELINE_PADRAO),
+                        help=f"JSON de baseline para comparar (sem valor: {BASELINE_PADRAO.name})")
+    parser.add_argument("--tolerancia", type=float, default=0.25,
+                        help="Regressão quando atual > baseline × (1 + tolerância)")
+    parser.add_argument("--delta-minimo", type=float, default=0.01,
+                        help="Diferença mínima em segundos para contar como regressão")
+    parser.add_argument("--salvar-baseline", help="Grava o resultado como nova baseline")
+    args = parser.parse_args(argv)
+
+    resultado = executar(args)
+
+    print(f"\n{'Operação':28s} {'Mediana (s)':>12s} {'Mín (s)':>10s} {'Pico mem (MB)':>14s}")
+    for nome, r in resultado['resultados'].items():
+        print(f"{nome:28s} {r['mediana_s']:>12.4f} {r['min_s']:>10.4f} {r['pico_memoria_mb']:>14.1f}")
+
+    codigo = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        divergentes = parametros_divergentes(resultado, baseline)
+        if divergentes:
+            # Tamanhos diferentes: as razões não dizem nada sobre regressão
+            print(f"\n⚠️ Parâmetros diferentes da baseline {args.baseline}; comparação recusada:")
+            for nome, (base, atual) in divergentes.items():
+                print(f"   {nome}: baseline={base} atual={atual}")
+            resultado['comparacao'] = {'baseline': args.baseline, 'recusada': True,
+                                       'parametros_divergentes': divergentes}
+            codigo = CODIGO_PARAMETROS_DIVERGENTES
+        else:
+            comparacao, regressoes = comparar(resultado, baseline, args.tolerancia, args.delta_minimo)
+            resultado['comparacao'] = {'baseline': args.baseline,
+                                       'commit_baseline': baseline['meta'].get('commit'),
+                                       'tolerancia': args.tolerancia, 'delta_minimo_s': args.delta_minimo,
+                                       'operacoes': comparacao}
+            print(f"\n📊 Comparação (tempo mínimo) com {args.baseline} "
+                  f"(commit {baseline['meta'].get('commit')})")
+            for c in comparacao:
+                marca = "🔴" if c['regressao'] else ("🟢" if c['razao_tempo'] < 1 - args.tolerancia else "⚪")
+                print(f"{marca} {c['operacao']:28s} {c['baseline_s']:>10.4f}s → {c['atual_s']:>10.4f}s "
+                      f"(×{c['razao_tempo']:.2f})")
+            if regressoes:
+                print(f"\n❌ Regressões acima de {args.tolerancia:.0%} e de {args.delta_minimo * 1000:.0f} ms: "
+                      f"{', '.join(regressoes)}")
+                codigo = 1
+
+    for caminho in filter(None, (args.saida, args.salvar_baseline)):
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(resultado if caminho == args.saida else {k: resultado[k] for k in ('meta', 'resultados')},
+                      f, indent=2, ensure_ascii=False)
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
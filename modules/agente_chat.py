@@ -4,58 +4,177 @@ Responde perguntas sobre simulador, leite e gado usando contexto JSON
 """
 
 import os
-import json
+import time
+from collections import deque, namedtuple
+
+from modules.cache_respostas import cache_padrao, chave_cache
+from modules.contexto_llm import ORCAMENTO_PADRAO, estimar_tokens, montar_prompt
+from modules.instrumentacao import observar
 
 try:
-    from langchain_groq import ChatGroq
     from langchain_core.prompts import PromptTemplate
     from langchain_core.output_parsers import StrOutputParser
 except ImportError:
     # Fallback para versões antigas
     try:
-        from langchain_groq import ChatGroq
         from langchain.prompts import PromptTemplate
         from langchain_core.output_parsers import StrOutputParser
     except ImportError:
-        ChatGroq = None
         PromptTemplate = None
         StrOutputParser = None
 
+from modules.cliente_llm import ChatCompartilhado, cliente_compartilhado
+
+# Pergunta que precisa do LLM: variáveis do prompt, mensagem de erro e chave do cache
+ChamadaLLM = namedtuple("ChamadaLLM", ["variaveis", "erro", "chave"])
+
 class AgenteChat:
     """Agente de chat com Groq - Contexto JSON completo de TODAS as análises"""
     
-    def __init__(self, groq_api_key, groq_model="llama-3.3-70b-versatile"):
-        """Inicializa agente com Groq API"""
-        if not groq_api_key or groq_api_key == "your_groq_api_key_here":
+    def __init__(self, groq_api_key, groq_model="llama-3.3-70b-versatile", cache=None, llm=None,
+                 orcamento_tokens=ORCAMENTO_PADRAO):
+        """
+        Inicializa agente com Groq API
+        
+        cache=None usa o cache compartilhado do processo; llm permite injetar outro
+        modelo de chat LangChain (ex.: modules.chat_falso.ChatFalso para testes offline);
+        orcamento_tokens limita o tamanho estimado do prompt
+        """
+        self.cache = cache if cache is not None else cache_padrao()
+        self.orcamento_tokens = orcamento_tokens
+        self.latencias = deque(maxlen=100)
+        self.ultima_latencia = None
+        self.ultimo_prompt = None
+        
+        if llm is not None:
+            self.llm = llm
+        elif not groq_api_key or groq_api_key == "your_groq_api_key_here":
             self.llm = None
         else:
-            self.llm = ChatGroq(model=groq_model, temperature=0.7, api_key=groq_api_key)
+            # Pool de conexões único do processo, compartilhado entre as sessões
+            self.llm = ChatCompartilhado(modelo=groq_model, temperatura=0.7,
+                                         cliente=cliente_compartilhado(groq_api_key))
         
         self.template = PromptTemplate(
-            input_variables=["contexto", "pergunta"],
+            input_variables=["contexto", "historico", "pergunta"],
             template="""Você é um especialista em agricultura, pecuária e análise de dados.
 
 DADOS DISPONÍVEIS (JSON):
 {contexto}
 
+CONVERSA ATÉ AQUI:
+{historico}
+
 PERGUNTA: {pergunta}
 
 Responda de forma técnica, clara e objetiva em português. Use os dados JSON para fundamentar sua resposta."""
         )
         
+        self.tokens_template = estimar_tokens(self.template.template)
+        
         if self.llm:
             self.chain = self.template | self.llm | StrOutputParser()
     
-    def responder(self, mensagem, contexto_json=None):
-        """Responde usando contexto JSON de simulador, leite e gado"""
+    def _invocar(self, rota, pergunta):
+        """Chama o Groq, reaproveitando respostas já dadas para o mesmo contexto e pergunta"""
+        resposta = self.cache.obter(rota.chave)
+        if resposta is not None:
+            return resposta, "cache"
+        resposta = self.chain.invoke({**rota.variaveis, "pergunta": pergunta})
+        self.cache.guardar(rota.chave, resposta)
+        return resposta, "llm"
+    
+    def _registrar_latencia(self, origem, inicio, primeiro_token, fim):
+        """Guarda tempo até o primeiro token e tempo total da resposta"""
+        self.ultima_latencia = {
+            'origem': origem,
+            'ttft_s': round(primeiro_token - inicio, 4),
+            'total_s': round(fim - inicio, 4)
+        }
+        self.latencias.append(self.ultima_latencia)
+        observar('chat_primeiro_token', primeiro_token - inicio, origem=origem)
+        observar('chat_resposta', fim - inicio, origem=origem)
+    
+    @staticmethod
+    def _mensagem_erro(chamada, erro):
+        return chamada.erro or f"❌ Erro: {str(erro)[:100]}"
+    
+    def responder(self, mensagem, contexto_json=None, historico=None):
+        """Responde usando contexto JSON de simulador, leite e gado (e o histórico do chat)"""
+        inicio = time.perf_counter()
+        rota = self._rotear(mensagem, contexto_json, historico)
+        
+        if isinstance(rota, str):
+            fim = time.perf_counter()
+            self._registrar_latencia("regra", inicio, fim, fim)
+            return rota
+        
+        try:
+            resposta, origem = self._invocar(rota, mensagem)
+        except Exception as e:
+            # Sem resposta do LLM não há latência a mostrar (não herda a da anterior)
+            self.ultima_latencia = None
+            return self._mensagem_erro(rota, e)
+        
+        fim = time.perf_counter()
+        self._registrar_latencia(origem, inicio, fim, fim)
+        return resposta
+    
+    def responder_stream(self, mensagem, contexto_json=None, historico=None):
+        """Como responder(), mas gera a resposta em pedaços conforme chegam do LLM"""
+        inicio = time.perf_counter()
+        rota = self._rotear(mensagem, contexto_json, historico)
+        
+        if isinstance(rota, str):
+            fim = time.perf_counter()
+            self._registrar_latencia("regra", inicio, fim, fim)
+            yield rota
+            return
+        
+        resposta = self.cache.obter(rota.chave)
+        if resposta is not None:
+            fim = time.perf_counter()
+            self._registrar_latencia("cache", inicio, fim, fim)
+            yield resposta
+            return
+        
+        partes = []
+        primeiro_token = None
+        try:
+            for pedaco in self.chain.stream({**rota.variaveis, "pergunta": mensagem}):
+                if not pedaco:
+                    continue
+                if primeiro_token is None:
+                    primeiro_token = time.perf_counter()
+                partes.append(pedaco)
+                yield pedaco
+        except Exception as e:
+            self.ultima_latencia = None
+            yield ("\n\n" if partes else "") + self._mensagem_erro(rota, e)
+            return
+        
+        fim = time.perf_counter()
+        self.cache.guardar(rota.chave, "".join(partes))
+        self._registrar_latencia("llm", inicio, primeiro_token or fim, fim)
+    
+    def _chamada_llm(self, mensagem, contexto_json, historico, erro=None):
+        """Monta o prompt compacto dentro do orçamento e registra seu tamanho"""
+        prompt = montar_prompt(contexto_json, mensagem, historico,
+                               self.orcamento_tokens, self.tokens_template)
+        self.ultimo_prompt = prompt['tamanho']
+        # Sem histórico a chave é só contexto + pergunta (acertos entre sessões na 1ª pergunta);
+        # com histórico ele entra na chave: "Por quê?" depende da conversa anterior
+        historico_prompt = prompt['historico'] if prompt['tamanho']['tokens_historico'] else None
+        chave = chave_cache(prompt['contexto'], mensagem, historico_prompt)
+        return ChamadaLLM({"contexto": prompt['contexto'], "historico": prompt['historico']}, erro, chave)
+    
+    def _rotear(self, mensagem, contexto_json, historico=None):
+        """Resposta pronta (str) pelas regras de palavras-chave, ou ChamadaLLM se precisar do Groq"""
         
         if not contexto_json or not any(contexto_json.values()):
             if not self.llm:
                 return "⚠️ Configure GROQ_API_KEY no arquivo config/.env"
-            try:
-                return self.chain.invoke({"contexto": "Nenhuma análise disponível", "pergunta": mensagem})
-            except:
-                return "❌ Erro ao conectar com Groq API"
+            return self._chamada_llm(mensagem, None, historico, "❌ Erro ao conectar com Groq API")
         
         msg_lower = mensagem.lower()
         
@@ -120,9 +239,5 @@ Responda de forma técnica, clara e objetiva em português. Use os dados JSON pa
         if not self.llm:
             return "⚠️ Configure GROQ_API_KEY para perguntas avançadas"
         
-        try:
-            # Converter contexto JSON para texto
-            contexto_str = json.dumps(contexto_json, indent=2, ensure_ascii=False)
-            return self.chain.invoke({"contexto": contexto_str, "pergunta": mensagem})
-        except Exception as e:
-            return f"❌ Erro: {str(e)[:100]}"
+        # Contexto compacto (só o relevante à pergunta) em vez do JSON completo indentado
+        return self._chamada_llm(mensagem, contexto_json, historico)
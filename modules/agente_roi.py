@@ -3,6 +3,8 @@ Agente ROI - Análise Financeira
 Calcula ROI, custos e receitas de produção agrícola
 """
 
+from modules.instrumentacao import cronometrar
+
 class AgenteROI:
     """Agente especializado em calcular ROI e análise financeira"""
     
@@ -25,6 +27,7 @@ class AgenteROI:
     CUSTO_BASE = 3200           # Sementes (R$ 800) + Defensivos (R$ 1.200) + Mão de obra (R$ 800) + Maquinário (R$ 400)
     
     @staticmethod
+    @cronometrar('roi')
     def calcular_roi(predicao_data):
         """
         Calcula ROI completo baseado na predição
@@ -0,0 +1,159 @@
+"""
+Cache de Respostas do Chat
+Evita chamadas repetidas ao Groq para a mesma pergunta sobre a mesma análise
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from modules.instrumentacao import contar
+
+
+def normalizar_pergunta(pergunta):
+    """Minúsculas, sem acentos, sem pontuação e com espaços colapsados"""
+    texto = unicodedata.normalize("NFKD", pergunta.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[^\w\s]", " ", texto)
+    return " ".join(texto.split())
+
+
+def hash_contexto(contexto_json):
+    """Hash estável do contexto JSON (independe da ordem das chaves)"""
+    serializado = json.dumps(contexto_json, sort_keys=True, separators=(",", ":"),
+                             ensure_ascii=False, default=str)
+    return hashlib.sha256(serializado.encode("utf-8")).hexdigest()
+
+
+def chave_cache(contexto_json, pergunta, historico=None):
+    """Chave = hash do contexto + pergunta normalizada (+ histórico, se houver)"""
+    base = f"{hash_contexto(contexto_json)}|{normalizar_pergunta(pergunta)}"
+    if historico:
+        base += "|" + hashlib.sha256(historico.encode("utf-8")).hexdigest()
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+
+class CacheRespostas:
+    """
+    Cache LRU com expiração (TTL) em dois níveis
+
+    - Memória: por processo, compartilhado entre as sessões do Streamlit
+    - Disco (opcional): SQLite, sobrevive a reinícios
+    """
+
+    def __init__(self, max_itens=512, ttl_segundos=3600, caminho_disco=None, max_itens_disco=10000):
+        self.max_itens = max_itens
+        self.ttl = ttl_segundos
+        self.max_itens_disco = max_itens_disco
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+        self.estatisticas = {'hits_memoria': 0, 'hits_disco': 0, 'misses': 0, 'expirados': 0}
+
+        self._disco = None
+        if caminho_disco:
+            os.makedirs(os.path.dirname(os.path.abspath(caminho_disco)), exist_ok=True)
+            self._disco = sqlite3.connect(caminho_disco, check_same_thread=False)
+            self._disco.execute(
+                "CREATE TABLE IF NOT EXISTS respostas (chave TEXT PRIMARY KEY, resposta TEXT, criado REAL)"
+            )
+            self._disco.commit()
+
+    def _expirado(self, criado):
+        return self.ttl is not None and time.time() - criado > self.ttl
+
+    def obter(self, chave):
+        """Retorna a resposta em cache ou None"""
+        with self._lock:
+            item = self._memoria.get(chave)
+            if item is not None:
+                resposta, criado = item
+                if not self._expirado(criado):
+                    self._memoria.move_to_end(chave)
+                    self.estatisticas['hits_memoria'] += 1
+                    contar('cache_consultas', resultado='memoria')
+                    return resposta
+                del self._memoria[chave]
+                self.estatisticas['expirados'] += 1
+
+            if self._disco is not None:
+                linha = self._disco.execute(
+                    "SELECT resposta, criado FROM respostas WHERE chave = ?", (chave,)
+                ).fetchone()
+                if linha is not None:
+                    resposta, criado = linha
+                    if not self._expirado(criado):
+                        self._guardar_memoria(chave, resposta, criado)
+                        self.estatisticas['hits_disco'] += 1
+                        contar('cache_consultas', resultado='disco')
+                        return resposta
+                    self._disco.execute("DELETE FROM respostas WHERE chave = ?", (chave,))
+                    self._disco.commit()
+                    self.estatisticas['expirados'] += 1
+
+            self.estatisticas['misses'] += 1
+            contar('cache_consultas', resultado='falha')
+            return None
+
+    def guardar(self, chave, resposta):
+        """Armazena a resposta nos dois níveis"""
+        criado = time.time()
+        with self._lock:
+            self._guardar_memoria(chave, resposta, criado)
+
+            if self._disco is not None:
+                self._disco.execute(
+                    "INSERT OR REPLACE INTO respostas (chave, resposta, criado) VALUES (?, ?, ?)",
+                    (chave, resposta, criado)
+                )
+                # Mantém só os itens mais recentes no disco
+                self._disco.execute(
+                    "DELETE FROM respostas WHERE chave NOT IN "
+                    "(SELECT chave FROM respostas ORDER BY criado DESC LIMIT ?)",
+                    (self.max_itens_disco,)
+                )
+                self._disco.commit()
+
+    def _guardar_memoria(self, chave, resposta, criado):
+        self._memoria[chave] = (resposta, criado)
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.max_itens:
+            self._memoria.popitem(last=False)
+
+    def limpar(self):
+        """Esvazia os dois níveis"""
+        with self._lock:
+            self._memoria.clear()
+            if self._disco is not None:
+                self._disco.execute("DELETE FROM respostas")
+                self._disco.commit()
+
+    def taxa_acerto(self):
+        hits = self.estatisticas['hits_memoria'] + self.estatisticas['hits_disco']
+        total = hits + self.estatisticas['misses']
+        return hits / total if total else 0.0
+
+
+_cache_padrao = None
+_cache_lock = threading.Lock()
+
+
+def cache_padrao():
+    """
+    Cache único do processo, configurado por variáveis de ambiente:
+    SIA_CACHE_MAX_ITENS, SIA_CACHE_TTL (segundos) e SIA_CACHE_DISCO (caminho SQLite, opcional)
+    """
+    global _cache_padrao
+    with _cache_lock:
+        if _cache_padrao is None:
+            _cache_padrao = CacheRespostas(
+                max_itens=int(os.getenv("SIA_CACHE_MAX_ITENS", 512)),
+                ttl_segundos=float(os.getenv("SIA_CACHE_TTL", 3600)),
+                caminho_disco=os.getenv("SIA_CACHE_DISCO") or None
+            )
+        return _cache_padrao
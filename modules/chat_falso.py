@@ -0,0 +1,50 @@
+"""
+Modelo de Chat Falso (offline)
+Simula um LLM que emite tokens com atrasos configuráveis, para testar o
+streaming do AgenteChat sem Groq nem internet
+
+Exemplo:
+    from modules.chat_falso import ChatFalso
+    agente = AgenteChat(None, llm=ChatFalso(resposta="Olá produtor!", atraso_primeiro_token=0.8))
+    for pedaco in agente.responder_stream("Explique o ROI", contexto):
+        print(pedaco, end="", flush=True)
+    print(agente.ultima_latencia)
+"""
+
+import re
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class ChatFalso(BaseChatModel):
+    """Chat model LangChain que devolve um texto fixo, token a token"""
+
+    resposta: str = "Resposta simulada do assistente agronômico."
+    atraso_primeiro_token: float = 0.5
+    atraso_token: float = 0.05
+
+    @property
+    def _llm_type(self):
+        return "chat-falso"
+
+    def _tokens(self):
+        """Divide a resposta em 'tokens' (palavra + espaço seguinte)"""
+        return re.findall(r"\S+\s*", self.resposta) or [self.resposta]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._tokens()
+        time.sleep(self.atraso_primeiro_token + self.atraso_token * (len(tokens) - 1))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.resposta))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.atraso_primeiro_token)
+        for i, token in enumerate(self._tokens()):
+            if i:
+                time.sleep(self.atraso_token)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,299 @@
+"""
+Cliente LLM Compartilhado
+Pool assíncrono único por processo para a API de chat-completions do Groq
+(compatível com OpenAI): conexões keep-alive, limite de concorrência,
+coalescência de prompts idênticos em andamento e retentativas com backoff
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import random
+import threading
+from typing import Any
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from modules.instrumentacao import contar, span
+
+URL_PADRAO = "https://api.groq.com/openai/v1"
+STATUS_TRANSITORIOS = {429, 500, 502, 503, 504}
+
+
+class ErroLLM(Exception):
+    """Falha da API de chat; `transitorio` indica se vale tentar de novo"""
+
+    def __init__(self, mensagem, transitorio=False, retry_after=None):
+        super().__init__(mensagem)
+        self.transitorio = transitorio
+        self.retry_after = retry_after
+
+
+class _Transmissao:
+    """Stream upstream em andamento e os chamadores que o assinam (usado só no event loop)"""
+
+    def __init__(self):
+        self.pedacos = []
+        self.ouvintes = []
+        self.tarefa = None
+
+    def emitir(self, pedaco):
+        self.pedacos.append(pedaco)
+        for ouvinte in self.ouvintes:
+            ouvinte(pedaco)
+
+
+class ClienteLLM:
+    """
+    Cliente assíncrono rodando em um event loop próprio (thread daemon)
+
+    Métodos síncronos (completar, completar_stream) podem ser chamados de qualquer
+    thread do Streamlit; todos compartilham o mesmo pool de conexões e semáforo.
+    """
+
+    def __init__(self, api_key, base_url=URL_PADRAO, max_concorrencia=8, max_conexoes=16,
+                 tentativas=4, backoff_base=0.5, backoff_max=8.0, timeout=60.0):
+        self.tentativas = tentativas
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.estatisticas = {'requisicoes': 0, 'coalescidas': 0, 'retentativas': 0, 'erros': 0}
+        self._em_voo = {}
+        self._streams_em_voo = {}
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="cliente-llm", daemon=True)
+        self._thread.start()
+
+        async def _criar():
+            self._semaforo = asyncio.Semaphore(max_concorrencia)
+            self._http = httpx.AsyncClient(
+                base_url=base_url.rstrip("/"),
+                headers={"Authorization": f"Bearer {api_key}"},
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=max_conexoes,
+                                    max_keepalive_connections=max_conexoes,
+                                    keepalive_expiry=30.0)
+            )
+        self._executar(_criar())
+
+    def _executar(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    # ==================== NÚCLEO ASSÍNCRONO ====================
+
+    def _espera_backoff(self, tentativa, erro):
+        if erro.retry_after is not None:
+            # Retry-After vem do servidor: limitado a backoff_max para não travar a sessão
+            return min(max(erro.retry_after, 0.0), self.backoff_max)
+        return min(self.backoff_max, self.backoff_base * 2 ** tentativa) * random.uniform(0.5, 1.5)
+
+    async def _com_retentativas(self, enviar, pode_repetir=lambda: True):
+        """Executa `enviar` sob o semáforo; repete erros transitórios com backoff exponencial e jitter"""
+        for tentativa in range(self.tentativas):
+            try:
+                async with self._semaforo:
+                    self.estatisticas['requisicoes'] += 1
+                    contar('llm_requisicoes')
+                    with span('llm_requisicao'):
+                        return await enviar()
+            except httpx.TransportError as e:
+                erro = ErroLLM(f"Falha de conexão: {e}", transitorio=True)
+            except ErroLLM as e:
+                erro = e
+
+            if not erro.transitorio or tentativa == self.tentativas - 1 or not pode_repetir():
+                self.estatisticas['erros'] += 1
+                contar('llm_erros')
+                raise erro
+            self.estatisticas['retentativas'] += 1
+            contar('llm_retentativas')
+            await asyncio.sleep(self._espera_backoff(tentativa, erro))
+
+    @staticmethod
+    def _verificar(resposta):
+        if resposta.status_code == 200:
+            return
+        retry_after = resposta.headers.get("retry-after")
+        try:
+            retry_after = float(retry_after) if retry_after is not None else None
+        except ValueError:
+            retry_after = None
+        raise ErroLLM(f"HTTP {resposta.status_code}: {resposta.text[:200]}",
+                      transitorio=resposta.status_code in STATUS_TRANSITORIOS,
+                      retry_after=retry_after)
+
+    async def _requisitar(self, payload):
+        async def enviar():
+            resposta = await self._http.post("/chat/completions", json=payload)
+            self._verificar(resposta)
+            return resposta.json()["choices"][0]["message"]["content"]
+        return await self._com_retentativas(enviar)
+
+    @staticmethod
+    def _chave(payload):
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    async def completar_async(self, modelo, mensagens, temperatura=0.7):
+        """Resposta completa; prompts idênticos em andamento compartilham a mesma requisição"""
+        payload = {"model": modelo, "messages": mensagens, "temperature": temperatura}
+        chave = self._chave(payload)
+
+        tarefa = self._em_voo.get(chave)
+        if tarefa is not None:
+            self.estatisticas['coalescidas'] += 1
+            contar('llm_coalescidas')
+        else:
+            tarefa = asyncio.ensure_future(self._requisitar(payload))
+            self._em_voo[chave] = tarefa
+            tarefa.add_done_callback(lambda _: self._em_voo.pop(chave, None))
+        # shield: se um chamador desistir, os outros continuam aguardando
+        return await asyncio.shield(tarefa)
+
+    async def _transmitir(self, payload, transmissao):
+        """Uma requisição SSE ao upstream; cada pedaço vai para todos os ouvintes da transmissão"""
+        async def enviar():
+            async with self._http.stream("POST", "/chat/completions", json=payload) as resposta:
+                if resposta.status_code != 200:
+                    await resposta.aread()
+                    self._verificar(resposta)
+                async for linha in resposta.aiter_lines():
+                    if not linha.startswith("data:"):
+                        continue
+                    dado = linha[5:].strip()
+                    if dado == "[DONE]":
+                        break
+                    # O último evento pode trazer só o uso de tokens, com choices vazio
+                    escolhas = json.loads(dado).get("choices") or []
+                    if not escolhas:
+                        continue
+                    conteudo = escolhas[0].get("delta", {}).get("content")
+                    if conteudo:
+                        transmissao.emitir(conteudo)
+
+        # Só repete se nada foi emitido ainda (senão o texto sairia duplicado)
+        await self._com_retentativas(enviar, pode_repetir=lambda: not transmissao.pedacos)
+
+    async def _stream_async(self, modelo, mensagens, temperatura, ao_pedaco):
+        """
+        Streaming com coalescência: prompts idênticos em andamento assinam a mesma
+        requisição upstream, recebendo primeiro os pedaços já emitidos
+        """
+        payload = {"model": modelo, "messages": mensagens, "temperature": temperatura, "stream": True}
+        chave = self._chave(payload)
+
+        transmissao = self._streams_em_voo.get(chave)
+        if transmissao is not None:
+            self.estatisticas['coalescidas'] += 1
+            contar('llm_coalescidas')
+        else:
+            transmissao = _Transmissao()
+            transmissao.tarefa = asyncio.ensure_future(self._transmitir(payload, transmissao))
+            self._streams_em_voo[chave] = transmissao
+            transmissao.tarefa.add_done_callback(lambda _: self._desregistrar(chave, transmissao))
+
+        # Tudo roda no event loop: repassar o já emitido e assinar é atômico
+        for pedaco in transmissao.pedacos:
+            ao_pedaco(pedaco)
+        transmissao.ouvintes.append(ao_pedaco)
+        try:
+            await asyncio.shield(transmissao.tarefa)
+        finally:
+            transmissao.ouvintes.remove(ao_pedaco)
+            # Último ouvinte desistiu: não há para quem continuar transmitindo
+            if not transmissao.ouvintes and not transmissao.tarefa.done():
+                self._desregistrar(chave, transmissao)
+                transmissao.tarefa.cancel()
+
+    def _desregistrar(self, chave, transmissao):
+        """Tira a transmissão da tabela de em andamento (se outra não tiver tomado o lugar)"""
+        if self._streams_em_voo.get(chave) is transmissao:
+            del self._streams_em_voo[chave]
+
+    # ==================== API SÍNCRONA ====================
+
+    def completar(self, modelo, mensagens, temperatura=0.7):
+        return self._executar(self.completar_async(modelo, mensagens, temperatura))
+
+    def completar_stream(self, modelo, mensagens, temperatura=0.7):
+        """Gera os pedaços da resposta conforme chegam (SSE)"""
+        fila = queue.Queue()
+        fim = object()
+        futuro = asyncio.run_coroutine_threadsafe(
+            self._stream_async(modelo, mensagens, temperatura, fila.put), self._loop
+        )
+        futuro.add_done_callback(lambda _: fila.put(fim))
+        try:
+            while True:
+                item = fila.get()
+                if item is fim:
+                    break
+                yield item
+            futuro.result()
+        finally:
+            if not futuro.done():
+                futuro.cancel()
+
+    def fechar(self):
+        self._executar(self._http.aclose())
+        # Finaliza geradores assíncronos do httpx interrompidos no [DONE] antes de parar o loop
+        self._executar(self._loop.shutdown_asyncgens())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+
+def cliente_compartilhado(api_key, base_url=None):
+    """
+    Cliente único do processo por (chave, URL), configurado por variáveis de ambiente:
+    GROQ_BASE_URL, SIA_LLM_MAX_CONCORRENCIA, SIA_LLM_MAX_CONEXOES e SIA_LLM_TENTATIVAS
+    """
+    base_url = base_url or os.getenv("GROQ_BASE_URL") or URL_PADRAO
+    with _clientes_lock:
+        cliente = _clientes.get((api_key, base_url))
+        if cliente is None:
+            cliente = ClienteLLM(
+                api_key, base_url,
+                max_concorrencia=int(os.getenv("SIA_LLM_MAX_CONCORRENCIA", 8)),
+                max_conexoes=int(os.getenv("SIA_LLM_MAX_CONEXOES", 16)),
+                tentativas=int(os.getenv("SIA_LLM_TENTATIVAS", 4))
+            )
+            _clientes[(api_key, base_url)] = cliente
+        return cliente
+
+
+_PAPEIS = {"human": "user", "ai": "assistant", "system": "system"}
+
+
+def _converter_mensagens(messages):
+    return [{"role": _PAPEIS.get(m.type, "user"), "content": m.content} for m in messages]
+
+
+class ChatCompartilhado(BaseChatModel):
+    """Chat model LangChain que usa o ClienteLLM compartilhado (substitui um ChatGroq por sessão)"""
+
+    modelo: str
+    temperatura: float = 0.7
+    cliente: Any
+
+    @property
+    def _llm_type(self):
+        return "groq-compartilhado"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        texto = self.cliente.completar(self.modelo, _converter_mensagens(messages), self.temperatura)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=texto))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for pedaco in self.cliente.completar_stream(self.modelo, _converter_mensagens(messages),
+                                                    self.temperatura):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=pedaco))
+            if run_manager:
+                run_manager.on_llm_new_token(pedaco, chunk=chunk)
+            yield chunk
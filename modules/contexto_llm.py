@@ -0,0 +1,189 @@
+"""
+Construtor de Contexto para o LLM
+Serializa contexto_json e histórico do chat de forma compacta, só com os campos
+relevantes à pergunta e dentro de um orçamento de tokens
+"""
+
+import json
+import math
+import re
+
+from modules.cache_respostas import normalizar_pergunta
+
+# Campos enviados ao LLM por seção, do mais para o menos importante
+# (os últimos são os primeiros a sair quando o orçamento aperta)
+CAMPOS = {
+    'simulacao': ['cultura', 'producao_tha', 'regiao', 'fertilizante', 'irrigacao',
+                  'chuva', 'temperatura', 'clima', 'solo'],
+    'roi': ['roi_percentual', 'lucro_liquido', 'status', 'receita_bruta', 'custo_total',
+            'payback_meses', 'preco_tonelada'],
+    'predicao_leite': ['media_prevista', 'variacao_percentual', 'media_historica', 'meses_previsao',
+                       'ultimo_valor', 'primeiro_valor_previsto', 'total_meses'],
+    'deteccao_gado': ['media_vacas', 'maximo_vacas', 'frames_processados', 'fps_medio', 'nome_arquivo']
+}
+
+# Padrões (sem acento) que indicam o assunto da pergunta, casados em palavras
+# inteiras: 'vale' não casa com "avalie" nem 'boi' com "boiar"; \w* marca radicais
+INTENCOES = {
+    'simulacao': [r'produtividade', r'produc(ao|oes)', r'safras?', r'colheitas?', r'culturas?', r'solos?',
+                  r'clima', r'chuvas?', r'temperaturas?', r'fertiliz\w*', r'irriga\w*', r'plant(io|ar)',
+                  r'hectares?', r'regi(ao|oes)'],
+    'roi': [r'roi', r'lucros?', r'custos?', r'receitas?', r'retornos?', r'invest\w*', r'financ\w*',
+            r'precos?', r'payback', r'vale', r'dinheiro', r'rentab\w*', r'prejuizos?'],
+    'predicao_leite': [r'leite', r'litros?', r'ordenha\w*', r'lactac\w*', r'previs\w*', r'sazona\w*'],
+    'deteccao_gado': [r'gado', r'vacas?', r'bois?', r'boiada', r'anima(l|is)', r'rebanhos?', r'cabecas?',
+                      r'detec\w*', r'videos?', r'contage(m|ns)']
+}
+_PADROES_INTENCAO = {secao: re.compile(r"\b(?:" + "|".join(padroes) + r")\b")
+                     for secao, padroes in INTENCOES.items()}
+
+ORCAMENTO_PADRAO = 1200
+LIMITE_MENSAGEM_HISTORICO = 300
+LIMITE_PERGUNTA_RESUMO = 60
+
+
+def estimar_tokens(texto):
+    """Estimativa local e rápida de tokens (sem tokenizer): ~4 caracteres ou ~1,3 palavra por token"""
+    if not texto:
+        return 0
+    palavras = len(re.findall(r"\w+|[^\w\s]", texto))
+    return int(math.ceil(max(len(texto) / 4, palavras * 1.3)))
+
+
+def detectar_intencao(pergunta, secoes_disponiveis):
+    """Seções do contexto relevantes à pergunta (todas, se nenhuma palavra-chave bater)"""
+    texto = normalizar_pergunta(pergunta)
+    relevantes = [secao for secao in secoes_disponiveis
+                  if secao in _PADROES_INTENCAO and _PADROES_INTENCAO[secao].search(texto)]
+    # ROI sem a simulação que o originou perde o sentido
+    if 'roi' in relevantes and 'simulacao' in secoes_disponiveis and 'simulacao' not in relevantes:
+        relevantes.insert(0, 'simulacao')
+    return relevantes or list(secoes_disponiveis)
+
+
+def _arredondar(valor):
+    if isinstance(valor, float):
+        return round(valor, 2)
+    return valor
+
+
+def _extrair_secao(contexto_json, secao):
+    """Achata a seção no formato do esquema (ex.: roi.financeiro + roi.mercado)"""
+    dados = contexto_json.get(secao) or {}
+    if secao == 'roi':
+        plano = dict(dados.get('financeiro', {}))
+        plano['status'] = dados.get('status')
+        plano['preco_tonelada'] = dados.get('mercado', {}).get('preco_tonelada')
+        dados = plano
+    return {campo: _arredondar(dados[campo]) for campo in CAMPOS.get(secao, dados.keys())
+            if dados.get(campo) is not None}
+
+
+def _serializar(dados):
+    return json.dumps(dados, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+
+def compactar_contexto(contexto_json, pergunta, orcamento_tokens=ORCAMENTO_PADRAO):
+    """
+    JSON compacto com as seções relevantes à pergunta, cortando campos de menor
+    prioridade até caber no orçamento
+
+    Returns:
+        (texto, secoes_incluidas)
+    """
+    if not contexto_json or not any(contexto_json.values()):
+        return "Nenhuma análise disponível", []
+
+    disponiveis = [secao for secao in contexto_json if contexto_json.get(secao)]
+    secoes = detectar_intencao(pergunta, disponiveis)
+    dados = {secao: _extrair_secao(contexto_json, secao) for secao in secoes}
+
+    texto = _serializar(dados)
+    # Remove campos do fim das listas de prioridade, alternando entre seções
+    while estimar_tokens(texto) > orcamento_tokens:
+        candidatas = [s for s in dados if len(dados[s]) > 1]
+        if not candidatas:
+            break
+        maior = max(candidatas, key=lambda s: len(dados[s]))
+        dados[maior].popitem()
+        texto = _serializar(dados)
+
+    return texto, secoes
+
+
+def compactar_historico(historico, orcamento_tokens):
+    """
+    Últimas mensagens do chat por inteiro (truncadas) e as mais antigas resumidas
+    em uma linha com as perguntas feitas, tudo dentro do orçamento
+    """
+    if not historico or orcamento_tokens <= 0:
+        return ""
+
+    recentes = []
+    usados = 0
+    indice_corte = len(historico)
+    for i in range(len(historico) - 1, -1, -1):
+        msg = historico[i]
+        papel = "Usuário" if msg.get("role") == "user" else "Assistente"
+        conteudo = " ".join(str(msg.get("content", "")).split())
+        if len(conteudo) > LIMITE_MENSAGEM_HISTORICO:
+            conteudo = conteudo[:LIMITE_MENSAGEM_HISTORICO] + "…"
+        linha = f"{papel}: {conteudo}"
+        custo = estimar_tokens(linha)
+        if usados + custo > orcamento_tokens:
+            break
+        recentes.append(linha)
+        usados += custo
+        indice_corte = i
+    recentes.reverse()
+
+    antigas = [" ".join(str(m.get("content", "")).split())[:LIMITE_PERGUNTA_RESUMO]
+               for m in historico[:indice_corte] if m.get("role") == "user"]
+    linhas = []
+    if antigas:
+        resumo = "Perguntas anteriores: " + "; ".join(antigas)
+        # Mantém as perguntas mais recentes do resumo se não couber tudo
+        while antigas and estimar_tokens(resumo) > orcamento_tokens - usados:
+            antigas.pop(0)
+            resumo = "Perguntas anteriores: " + "; ".join(antigas)
+        if antigas:
+            linhas.append(resumo)
+
+    return "\n".join(linhas + recentes)
+
+
+def montar_prompt(contexto_json, pergunta, historico=None, orcamento_tokens=ORCAMENTO_PADRAO,
+                  tokens_fixos=0):
+    """
+    Monta as partes variáveis do prompt respeitando o orçamento total
+
+    O contexto tem prioridade; o histórico usa o que sobrar.
+
+    Returns:
+        dict com 'contexto', 'historico' e o relatório de tamanho ('tamanho')
+    """
+    disponivel = orcamento_tokens - tokens_fixos - estimar_tokens(pergunta)
+    contexto, secoes = compactar_contexto(contexto_json, pergunta, disponivel)
+    tokens_contexto = estimar_tokens(contexto)
+
+    historico_str = compactar_historico(historico, disponivel - tokens_contexto)
+    tokens_historico = estimar_tokens(historico_str)
+
+    return {
+        'contexto': contexto,
+        'historico': historico_str or "(sem mensagens anteriores)",
+        'tamanho': {
+            'secoes': secoes,
+            'tokens_contexto': tokens_contexto,
+            'tokens_historico': tokens_historico,
+            'tokens_total': tokens_fixos + estimar_tokens(pergunta) + tokens_contexto + tokens_historico,
+            'orcamento': orcamento_tokens
+        }
+    }
+
+
+def tokens_contexto_original(contexto_json):
+    """Tokens do JSON completo indentado (o formato antigo), para comparar com o compacto"""
+    if not contexto_json:
+        return 0
+    return estimar_tokens(json.dumps(contexto_json, indent=2, ensure_ascii=False))
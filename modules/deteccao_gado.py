@@ -4,14 +4,54 @@ Processa vídeos e conta animais
 """
 
 import streamlit as st
-import pandas as pd
-import cv2
 import tempfile
 import os
+import shutil
+import importlib.util
 import time
-import matplotlib.pyplot as plt
+import weakref
 from pathlib import Path
 
+from modules.processamento_lote import TAMANHO_BLOCO_UPLOAD
+
+# OpenCV, ultralytics/torch e matplotlib só são importados ao processar um vídeo
+
+PREFIXO_PASTA = "sia_gado_"
+IDADE_MAX_PASTA = 24 * 3600  # pastas órfãs (processo encerrado à força) mais velhas que isso são apagadas
+
+_varredura_feita = False
+
+
+class _PastaSessao:
+    """
+    Pasta temporária de resultados de uma sessão
+
+    Apagada quando o objeto é coletado (a sessão do Streamlit terminou e seu
+    session_state foi descartado), ao reprocessar ou quando o processo encerra.
+    """
+
+    def __init__(self):
+        self.caminho = tempfile.mkdtemp(prefix=PREFIXO_PASTA)
+        self._finalizador = weakref.finalize(self, shutil.rmtree, self.caminho, True)
+
+    def remover(self):
+        self._finalizador()
+
+
+def _varrer_pastas_orfas():
+    """Uma vez por processo: apaga pastas sia_gado_* antigas deixadas por execuções anteriores"""
+    global _varredura_feita
+    if _varredura_feita:
+        return
+    _varredura_feita = True
+    limite = time.time() - IDADE_MAX_PASTA
+    for pasta in Path(tempfile.gettempdir()).glob(PREFIXO_PASTA + "*"):
+        try:
+            if pasta.is_dir() and pasta.stat().st_mtime < limite:
+                shutil.rmtree(pasta, ignore_errors=True)
+        except OSError:
+            pass
+
 def show_cattle_detection(yolo_model_path):
     """Interface de detecção de gado"""
     
@@ -21,9 +61,8 @@ def show_cattle_detection(yolo_model_path):
         st.error(f"❌ Modelo YOLO não encontrado em: {yolo_model_path}")
         return
     
-    try:
-        from ultralytics import YOLO
-    except ImportError:
+    # Só verifica se está instalado: importar o ultralytics carrega o torch (segundos)
+    if importlib.util.find_spec("ultralytics") is None or importlib.util.find_spec("cv2") is None:
         st.error("❌ Instale: pip install ultralytics opencv-python")
         return
     
@@ -35,6 +74,8 @@ def show_cattle_detection(yolo_model_path):
         
         if uploaded_file is not None:
             st.success(f"✅ '{uploaded_file.name}' carregado!")
+            somente_contagem = st.checkbox("⚡ Somente contagem (sem vídeo anotado, mais rápido)")
+            gerar_excel = st.checkbox("📊 Gerar também planilha Excel (mais lento em vídeos longos)")
             processar = st.button("🚀 Processar", type="primary", use_container_width=True)
         else:
             processar = False
@@ -53,153 +94,188 @@ def show_cattle_detection(yolo_model_path):
         """)
     
     if uploaded_file is not None and processar:
+        _varrer_pastas_orfas()
+        pasta_sessao = None
         try:
             st.markdown("### 🎬 Processando...")
             
-            with tempfile.TemporaryDirectory() as temp_dir:
-                input_video_path = os.path.join(temp_dir, "input.mp4")
-                with open(input_video_path, "wb") as f:
-                    f.write(uploaded_file.read())
-                
-                output_video_path = os.path.join(temp_dir, "output.mp4")
-                metricas_path = os.path.join(temp_dir, "metricas.xlsx")
-                
-                with st.spinner("🔄 Carregando YOLO..."):
-                    model = YOLO(yolo_model_path)
-                
-                video = cv2.VideoCapture(input_video_path)
-                
-                if not video.isOpened():
-                    st.error("❌ Erro ao abrir vídeo")
-                    return
-                
-                frame_width = int(video.get(cv2.CAP_PROP_FRAME_WIDTH))
-                frame_height = int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                fps = int(video.get(cv2.CAP_PROP_FPS))
-                total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
-                
-                fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-                output_video = cv2.VideoWriter(output_video_path, fourcc, fps, (frame_width, frame_height))
-                
-                metricas = []
-                frame_count = 0
-                
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                while True:
-                    check, img = video.read()
-                    if not check:
-                        break
-                    
-                    frame_count += 1
-                    inicio = time.time()
-                    
-                    results = model(img, verbose=False)[0]
-                    nomes = results.names
-                    
-                    cow_count_frame = 0
-                    
-                    for box in results.boxes:
-                        x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                        cls = int(box.cls.item())
-                        nomeClasse = nomes[cls]
-                        conf = float(box.conf.item())
-                        
-                        if conf < 0.5:
-                            continue
-                        
-                        if nomeClasse.lower() == "cow":
-                            cow_count_frame += 1
-                        
-                        texto = f"{nomeClasse} - {conf:.2f}"
-                        cv2.putText(img, texto, (x1, y1 - 10),
-                                    cv2.FONT_HERSHEY_COMPLEX, 0.8, (250, 250, 250), 2)
-                        
-                        cor = (0, 250, 0) if nomeClasse.lower() == "cow" else (0, 0, 255)
-                        cv2.rectangle(img, (x1, y1), (x2, y2), cor, 3)
-                    
-                    cv2.putText(img, f"Contagem: {cow_count_frame}", (20, 40),
-                                cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 0), 2)
-                    
-                    tempo_inferencia = time.time() - inicio
-                    fps_atual = 1 / tempo_inferencia if tempo_inferencia > 0 else 0
-                    
-                    metricas.append({
-                        "Frame": frame_count,
-                        "Tempo_inferencia (s)": round(tempo_inferencia, 4),
-                        "FPS": round(fps_atual, 2),
-                        "Vacas no Frame": cow_count_frame
-                    })
-                    
-                    output_video.write(img)
-                    
-                    progress = int((frame_count / total_frames) * 100)
-                    progress_bar.progress(progress)
-                    status_text.text(f"Frame {frame_count}/{total_frames} - Vacas: {cow_count_frame}")
-                
-                video.release()
-                output_video.release()
-                
-                df_metricas = pd.DataFrame(metricas)
+            # Pasta persistente por sessão: downloads e gráfico continuam
+            # disponíveis nas próximas interações sem reprocessar o vídeo
+            anterior = st.session_state.pop('resultado_gado', None)
+            if anterior:
+                anterior['pasta_sessao'].remover()
+            pasta_sessao = _PastaSessao()
+            temp_dir = pasta_sessao.caminho
+            
+            input_video_path = os.path.join(temp_dir, "input.mp4")
+            uploaded_file.seek(0)
+            with open(input_video_path, "wb") as f:
+                shutil.copyfileobj(uploaded_file, f, length=TAMANHO_BLOCO_UPLOAD)
+            
+            output_video_path = None if somente_contagem else os.path.join(temp_dir, "output.mp4")
+            deteccoes_path = os.path.join(temp_dir, "deteccoes.npz")
+            metricas_csv_path = os.path.join(temp_dir, "metricas.csv")
+            metricas_path = os.path.join(temp_dir, "metricas.xlsx") if gerar_excel else None
+            
+            with st.spinner("🔄 Carregando YOLO..."):
+                from modules.motor_deteccao import carregar_modelo, processar_video, resumir_metricas
+                model = carregar_modelo(yolo_model_path)
+            
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+            
+            def atualizar_progresso(frame_count, total_frames, cow_count_frame):
+                progress = min(int((frame_count / max(total_frames, 1)) * 100), 100)
+                progress_bar.progress(progress)
+                status_text.text(f"Frame {frame_count}/{total_frames} - Vacas: {cow_count_frame}")
+            
+            df_metricas = processar_video(model, input_video_path, output_video_path,
+                                          ao_processar_frame=atualizar_progresso,
+                                          arquivo_deteccoes=deteccoes_path)
+            # Em somente contagem a entrada fica na pasta: o vídeo anotado
+            # pode ser gerado depois a partir do .npz, sem nova inferência
+            if not somente_contagem:
+                os.remove(input_video_path)
+                input_video_path = None
+            df_metricas.to_csv(metricas_csv_path, index=False)
+            if metricas_path:
                 df_metricas.to_excel(metricas_path, index=False)
-                
-                st.success("✅ Processamento concluído!")
-                
-                # Salvar contexto
-                if 'contexto_json' not in st.session_state:
-                    st.session_state.contexto_json = {}
-                
-                st.session_state.contexto_json['deteccao_gado'] = {
-                    'frames_processados': int(frame_count),
-                    'media_vacas': float(df_metricas["Vacas no Frame"].mean()),
-                    'maximo_vacas': int(df_metricas["Vacas no Frame"].max()),
-                    'fps_medio': float(df_metricas["FPS"].mean()),
-                    'nome_arquivo': uploaded_file.name
-                }
-                
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    st.metric("📊 Frames", frame_count)
-                with col2:
-                    st.metric("🐄 Média Vacas", f"{df_metricas['Vacas no Frame'].mean():.1f}")
-                with col3:
-                    st.metric("📈 Máximo", int(df_metricas["Vacas no Frame"].max()))
-                with col4:
-                    st.metric("⚡ FPS", f"{df_metricas['FPS'].mean():.1f}")
-                
-                st.markdown("### 📥 Downloads")
-                col_a, col_b = st.columns(2)
-                
-                with col_a:
-                    with open(output_video_path, "rb") as video_file:
-                        st.download_button(
-                            label="⬇️ Vídeo Processado",
-                            data=video_file,
-                            file_name="video_deteccoes.mp4",
-                            mime="video/mp4",
-                            use_container_width=True
-                        )
-                
-                with col_b:
-                    with open(metricas_path, "rb") as excel_file:
-                        st.download_button(
-                            label="⬇️ Métricas Excel",
-                            data=excel_file,
-                            file_name="metricas.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                            use_container_width=True
-                        )
-                
-                st.markdown("### 📊 Gráfico")
-                fig, ax = plt.subplots(figsize=(10, 4))
-                ax.plot(df_metricas["Frame"], df_metricas["Vacas no Frame"], color='green', linewidth=2)
-                ax.fill_between(df_metricas["Frame"], df_metricas["Vacas no Frame"], alpha=0.3, color='green')
-                ax.set_xlabel("Frame")
-                ax.set_ylabel("Vacas")
-                ax.set_title("Contagem por Frame")
-                ax.grid(True, alpha=0.3)
-                st.pyplot(fig)
+            
+            resumo = resumir_metricas(df_metricas, uploaded_file.name)
+            st.session_state.resultado_gado = {
+                'pasta_sessao': pasta_sessao,
+                'pasta': temp_dir,
+                'df_metricas': df_metricas,
+                'resumo': resumo,
+                'entrada': input_video_path,
+                'video': output_video_path,
+                'deteccoes': deteccoes_path,
+                'csv': metricas_csv_path,
+                'excel': metricas_path
+            }
+            
+            # Salvar contexto
+            if 'contexto_json' not in st.session_state:
+                st.session_state.contexto_json = {}
+            
+            st.session_state.contexto_json['deteccao_gado'] = resumo
+            
+            progress_bar.empty()
+            status_text.empty()
+            st.success("✅ Processamento concluído!")
         
         except Exception as e:
+            # Falhou antes de virar o resultado da sessão: a pasta nova não fica para trás
+            if pasta_sessao is not None and 'resultado_gado' not in st.session_state:
+                pasta_sessao.remover()
             st.error(f"❌ Erro: {str(e)}")
+    
+    resultado = st.session_state.get('resultado_gado')
+    if resultado and os.path.isdir(resultado['pasta']):
+        _mostrar_resultado(resultado)
+
+
+def _mostrar_resultado(resultado):
+    """Renderiza a última detecção guardada em session_state"""
+    df_metricas = resultado['df_metricas']
+    # Métricas do resumo: com zero frames decodificados ele vem zerado (df.max() seria NaN)
+    resumo = resultado['resumo']
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("📊 Frames", resumo['frames_processados'])
+    with col2:
+        st.metric("🐄 Média Vacas", f"{resumo['media_vacas']:.1f}")
+    with col3:
+        st.metric("📈 Máximo", resumo['maximo_vacas'])
+    with col4:
+        st.metric("⚡ FPS", f"{resumo['fps_medio']:.1f}")
+    
+    if df_metricas.empty:
+        st.warning("⚠️ Nenhum frame foi decodificado: verifique se o vídeo está íntegro.")
+        return
+    
+    st.markdown("### 📥 Downloads")
+    col_a, col_b = st.columns(2)
+    
+    with col_a:
+        if not resultado['video'] and st.button(
+                "🎬 Gerar vídeo anotado", use_container_width=True,
+                help="Desenha as detecções salvas no vídeo, sem nova inferência"):
+            _renderizar_resultado(resultado)
+        
+        if resultado['video']:
+            with open(resultado['video'], "rb") as video_file:
+                st.download_button(
+                    label="⬇️ Vídeo Processado",
+                    data=video_file,
+                    file_name="video_deteccoes.mp4",
+                    mime="video/mp4",
+                    use_container_width=True
+                )
+        else:
+            with open(resultado['deteccoes'], "rb") as det_file:
+                st.download_button(
+                    label="⬇️ Detecções (.npz)",
+                    data=det_file,
+                    file_name="deteccoes.npz",
+                    mime="application/octet-stream",
+                    use_container_width=True
+                )
+    
+    with col_b:
+        if resultado['excel']:
+            with open(resultado['excel'], "rb") as excel_file:
+                st.download_button(
+                    label="⬇️ Métricas Excel",
+                    data=excel_file,
+                    file_name="metricas.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True
+                )
+        with open(resultado['csv'], "rb") as csv_file:
+            st.download_button(
+                label="⬇️ Métricas CSV",
+                data=csv_file,
+                file_name="metricas.csv",
+                mime="text/csv",
+                use_container_width=True
+            )
+    
+    st.markdown("### 📊 Gráfico")
+    if 'grafico' not in resultado:
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots(figsize=(10, 4))
+        ax.plot(df_metricas["Frame"], df_metricas["Vacas no Frame"], color='green', linewidth=2)
+        ax.fill_between(df_metricas["Frame"], df_metricas["Vacas no Frame"], alpha=0.3, color='green')
+        ax.set_xlabel("Frame")
+        ax.set_ylabel("Vacas")
+        ax.set_title("Contagem por Frame")
+        ax.grid(True, alpha=0.3)
+        resultado['grafico'] = fig
+    st.pyplot(resultado['grafico'])
+
+
+def _renderizar_resultado(resultado):
+    """Gera o vídeo anotado do resultado em somente contagem a partir das detecções salvas"""
+    from modules.motor_deteccao import renderizar_video
+    
+    output_video_path = os.path.join(resultado['pasta'], "output.mp4")
+    progress_bar = st.progress(0)
+    
+    def atualizar_progresso(frame_count, total_frames, _vacas):
+        progress_bar.progress(min(int((frame_count / max(total_frames, 1)) * 100), 100))
+    
+    try:
+        renderizar_video(resultado['entrada'], resultado['deteccoes'], output_video_path,
+                         ao_processar_frame=atualizar_progresso)
+    except Exception as e:
+        st.error(f"❌ Erro ao renderizar: {str(e)}")
+        return
+    finally:
+        progress_bar.empty()
+    
+    # Vídeo gerado: a cópia da entrada não é mais necessária
+    os.remove(resultado['entrada'])
+    resultado['entrada'] = None
+    resultado['video'] = output_video_path
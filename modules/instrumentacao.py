@@ -0,0 +1,456 @@
+"""
+Instrumentação do SIA
+Spans de tempo e contadores nos pontos quentes, exportáveis como texto
+Prometheus ou JSON lines, e um perfilador por amostragem para spans lentos
+
+Desligada por padrão: span() devolve um objeto nulo e contar()/observar()
+retornam na primeira linha. Configuração por variáveis de ambiente:
+    SIA_METRICAS=1                 liga a coleta
+    SIA_METRICAS_ARQUIVO=sia.prom  exporta periodicamente e ao sair (.prom ou .jsonl)
+    SIA_METRICAS_INTERVALO=15      segundos entre exportações
+    SIA_PERFIL_LIMIAR=1.0          amostra spans perfiláveis e grava os que passarem do limiar
+    SIA_PERFIL_PASTA=perfis        onde gravar as pilhas (.folded, para flamegraph.pl/speedscope)
+"""
+
+import atexit
+import collections
+import json
+import os
+import re
+import sys
+import threading
+import time
+import warnings
+from pathlib import Path
+
+# Limites dos buckets dos histogramas (segundos), de ~inferência por frame a treino
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_ativa = False
+_lock = threading.Lock()
+_contadores = {}
+_histogramas = {}
+_perfilador = None
+_exportacoes = {}
+
+
+def ativa():
+    return _ativa
+
+
+def ativar():
+    global _ativa
+    _ativa = True
+
+
+def desativar():
+    global _ativa
+    _ativa = False
+
+
+def limpar():
+    """Zera contadores e histogramas"""
+    with _lock:
+        _contadores.clear()
+        _histogramas.clear()
+
+
+def _chave(nome, rotulos):
+    return nome, tuple(sorted(rotulos.items())) if rotulos else ()
+
+
+# ==================== REGISTRO ====================
+
+def contar(nome, valor=1, **rotulos):
+    """Soma `valor` ao contador `nome` (com rótulos opcionais)"""
+    if not _ativa:
+        return
+    chave = _chave(nome, rotulos)
+    with _lock:
+        _contadores[chave] = _contadores.get(chave, 0) + valor
+
+
+def observar(nome, segundos, **rotulos):
+    """Registra uma duração já medida no histograma `nome`"""
+    if not _ativa:
+        return
+    chave = _chave(nome, rotulos)
+    with _lock:
+        h = _histogramas.get(chave)
+        if h is None:
+            h = _histogramas[chave] = {'contagem': 0, 'soma': 0.0, 'max': 0.0, 'buckets': [0] * len(BUCKETS)}
+        h['contagem'] += 1
+        h['soma'] += segundos
+        if segundos > h['max']:
+            h['max'] = segundos
+        for i, limite in enumerate(BUCKETS):
+            if segundos <= limite:
+                h['buckets'][i] += 1
+                break
+
+
+class _SpanNulo:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULO = _SpanNulo()
+
+
+class _Span:
+    __slots__ = ('nome', 'rotulos', 'perfilavel', 'inicio', 'duracao')
+
+    def __init__(self, nome, rotulos, perfilavel):
+        self.nome = nome
+        self.rotulos = rotulos
+        self.perfilavel = perfilavel
+        self.duracao = None
+
+    def __enter__(self):
+        if self.perfilavel and _perfilador is not None:
+            _perfilador.iniciar(threading.get_ident())
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, *exc):
+        self.duracao = time.perf_counter() - self.inicio
+        observar(self.nome, self.duracao, **self.rotulos)
+        # Só exceções reais: st.rerun()/st.stop() usam BaseException como controle de fluxo
+        if tipo is not None and issubclass(tipo, Exception):
+            contar(self.nome + "_erros", **self.rotulos)
+        if self.perfilavel and _perfilador is not None:
+            _perfilador.finalizar(threading.get_ident(), self.nome, self.rotulos, self.duracao)
+        return False
+
+
+def span(nome, perfilavel=False, **rotulos):
+    """
+    Mede o bloco `with` no histograma `nome`
+
+    perfilavel: com o perfilador ligado, amostra a pilha da thread durante o
+    bloco e grava um flame graph se ele passar do limiar (use em requisições,
+    não em laços por frame)
+    """
+    if not _ativa:
+        return _NULO
+    return _Span(nome, rotulos, perfilavel)
+
+
+def cronometrar(nome=None, perfilavel=False):
+    """Decorador: span com o nome da função (ou `nome`) em cada chamada"""
+    def decorador(funcao):
+        rotulo = nome or funcao.__name__
+
+        def envolvida(*args, **kwargs):
+            if not _ativa:
+                return funcao(*args, **kwargs)
+            with _Span(rotulo, {}, perfilavel):
+                return funcao(*args, **kwargs)
+        envolvida.__name__ = funcao.__name__
+        envolvida.__doc__ = funcao.__doc__
+        envolvida.__wrapped__ = funcao
+        return envolvida
+    return decorador
+
+
+# ==================== EXPORTAÇÃO ====================
+
+def _copiar_registro():
+    contadores = [{'nome': n, 'rotulos': dict(r), 'valor': v} for (n, r), v in _contadores.items()]
+    histogramas = [{'nome': n, 'rotulos': dict(r), 'contagem': h['contagem'], 'soma_s': h['soma'],
+                    'max_s': h['max'], 'buckets': list(h['buckets'])}
+                   for (n, r), h in _histogramas.items()]
+    return {'contadores': contadores, 'histogramas': histogramas}
+
+
+def instantaneo():
+    """Cópia dos contadores e histogramas: {'contadores': [...], 'histogramas': [...]}"""
+    with _lock:
+        return _copiar_registro()
+
+
+def coletar():
+    """Instantâneo do que foi medido desde a última coleta (zera o registro)"""
+    with _lock:
+        dados = _copiar_registro()
+        _contadores.clear()
+        _histogramas.clear()
+    return dados
+
+
+def mesclar(dados):
+    """Soma ao registro um instantâneo coletado em outro processo (ex.: worker de um pool)"""
+    with _lock:
+        for c in dados['contadores']:
+            chave = _chave(c['nome'], c['rotulos'])
+            _contadores[chave] = _contadores.get(chave, 0) + c['valor']
+        for h in dados['histogramas']:
+            chave = _chave(h['nome'], h['rotulos'])
+            atual = _histogramas.get(chave)
+            if atual is None:
+                atual = _histogramas[chave] = {'contagem': 0, 'soma': 0.0, 'max': 0.0,
+                                               'buckets': [0] * len(BUCKETS)}
+            atual['contagem'] += h['contagem']
+            atual['soma'] += h['soma_s']
+            atual['max'] = max(atual['max'], h['max_s'])
+            atual['buckets'] = [a + b for a, b in zip(atual['buckets'], h['buckets'])]
+
+
+def iniciar_worker(ativa_no_pai):
+    """
+    Inicializador dos pools de processos: mede como o processo pai, mas não exporta
+
+    Workers de ProcessPoolExecutor saem com os._exit (sem atexit) e gravariam o
+    mesmo arquivo que o pai; em vez disso, cada tarefa devolve coletar() e o
+    pai faz mesclar() e exporta tudo.
+    """
+    parar_exportacao_periodica()
+    # Com fork, o filho herda o registro do pai: começa zerado para não contar em dobro
+    limpar()
+    if ativa_no_pai:
+        ativar()
+    else:
+        desativar()
+
+
+def _nome_prometheus(nome):
+    return "sia_" + re.sub(r"[^a-zA-Z0-9_]", "_", nome)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos_prometheus(rotulos, extra=None):
+    itens = list(rotulos.items()) + list((extra or {}).items())
+    if not itens:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in itens) + "}"
+
+
+def exportar_prometheus():
+    """Texto no formato de exposição do Prometheus (contadores e histogramas)"""
+    dados = instantaneo()
+    linhas = []
+    por_nome = collections.defaultdict(list)
+    for c in dados['contadores']:
+        por_nome[c['nome']].append(c)
+    for nome, itens in sorted(por_nome.items()):
+        metrica = _nome_prometheus(nome) + "_total"
+        linhas.append(f"# TYPE {metrica} counter")
+        for c in itens:
+            linhas.append(f"{metrica}{_rotulos_prometheus(c['rotulos'])} {c['valor']}")
+
+    por_nome = collections.defaultdict(list)
+    for h in dados['histogramas']:
+        por_nome[h['nome']].append(h)
+    for nome, itens in sorted(por_nome.items()):
+        metrica = _nome_prometheus(nome) + "_segundos"
+        linhas.append(f"# TYPE {metrica} histogram")
+        for h in itens:
+            acumulado = 0
+            for limite, qtd in zip(BUCKETS, h['buckets']):
+                acumulado += qtd
+                linhas.append(f"{metrica}_bucket{_rotulos_prometheus(h['rotulos'], {'le': limite})} {acumulado}")
+            linhas.append(f"{metrica}_bucket{_rotulos_prometheus(h['rotulos'], {'le': '+Inf'})} {h['contagem']}")
+            linhas.append(f"{metrica}_sum{_rotulos_prometheus(h['rotulos'])} {h['soma_s']:.6f}")
+            linhas.append(f"{metrica}_count{_rotulos_prometheus(h['rotulos'])} {h['contagem']}")
+    return "\n".join(linhas) + "\n"
+
+
+def exportar_jsonl():
+    """Uma linha JSON por métrica, com timestamp (para anexar a um arquivo de histórico)"""
+    dados = instantaneo()
+    # pid distingue processos (app, API, lote) anexando ao mesmo arquivo
+    ts, pid = round(time.time(), 3), os.getpid()
+    linhas = [json.dumps({'ts': ts, 'pid': pid, 'tipo': 'contador', **c}, ensure_ascii=False) for c in dados['contadores']]
+    for h in dados['histogramas']:
+        h = dict(h, media_s=h['soma_s'] / h['contagem'] if h['contagem'] else 0.0,
+                 buckets=dict(zip(map(str, BUCKETS), h['buckets'])))
+        linhas.append(json.dumps({'ts': ts, 'pid': pid, 'tipo': 'histograma', **h}, ensure_ascii=False))
+    return "\n".join(linhas) + ("\n" if linhas else "")
+
+
+def exportar_arquivo(caminho):
+    """.jsonl anexa um instantâneo; qualquer outra extensão regrava o texto Prometheus (atômico)"""
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    if caminho.suffix == ".jsonl":
+        with open(caminho, "a", encoding="utf-8") as f:
+            f.write(exportar_jsonl())
+        return caminho
+    temporario = caminho.with_name(caminho.name + ".tmp")
+    temporario.write_text(exportar_prometheus(), encoding="utf-8")
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def iniciar_exportacao_periodica(caminho, intervalo=15.0):
+    """Exporta a cada `intervalo` segundos (thread daemon) e uma última vez ao sair"""
+    caminho = str(caminho)
+    if caminho in _exportacoes:
+        return _exportacoes[caminho]
+    parar = _exportacoes[caminho] = threading.Event()
+
+    def laco():
+        while not parar.wait(intervalo):
+            exportar_arquivo(caminho)
+
+    threading.Thread(target=laco, name="sia-metricas", daemon=True).start()
+    atexit.register(_exportar_ao_sair, caminho)
+    return parar
+
+
+def _exportar_ao_sair(caminho):
+    if caminho in _exportacoes:
+        exportar_arquivo(caminho)
+
+
+def parar_exportacao_periodica():
+    """Para todas as exportações periódicas (e a exportação final ao sair)"""
+    for parar in _exportacoes.values():
+        parar.set()
+    _exportacoes.clear()
+
+
+# ==================== PERFILADOR POR AMOSTRAGEM ====================
+
+class PerfiladorAmostragem:
+    """
+    Uma thread amostra a pilha das threads com span perfilável aberto a cada
+    `intervalo` segundos; spans acima de `limiar` viram arquivos .folded
+    (formato "func;func;func contagem" lido por flamegraph.pl e speedscope)
+
+    Sem span aberto, a thread dorme na condição até o próximo iniciar();
+    parar() a encerra.
+    """
+
+    def __init__(self, limiar=1.0, pasta="perfis", intervalo=0.005):
+        self.limiar = limiar
+        self.pasta = Path(pasta)
+        self.intervalo = intervalo
+        self.gravados = 0
+        self._amostras = {}
+        self._cond = threading.Condition()
+        self._parar = False
+        self._thread = None
+
+    def iniciar(self, thread_id):
+        with self._cond:
+            if self._parar:
+                return
+            # Spans perfiláveis aninhados: só o mais externo grava
+            atual = self._amostras.setdefault(thread_id, {'pilhas': collections.Counter(), 'profundidade': 0})
+            atual['profundidade'] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._amostrar, name="sia-perfilador", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def parar(self):
+        """Encerra a thread de amostragem (spans ainda abertos não gravam perfil)"""
+        with self._cond:
+            self._parar = True
+            self._amostras.clear()
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=1.0)
+
+    def _amostrar(self):
+        with self._cond:
+            while True:
+                while not self._amostras and not self._parar:
+                    self._cond.wait()
+                # Espera o intervalo soltando o lock (spans abrem e fecham enquanto isso)
+                self._cond.wait(self.intervalo)
+                if self._parar:
+                    return
+                quadros = sys._current_frames()
+                for thread_id, atual in self._amostras.items():
+                    quadro = quadros.get(thread_id)
+                    pilha = []
+                    while quadro is not None:
+                        codigo = quadro.f_code
+                        pilha.append(f"{codigo.co_name} ({Path(codigo.co_filename).name}:{quadro.f_lineno})")
+                        quadro = quadro.f_back
+                    if pilha:
+                        atual['pilhas'][";".join(reversed(pilha))] += 1
+
+    def finalizar(self, thread_id, nome, rotulos, duracao):
+        with self._cond:
+            atual = self._amostras.get(thread_id)
+            if atual is None:
+                return None
+            atual['profundidade'] -= 1
+            if atual['profundidade'] > 0:
+                return None
+            contagem = self._amostras.pop(thread_id)['pilhas']
+        if not contagem or duracao < self.limiar:
+            return None
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        sufixo = "_".join(re.sub(r"[^\w.-]", "-", str(v)) for v in rotulos.values())
+        caminho = self.pasta / f"{time.strftime('%Y%m%d-%H%M%S')}_{nome}{'_' + sufixo if sufixo else ''}_{duracao:.2f}s.folded"
+        with open(caminho, "w", encoding="utf-8") as f:
+            for pilha, qtd in contagem.most_common():
+                f.write(f"{pilha} {qtd}\n")
+        self.gravados += 1
+        contar("perfis_gravados", span=nome)
+        return caminho
+
+
+def ligar_perfilador(limiar=1.0, pasta="perfis", intervalo=0.005):
+    """Liga a amostragem dos spans perfiláveis (também liga a coleta de métricas)"""
+    global _perfilador
+    desligar_perfilador()
+    _perfilador = PerfiladorAmostragem(limiar, pasta, intervalo)
+    ativar()
+    return _perfilador
+
+
+def desligar_perfilador():
+    """Para a amostragem e encerra a thread do perfilador"""
+    global _perfilador
+    perfilador, _perfilador = _perfilador, None
+    if perfilador is not None:
+        perfilador.parar()
+
+
+def _float_ambiente(nome, padrao=None, minimo=None):
+    """Variável de ambiente numérica; valor inválido vira aviso e usa `padrao` (não quebra a importação)"""
+    valor = os.getenv(nome)
+    if not valor:
+        return padrao
+    try:
+        numero = float(valor)
+    except ValueError:
+        numero = None
+    if numero is None or (minimo is not None and numero <= minimo):
+        acao = "ignorado" if padrao is None else f"usando {padrao}"
+        warnings.warn(f"{nome}={valor!r} inválido; {acao}", RuntimeWarning, stacklevel=2)
+        return padrao
+    return numero
+
+
+def configurar_por_ambiente():
+    """
+    Aplica SIA_METRICAS, SIA_METRICAS_ARQUIVO/INTERVALO e SIA_PERFIL_LIMIAR/PASTA
+
+    Roda na importação; pode ser chamada de novo depois de carregar um .env
+    """
+    if os.getenv("SIA_METRICAS", "").lower() in ("1", "true", "sim"):
+        ativar()
+    limiar = _float_ambiente("SIA_PERFIL_LIMIAR")
+    if limiar is not None and _perfilador is None:
+        ligar_perfilador(limiar, os.getenv("SIA_PERFIL_PASTA", "perfis"))
+    arquivo = os.getenv("SIA_METRICAS_ARQUIVO")
+    if arquivo and _ativa:
+        iniciar_exportacao_periodica(arquivo, _float_ambiente("SIA_METRICAS_INTERVALO", 15.0, minimo=0))
+
+
+configurar_por_ambiente()
@@ -0,0 +1,260 @@
+"""
+Monitoramento de Gado ao Vivo
+Conta animais em uma fonte contínua (câmera, pipe/URL ou arquivo em tempo real)
+com latência limitada: frames atrasados são descartados
+
+Uso:
+    python -m modules.monitor_gado 0 --latencia-max 0.5          # câmera 0
+    python -m modules.monitor_gado rtsp://camera/baia --saida-json status.json
+    python -m modules.monitor_gado video.mp4                      # arquivo na taxa nativa
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from modules.instrumentacao import contar, observar
+from modules.motor_deteccao import carregar_modelo, detectar_frame, contar_vacas
+from modules.processamento_lote import MODELO_PADRAO
+
+
+class LeitorAoVivo(threading.Thread):
+    """
+    Lê a fonte em uma thread própria e mantém apenas o frame mais recente
+
+    Se a inferência não consumir um frame antes do próximo chegar, o antigo é
+    sobrescrito (contado em `sobrescritos`) em vez de formar fila.
+    """
+
+    def __init__(self, fonte, tempo_real=False):
+        super().__init__(daemon=True)
+        self.captura = cv2.VideoCapture(fonte)
+        if not self.captura.isOpened():
+            raise IOError(f"Erro ao abrir fonte: {fonte}")
+
+        fps = self.captura.get(cv2.CAP_PROP_FPS) or 0
+        # Arquivos locais são reproduzidos na taxa nativa para simular a câmera
+        self.intervalo = 1.0 / fps if tempo_real and fps > 0 else 0.0
+
+        self._cond = threading.Condition()
+        self._parar = threading.Event()
+        self._frame = None
+        self.lidos = 0
+        self.sobrescritos = 0
+        self.encerrado = False
+
+    def run(self):
+        proximo = time.monotonic()
+        try:
+            while not self._parar.is_set():
+                check, img = self.captura.read()
+                if not check:
+                    break
+
+                with self._cond:
+                    self.lidos += 1
+                    if self._frame is not None:
+                        self.sobrescritos += 1
+                    self._frame = (self.lidos, time.monotonic(), img)
+                    self._cond.notify()
+
+                if self.intervalo:
+                    proximo = max(proximo + self.intervalo, time.monotonic())
+                    espera = proximo - time.monotonic()
+                    if espera > 0:
+                        time.sleep(espera)
+        finally:
+            self.captura.release()
+            with self._cond:
+                self.encerrado = True
+                self._cond.notify_all()
+
+    def proximo_frame(self, timeout=1.0):
+        """Retorna (numero, instante_captura, img) do frame mais recente, ou None"""
+        with self._cond:
+            if self._frame is None and not self.encerrado:
+                self._cond.wait(timeout)
+            frame, self._frame = self._frame, None
+            return frame
+
+    def parar(self):
+        self._parar.set()
+
+
+class EstatisticasAoVivo:
+    """Estatísticas contínuas: contagens e latências em janela deslizante"""
+
+    def __init__(self, janela=100):
+        self.contagens = deque(maxlen=janela)
+        self.latencias = deque(maxlen=janela)
+        self.tempos_inferencia = deque(maxlen=janela)
+        self.processados = 0
+        self.descartados_atraso = 0
+        self.contagem_atual = 0
+        self.inicio = time.monotonic()
+
+    def registrar(self, contagem, latencia, tempo_inferencia):
+        self.processados += 1
+        self.contagem_atual = contagem
+        self.contagens.append(contagem)
+        self.latencias.append(latencia)
+        self.tempos_inferencia.append(tempo_inferencia)
+        observar('monitor_latencia', latencia)
+
+    def descartar(self):
+        self.descartados_atraso += 1
+        contar('monitor_frames_descartados')
+
+    def tempo_inferencia_medio(self):
+        return float(np.mean(self.tempos_inferencia)) if self.tempos_inferencia else 0.0
+
+    def resumo(self, leitor=None):
+        """Dict publicado a cada intervalo (JSON-serializável)"""
+        lat = np.asarray(self.latencias) * 1000
+        lidos = leitor.lidos if leitor else self.processados + self.descartados_atraso
+        sobrescritos = leitor.sobrescritos if leitor else 0
+        descartados = self.descartados_atraso + sobrescritos
+        decorrido = time.monotonic() - self.inicio
+
+        return {
+            'contagem_atual': int(self.contagem_atual),
+            'media_vacas': float(np.mean(self.contagens)) if self.contagens else 0.0,
+            'maximo_vacas': int(max(self.contagens)) if self.contagens else 0,
+            'frames_lidos': int(lidos),
+            'frames_processados': int(self.processados),
+            'frames_descartados': int(descartados),
+            'descartados_atraso': int(self.descartados_atraso),
+            'descartados_sobrescritos': int(sobrescritos),
+            'taxa_descarte': round(descartados / lidos, 4) if lidos else 0.0,
+            'latencia_media_ms': round(float(lat.mean()), 1) if lat.size else 0.0,
+            'latencia_p95_ms': round(float(np.percentile(lat, 95)), 1) if lat.size else 0.0,
+            'latencia_max_ms': round(float(lat.max()), 1) if lat.size else 0.0,
+            'fps_processado': round(self.processados / decorrido, 2) if decorrido > 0 else 0.0
+        }
+
+
+def _abrir_fonte(fonte):
+    """'0' vira índice de câmera; demais valores vão direto ao VideoCapture"""
+    return int(fonte) if str(fonte).isdigit() else str(fonte)
+
+
+def monitorar(model, fonte, latencia_maxima=0.5, janela=100, ao_publicar=None,
+              intervalo_publicacao=1.0, tempo_real=None, duracao_maxima=None):
+    """
+    Conta gado continuamente em uma fonte ao vivo
+
+    Um frame só é inferido se, somado ao tempo médio de inferência, ainda couber
+    em latencia_maxima (segundos, da captura ao resultado); senão é descartado.
+
+    Args:
+        model: modelo YOLO já carregado
+        fonte: índice de câmera, URL/pipe ou arquivo de vídeo
+        latencia_maxima: limite de latência ponta a ponta em segundos
+        janela: número de frames processados nas estatísticas deslizantes
+        ao_publicar: callback(resumo_dict) chamado a cada intervalo_publicacao
+        tempo_real: reproduz arquivos na taxa nativa (padrão: True para arquivos locais)
+        duracao_maxima: encerra após N segundos (None = até a fonte acabar)
+
+    Returns:
+        dict com o resumo final
+    """
+    fonte = _abrir_fonte(fonte)
+    if tempo_real is None:
+        tempo_real = isinstance(fonte, str) and Path(fonte).is_file()
+
+    leitor = LeitorAoVivo(fonte, tempo_real=tempo_real)
+    stats = EstatisticasAoVivo(janela)
+    leitor.start()
+
+    inicio = time.monotonic()
+    proxima_publicacao = inicio + intervalo_publicacao
+
+    try:
+        while True:
+            agora = time.monotonic()
+            if duracao_maxima is not None and agora - inicio >= duracao_maxima:
+                break
+
+            frame = leitor.proximo_frame()
+            if frame is None:
+                if leitor.encerrado:
+                    break
+                continue
+
+            _, capturado_em, img = frame
+            idade = time.monotonic() - capturado_em
+            tempo_medio = stats.tempo_inferencia_medio()
+            # Se só a inferência já passa do limite, processa o frame mais recente (melhor esforço)
+            if tempo_medio < latencia_maxima and idade + tempo_medio > latencia_maxima:
+                stats.descartar()
+                continue
+
+            ini_inferencia = time.monotonic()
+            contagem = contar_vacas(detectar_frame(model, img))
+            fim = time.monotonic()
+            stats.registrar(contagem, fim - capturado_em, fim - ini_inferencia)
+
+            if ao_publicar and fim >= proxima_publicacao:
+                ao_publicar(stats.resumo(leitor))
+                proxima_publicacao = fim + intervalo_publicacao
+    finally:
+        leitor.parar()
+        leitor.join(timeout=2)
+
+    resumo = stats.resumo(leitor)
+    if ao_publicar:
+        ao_publicar(resumo)
+    return resumo
+
+
+def _publicar_arquivo(caminho):
+    """Publicador que grava o resumo em JSON de forma atômica (para outros processos lerem)"""
+    caminho = Path(caminho)
+
+    def publicar(resumo):
+        temp = caminho.with_suffix(caminho.suffix + ".tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(resumo, f, ensure_ascii=False)
+        os.replace(temp, caminho)
+        print(f"🐄 {resumo['contagem_atual']} (média {resumo['media_vacas']:.1f}) | "
+              f"latência p95 {resumo['latencia_p95_ms']:.0f}ms | "
+              f"descartados {resumo['frames_descartados']}/{resumo['frames_lidos']}")
+    return publicar
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    parser = argparse.ArgumentParser(description="Contagem de gado ao vivo com latência limitada")
+    parser.add_argument("fonte", help="Índice da câmera, URL/pipe ou arquivo de vídeo")
+    parser.add_argument("--modelo", default=str(MODELO_PADRAO), help="Caminho do modelo YOLO")
+    parser.add_argument("--latencia-max", type=float, default=0.5, help="Latência máxima em segundos (padrão: 0.5)")
+    parser.add_argument("--janela", type=int, default=100, help="Frames na janela das estatísticas (padrão: 100)")
+    parser.add_argument("--intervalo", type=float, default=1.0, help="Segundos entre publicações (padrão: 1)")
+    parser.add_argument("--duracao", type=float, default=None, help="Encerra após N segundos")
+    parser.add_argument("--saida-json", default="monitor_gado.json", help="Arquivo JSON atualizado a cada publicação")
+    args = parser.parse_args(argv)
+
+    if not Path(args.modelo).exists():
+        print(f"❌ Modelo YOLO não encontrado em: {args.modelo}", file=sys.stderr)
+        return 1
+
+    model = carregar_modelo(args.modelo)
+    try:
+        monitorar(model, args.fonte, args.latencia_max, args.janela,
+                  ao_publicar=_publicar_arquivo(args.saida_json),
+                  intervalo_publicacao=args.intervalo, duracao_maxima=args.duracao)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,502 @@
+"""
+Motor de Detecção de Gado (sem interface)
+Lógica de inferência YOLO compartilhada pela aba do Streamlit e pelo processamento em lote
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from modules import instrumentacao
+from modules.instrumentacao import contar, span
+
+CONFIANCA_MINIMA = 0.5
+CLASSE_ALVO = "cow"
+
+COLUNA_FRAME = "Frame"
+COLUNA_TEMPO = "Tempo_inferencia (s)"
+COLUNA_FPS = "FPS"
+COLUNA_VACAS = "Vacas no Frame"
+
+
+def carregar_modelo(yolo_model_path):
+    """Carrega o modelo YOLO (import tardio do ultralytics)"""
+    from ultralytics import YOLO
+    return YOLO(yolo_model_path)
+
+
+def detectar_frame(model, img, confianca_minima=CONFIANCA_MINIMA):
+    """
+    Roda o YOLO em um frame
+
+    Returns:
+        lista de tuplas (nome_classe, confianca, x1, y1, x2, y2) acima da confiança mínima
+    """
+    with span('inferencia'):
+        results = model(img, verbose=False)[0]
+    nomes = results.names
+
+    deteccoes = []
+    for box in results.boxes:
+        conf = float(box.conf.item())
+        if conf < confianca_minima:
+            continue
+
+        x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
+        nome_classe = nomes[int(box.cls.item())]
+        deteccoes.append((nome_classe, conf, x1, y1, x2, y2))
+
+    return deteccoes
+
+
+def contar_vacas(deteccoes):
+    """Conta quantas detecções são da classe alvo"""
+    return sum(1 for d in deteccoes if d[0].lower() == CLASSE_ALVO)
+
+
+def desenhar_frame(img, deteccoes, contagem):
+    """Desenha caixas, rótulos e a contagem no frame (in-place)"""
+    for nome_classe, conf, x1, y1, x2, y2 in deteccoes:
+        texto = f"{nome_classe} - {conf:.2f}"
+        cv2.putText(img, texto, (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_COMPLEX, 0.8, (250, 250, 250), 2)
+
+        cor = (0, 250, 0) if nome_classe.lower() == CLASSE_ALVO else (0, 0, 255)
+        cv2.rectangle(img, (x1, y1), (x2, y2), cor, 3)
+
+    cv2.putText(img, f"Contagem: {contagem}", (20, 40),
+                cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 0), 2)
+    return img
+
+
+class MetricasFrames:
+    """Métricas por frame em colunas NumPy pré-alocadas (sem um dict por frame)"""
+
+    def __init__(self, capacidade):
+        capacidade = max(int(capacidade), 1)
+        self.n = 0
+        self.frame = np.empty(capacidade, dtype=np.int64)
+        self.tempo = np.empty(capacidade, dtype=np.float64)
+        self.vacas = np.empty(capacidade, dtype=np.int32)
+
+    def adicionar(self, frame, tempo, vacas):
+        """Registra um frame; dobra a capacidade se CAP_PROP_FRAME_COUNT subestimou o vídeo"""
+        if self.n == len(self.frame):
+            nova = len(self.frame) * 2
+            self.frame = np.resize(self.frame, nova)
+            self.tempo = np.resize(self.tempo, nova)
+            self.vacas = np.resize(self.vacas, nova)
+        self.frame[self.n] = frame
+        self.tempo[self.n] = tempo
+        self.vacas[self.n] = vacas
+        self.n += 1
+
+    def para_dataframe(self):
+        """DataFrame com as colunas usadas no Excel/CSV de métricas"""
+        tempo = self.tempo[:self.n]
+        fps = np.divide(1.0, tempo, out=np.zeros_like(tempo), where=tempo > 0)
+        return pd.DataFrame({
+            COLUNA_FRAME: self.frame[:self.n],
+            COLUNA_TEMPO: np.round(tempo, 4),
+            COLUNA_FPS: np.round(fps, 2),
+            COLUNA_VACAS: self.vacas[:self.n]
+        })
+
+
+class RegistroDeteccoes:
+    """
+    Acumula detecções (frame, classe, confiança, caixa) e grava em arquivo colunar .npz
+
+    Colunas NumPy que dobram de capacidade (como MetricasFrames): ~26 bytes por
+    detecção, em vez de tuplas e floats Python por detecção.
+    """
+
+    def __init__(self, capacidade=1024):
+        capacidade = max(int(capacidade), 1)
+        self.nomes = []
+        self._indice_nome = {}
+        self.n = 0
+        self.frame = np.empty(capacidade, dtype=np.int32)
+        self.classe = np.empty(capacidade, dtype=np.int16)
+        self.confianca = np.empty(capacidade, dtype=np.float32)
+        self.caixa = np.empty((capacidade, 4), dtype=np.int32)
+
+    def _garantir(self, extra):
+        """Dobra a capacidade até caber mais `extra` detecções"""
+        nova = len(self.frame)
+        while self.n + extra > nova:
+            nova *= 2
+        if nova != len(self.frame):
+            self.frame = np.resize(self.frame, nova)
+            self.classe = np.resize(self.classe, nova)
+            self.confianca = np.resize(self.confianca, nova)
+            self.caixa = np.resize(self.caixa, (nova, 4))
+
+    def adicionar(self, frame, deteccoes):
+        """Registra as detecções de um frame (numeração absoluta)"""
+        if not deteccoes:
+            return
+        self._garantir(len(deteccoes))
+        for nome_classe, conf, x1, y1, x2, y2 in deteccoes:
+            indice = self._indice_nome.get(nome_classe)
+            if indice is None:
+                indice = self._indice_nome[nome_classe] = len(self.nomes)
+                self.nomes.append(nome_classe)
+            i = self.n
+            self.frame[i] = frame
+            self.classe[i] = indice
+            self.confianca[i] = conf
+            self.caixa[i] = (x1, y1, x2, y2)
+            self.n += 1
+
+    def salvar(self, caminho):
+        """Grava as colunas em .npz comprimido"""
+        _salvar_colunas(caminho, self.frame[:self.n], self.classe[:self.n],
+                        self.confianca[:self.n], self.caixa[:self.n], self.nomes)
+
+
+def _salvar_colunas(caminho, frame, classe, confianca, caixa, nomes):
+    """Formato do arquivo de detecções: uma coluna por campo + tabela de nomes de classe"""
+    with open(caminho, "wb") as f:
+        np.savez_compressed(f, frame=frame, classe=classe, confianca=confianca,
+                            caixa=caixa, nomes=np.asarray(nomes, dtype=str))
+
+
+def carregar_deteccoes(caminho):
+    """Lê um arquivo de detecções .npz como dict de arrays"""
+    with np.load(caminho) as dados:
+        return {chave: dados[chave] for chave in dados.files}
+
+
+def concatenar_deteccoes(arquivos, destino):
+    """Une arquivos de detecções (segmentos em ordem), remapeando os nomes de classe"""
+    nomes = []
+    colunas = {'frame': [], 'classe': [], 'confianca': [], 'caixa': []}
+    for arquivo in arquivos:
+        dados = carregar_deteccoes(arquivo)
+        mapa = []
+        for nome in (str(n) for n in dados['nomes']):
+            if nome not in nomes:
+                nomes.append(nome)
+            mapa.append(nomes.index(nome))
+        colunas['frame'].append(dados['frame'])
+        colunas['classe'].append(np.asarray(mapa, dtype=np.int16)[dados['classe']])
+        colunas['confianca'].append(dados['confianca'])
+        colunas['caixa'].append(dados['caixa'].reshape(-1, 4))
+
+    _salvar_colunas(destino,
+                    np.concatenate(colunas['frame']).astype(np.int32),
+                    np.concatenate(colunas['classe']).astype(np.int16),
+                    np.concatenate(colunas['confianca']).astype(np.float32),
+                    np.concatenate(colunas['caixa']).astype(np.int32),
+                    nomes)
+
+
+def renderizar_video(input_video_path, arquivo_deteccoes, output_video_path, ao_processar_frame=None):
+    """
+    Gera o vídeo anotado a partir de detecções já gravadas, sem rodar inferência
+
+    Returns:
+        número de frames renderizados
+    """
+    dados = carregar_deteccoes(arquivo_deteccoes)
+    nomes = [str(n) for n in dados['nomes']]
+    frames = dados['frame']
+
+    video = cv2.VideoCapture(str(input_video_path))
+    if not video.isOpened():
+        raise IOError("Erro ao abrir vídeo")
+
+    frame_width = int(video.get(cv2.CAP_PROP_FRAME_WIDTH))
+    frame_height = int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = int(video.get(cv2.CAP_PROP_FPS))
+    total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    output_video = _abrir_writer(output_video_path, fps, frame_width, frame_height)
+
+    frame_count = 0
+    try:
+        while True:
+            with span('video_decodificar'):
+                check, img = video.read()
+            if not check:
+                break
+            frame_count += 1
+
+            # Detecções estão ordenadas por frame: fatia do frame atual
+            ini = np.searchsorted(frames, frame_count, side='left')
+            fim = np.searchsorted(frames, frame_count, side='right')
+            deteccoes = [(nomes[dados['classe'][i]], float(dados['confianca'][i]), *map(int, dados['caixa'][i]))
+                         for i in range(ini, fim)]
+
+            contagem = contar_vacas(deteccoes)
+            with span('desenho'):
+                desenhar_frame(img, deteccoes, contagem)
+            with span('video_codificar'):
+                output_video.write(img)
+
+            if ao_processar_frame:
+                ao_processar_frame(frame_count, total_frames, contagem)
+    finally:
+        video.release()
+        output_video.release()
+
+    contar('frames_renderizados', frame_count)
+    return frame_count
+
+
+def _abrir_writer(output_video_path, fps, frame_width, frame_height):
+    """Abre o VideoWriter MP4 (mp4v) usado em todas as saídas anotadas"""
+    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+    return cv2.VideoWriter(str(output_video_path), fourcc, fps, (frame_width, frame_height))
+
+
+def _posicionar(video, frame_inicio):
+    """
+    Posiciona a captura no frame_inicio (0-based), com fallback se o seek for impreciso
+
+    CAP_PROP_POS_FRAMES pode devolver o frame pedido mesmo quando o seek parou num
+    keyframe, então a posição é confirmada decodificando o frame anterior e
+    comparando seu timestamp com o esperado.
+    """
+    if frame_inicio <= 0:
+        return
+    fps = video.get(cv2.CAP_PROP_FPS)
+    video.set(cv2.CAP_PROP_POS_FRAMES, frame_inicio - 1)
+    check, _ = video.read()
+    if check and fps > 0:
+        esperado_ms = (frame_inicio - 1) * 1000.0 / fps
+        if abs(video.get(cv2.CAP_PROP_POS_MSEC) - esperado_ms) < 500.0 / fps:
+            return
+    # Seek impreciso: volta ao início e avança frame a frame
+    video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for _ in range(frame_inicio):
+        if not video.grab():
+            break
+
+
+def propriedades_video(input_video_path):
+    """Retorna (largura, altura, fps, total_frames) do vídeo"""
+    video = cv2.VideoCapture(str(input_video_path))
+    if not video.isOpened():
+        raise IOError("Erro ao abrir vídeo")
+    try:
+        return (int(video.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                int(video.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                int(video.get(cv2.CAP_PROP_FPS)),
+                int(video.get(cv2.CAP_PROP_FRAME_COUNT)))
+    finally:
+        video.release()
+
+
+def processar_video(model, input_video_path, output_video_path=None, ao_processar_frame=None,
+                    frame_inicio=0, frame_fim=None, arquivo_deteccoes=None):
+    """
+    Processa um vídeo (ou um intervalo de frames): detecta, desenha e grava o vídeo anotado
+
+    Args:
+        model: modelo YOLO já carregado
+        input_video_path: caminho do vídeo de entrada
+        output_video_path: caminho do MP4 anotado; None pula desenho e codificação
+        ao_processar_frame: callback opcional (frame_count, total_frames, vacas_no_frame)
+        frame_inicio: primeiro frame (0-based) a processar
+        frame_fim: frame (exclusivo) onde parar; None processa até o fim do vídeo
+        arquivo_deteccoes: caminho .npz opcional para gravar as detecções (ver renderizar_video)
+
+    Returns:
+        DataFrame com as métricas por frame (numeração absoluta, começando em 1)
+    """
+    video = cv2.VideoCapture(str(input_video_path))
+
+    if not video.isOpened():
+        raise IOError("Erro ao abrir vídeo")
+
+    frame_width = int(video.get(cv2.CAP_PROP_FRAME_WIDTH))
+    frame_height = int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = int(video.get(cv2.CAP_PROP_FPS))
+    total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    _posicionar(video, frame_inicio)
+    output_video = None
+    if output_video_path is not None:
+        output_video = _abrir_writer(output_video_path, fps, frame_width, frame_height)
+    registro = RegistroDeteccoes() if arquivo_deteccoes is not None else None
+
+    # Pré-aloca pelo número de frames do intervalo (cresce se o cabeçalho do vídeo estiver errado)
+    fim_estimado = total_frames if frame_fim is None else min(frame_fim, total_frames)
+    metricas = MetricasFrames(fim_estimado - frame_inicio)
+    frame_count = frame_inicio
+
+    try:
+        while frame_fim is None or frame_count < frame_fim:
+            with span('video_decodificar'):
+                check, img = video.read()
+            if not check:
+                break
+
+            frame_count += 1
+            # Só a inferência entra no tempo/FPS por frame; desenho e codificação têm spans próprios
+            inicio = time.perf_counter()
+            deteccoes = detectar_frame(model, img)
+            tempo_inferencia = time.perf_counter() - inicio
+
+            cow_count_frame = contar_vacas(deteccoes)
+            if output_video is not None:
+                with span('desenho'):
+                    desenhar_frame(img, deteccoes, cow_count_frame)
+
+            metricas.adicionar(frame_count, tempo_inferencia, cow_count_frame)
+
+            if registro is not None:
+                registro.adicionar(frame_count, deteccoes)
+            if output_video is not None:
+                with span('video_codificar'):
+                    output_video.write(img)
+
+            if ao_processar_frame:
+                ao_processar_frame(frame_count, total_frames, cow_count_frame)
+    finally:
+        video.release()
+        if output_video is not None:
+            output_video.release()
+
+    if registro is not None:
+        registro.salvar(arquivo_deteccoes)
+
+    contar('frames_processados', frame_count - frame_inicio)
+    return metricas.para_dataframe()
+
+
+def dividir_intervalos(total_frames, partes):
+    """Divide [0, total_frames) em até `partes` intervalos disjuntos; o último fica aberto (None)"""
+    partes = max(1, min(partes, total_frames)) if total_frames > 0 else 1
+    tamanho = total_frames // partes
+    intervalos = []
+    for i in range(partes):
+        inicio = i * tamanho
+        fim = (i + 1) * tamanho if i < partes - 1 else None
+        intervalos.append((inicio, fim))
+    return intervalos
+
+
+def _processar_segmento(yolo_model_path, input_video_path, output_segmento, frame_inicio, frame_fim,
+                        arquivo_deteccoes=None):
+    """Worker: carrega seu próprio YOLO e processa um intervalo de frames; devolve (métricas, spans)"""
+    model = carregar_modelo(yolo_model_path)
+    df = processar_video(model, input_video_path, output_segmento,
+                         frame_inicio=frame_inicio, frame_fim=frame_fim,
+                         arquivo_deteccoes=arquivo_deteccoes)
+    return df, instrumentacao.coletar() if instrumentacao.ativa() else None
+
+
+def concatenar_videos(segmentos, output_video_path, fps, frame_width, frame_height):
+    """
+    Concatena os segmentos anotados, em ordem, em um único MP4
+
+    Com o ffmpeg no PATH, une os contêineres sem recodificar (concat demuxer,
+    -c copy). Sem ele, decodifica e recodifica cada frame com mp4v: funciona,
+    mas soma uma segunda codificação com perdas e come parte do ganho paralelo.
+    """
+    if shutil.which("ffmpeg"):
+        with span('video_concatenar', modo='copia'):
+            _concatenar_ffmpeg(segmentos, output_video_path)
+        return
+
+    output_video = _abrir_writer(output_video_path, fps, frame_width, frame_height)
+    try:
+        with span('video_concatenar', modo='recodificacao'):
+            for segmento in segmentos:
+                video = cv2.VideoCapture(str(segmento))
+                try:
+                    while True:
+                        check, img = video.read()
+                        if not check:
+                            break
+                        output_video.write(img)
+                finally:
+                    video.release()
+    finally:
+        output_video.release()
+
+
+def _concatenar_ffmpeg(segmentos, output_video_path):
+    """Concat demuxer do ffmpeg: copia os pacotes dos segmentos (mesmo codec e resolução)"""
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8") as lista:
+        for segmento in segmentos:
+            caminho = str(Path(segmento).resolve()).replace("'", "'\\''")
+            lista.write(f"file '{caminho}'\n")
+    try:
+        subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "concat", "-safe", "0", "-i", lista.name,
+                        "-c", "copy", str(output_video_path)], check=True, capture_output=True)
+    finally:
+        os.unlink(lista.name)
+
+
+def processar_video_paralelo(yolo_model_path, input_video_path, output_video_path=None, workers=None,
+                             arquivo_deteccoes=None):
+    """
+    Processa um único vídeo dividindo-o em intervalos de frames entre processos
+
+    Cada processo carrega seu próprio modelo. As métricas são unidas em ordem e os
+    segmentos anotados (e/ou as detecções) concatenados, com numeração idêntica à
+    execução sequencial.
+
+    Returns:
+        DataFrame com as métricas por frame
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    frame_width, frame_height, fps, total_frames = propriedades_video(input_video_path)
+    workers = workers or os.cpu_count() or 1
+    intervalos = dividir_intervalos(total_frames, workers)
+
+    # Segmentos ao lado da saída (mesmo disco); só contagem usa a pasta temporária do sistema
+    saida = next((c for c in (output_video_path, arquivo_deteccoes) if c is not None), None)
+    pasta_base = Path(saida).parent if saida is not None else None
+    with tempfile.TemporaryDirectory(dir=pasta_base) as temp_dir:
+        n = len(intervalos)
+        segmentos = [Path(temp_dir) / f"segmento_{i:03d}.mp4" if output_video_path is not None else None
+                     for i in range(n)]
+        deteccoes = [Path(temp_dir) / f"deteccoes_{i:03d}.npz" if arquivo_deteccoes is not None else None
+                     for i in range(n)]
+
+        # Workers não exportam métricas (saem sem atexit): os spans voltam com o resultado
+        with ProcessPoolExecutor(max_workers=n, initializer=instrumentacao.iniciar_worker,
+                                 initargs=(instrumentacao.ativa(),)) as pool:
+            futuros = [pool.submit(_processar_segmento, str(yolo_model_path), str(input_video_path),
+                                   segmento and str(segmento), inicio, fim, det and str(det))
+                       for segmento, det, (inicio, fim) in zip(segmentos, deteccoes, intervalos)]
+            partes = []
+            for futuro in futuros:
+                df, metricas = futuro.result()
+                if metricas:
+                    instrumentacao.mesclar(metricas)
+                partes.append(df)
+
+        if output_video_path is not None:
+            concatenar_videos(segmentos, output_video_path, fps, frame_width, frame_height)
+        if arquivo_deteccoes is not None:
+            concatenar_deteccoes(deteccoes, arquivo_deteccoes)
+
+    return pd.concat(partes, ignore_index=True)
+
+
+def resumir_metricas(df_metricas, nome_arquivo):
+    """Monta o resumo no formato de contexto_json['deteccao_gado']"""
+    if df_metricas.empty:
+        # Nenhum frame decodificado (vídeo vazio ou corrompido): resumo zerado
+        return {'frames_processados': 0, 'media_vacas': 0.0, 'maximo_vacas': 0,
+                'fps_medio': 0.0, 'nome_arquivo': nome_arquivo}
+    return {
+        'frames_processados': int(len(df_metricas)),
+        'media_vacas': float(df_metricas[COLUNA_VACAS].mean()),
+        'maximo_vacas': int(df_metricas[COLUNA_VACAS].max()),
+        'fps_medio': float(df_metricas[COLUNA_FPS].mean()),
+        'nome_arquivo': nome_arquivo
+    }
@@ -5,12 +5,64 @@ Análise de séries temporais e previsão
 
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-from statsmodels.tsa.statespace.sarimax import SARIMAX
-from statsmodels.tsa.seasonal import seasonal_decompose
 from datetime import date
 from io import StringIO
 
+from modules.instrumentacao import span
+
+# statsmodels e matplotlib só são importados ao processar (abertura do app mais rápida)
+
+def prever_leite(valores, data_inicio, meses):
+    """
+    Decomposição sazonal e previsão SARIMAX de uma série mensal (sem Streamlit)
+    
+    Returns:
+        dict com ts_data, decompose, forecast, forecast_df e o resumo
+        (formato de contexto_json['predicao_leite'])
+    """
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+    from statsmodels.tsa.seasonal import seasonal_decompose
+    
+    # Série mensal indexada no 1º dia de cada mês: uma data no meio do mês
+    # conta como aquele mês (o freq='MS' sozinho pularia para o mês seguinte)
+    inicio_mes = pd.Timestamp(data_inicio).to_period('M').to_timestamp()
+    ts_data = pd.Series(
+        pd.to_numeric(pd.Series(valores)).values,
+        index=pd.date_range(start=inicio_mes, periods=len(valores), freq='MS')
+    )
+    
+    with span('sarimax_decomposicao'):
+        decompose = seasonal_decompose(ts_data, model='additive')
+    with span('sarimax_ajuste'):
+        model = SARIMAX(ts_data, order=(2, 0, 0), seasonal_order=(0, 1, 1, 12))
+        model_fit = model.fit(disp=False)
+    with span('sarimax_previsao'):
+        forecast = model_fit.forecast(steps=meses)
+    
+    forecast_df = pd.DataFrame({
+        'Período': forecast.index.strftime('%Y-%m'),
+        'Previsão': forecast.values.round(2)
+    })
+    
+    media_historica = float(ts_data.mean())
+    media_prevista = float(forecast.mean())
+    return {
+        'ts_data': ts_data,
+        'decompose': decompose,
+        'forecast': forecast,
+        'forecast_df': forecast_df,
+        'resumo': {
+            'total_meses': len(ts_data),
+            'media_historica': media_historica,
+            'media_prevista': media_prevista,
+            'meses_previsao': meses,
+            'variacao_percentual': (media_prevista - media_historica) / media_historica * 100,
+            'ultimo_valor': float(ts_data.iloc[-1]),
+            'primeiro_valor_previsto': float(forecast.iloc[0])
+        }
+    }
+
+
 def show_milk_prediction():
     """Interface de predição de produção de leite"""
     
@@ -34,24 +86,16 @@ def show_milk_prediction():
     with col2:
         if uploaded_file is not None and process_button:
             try:
+                import matplotlib.pyplot as plt
+                
                 string_io = StringIO(uploaded_file.getvalue().decode("utf-8"))
                 data = pd.read_csv(string_io, header=None)
                 
-                ts_data = pd.Series(
-                    data.iloc[:,0].values, 
-                    index=pd.date_range(start=start_date, periods=len(data), freq='M')
-                )
-                
-                st.subheader("📈 Resultados")
-                
                 with st.spinner("Analisando..."):
-                    decompose = seasonal_decompose(ts_data, model='additive')
-                    pic_decompose = decompose.plot()
+                    previsao = prever_leite(data.iloc[:,0].values, start_date, forecast_period)
+                    ts_data, forecast = previsao['ts_data'], previsao['forecast']
+                    pic_decompose = previsao['decompose'].plot()
                     pic_decompose.set_size_inches(10, 8)
-                    
-                    model = SARIMAX(ts_data, order=(2, 0, 0), seasonal_order=(0, 1, 1, 12))
-                    model_fit = model.fit(disp=False)
-                    forecast = model_fit.forecast(steps=forecast_period)
                 
                 pic_forecast, ax = plt.subplots(figsize=(10, 5))
                 ts_data.plot(ax=ax, label='Histórico', color='#2196F3')
@@ -62,56 +106,65 @@ def show_milk_prediction():
                 ax.legend()
                 ax.grid(True, alpha=0.3)
                 
-                tab1, tab2, tab3 = st.tabs(["📊 Previsão", "📉 Decomposição", "📋 Dados"])
-                
-                with tab1:
-                    st.pyplot(pic_forecast)
-                    
-                    col_m1, col_m2, col_m3 = st.columns(3)
-                    with col_m1:
-                        st.metric("Média Histórica", f"{ts_data.mean():.2f}")
-                    with col_m2:
-                        st.metric("Média Prevista", f"{forecast.mean():.2f}")
-                    with col_m3:
-                        variacao = ((forecast.mean() - ts_data.mean()) / ts_data.mean()) * 100
-                        st.metric("Variação", f"{variacao:+.2f}%")
+                forecast_df = previsao['forecast_df']
                 
-                with tab2:
-                    st.pyplot(pic_decompose)
-                
-                with tab3:
-                    forecast_df = pd.DataFrame({
-                        'Período': forecast.index.strftime('%Y-%m'),
-                        'Previsão': forecast.values.round(2)
-                    })
-                    st.dataframe(forecast_df, use_container_width=True)
-                    
-                    csv = forecast_df.to_csv(index=False).encode('utf-8')
-                    st.download_button(
-                        label="📥 Download CSV",
-                        data=csv,
-                        file_name=f"previsao_leite_{forecast_period}meses.csv",
-                        mime="text/csv"
-                    )
-                
-                st.success(f"✅ Previsão gerada para {forecast_period} meses!")
+                # Resultado fica no estado: outras interações não refazem o SARIMAX
+                st.session_state.resultado_leite = {
+                    'pic_forecast': pic_forecast,
+                    'pic_decompose': pic_decompose,
+                    'forecast_df': forecast_df,
+                    'media_historica': previsao['resumo']['media_historica'],
+                    'media_prevista': previsao['resumo']['media_prevista'],
+                    'variacao': previsao['resumo']['variacao_percentual'],
+                    'forecast_period': forecast_period
+                }
                 
                 # Salvar contexto
                 if 'contexto_json' not in st.session_state:
                     st.session_state.contexto_json = {}
                 
-                st.session_state.contexto_json['predicao_leite'] = {
-                    'total_meses': len(ts_data),
-                    'media_historica': float(ts_data.mean()),
-                    'media_prevista': float(forecast.mean()),
-                    'meses_previsao': forecast_period,
-                    'variacao_percentual': float(((forecast.mean() - ts_data.mean()) / ts_data.mean()) * 100),
-                    'ultimo_valor': float(ts_data.iloc[-1]),
-                    'primeiro_valor_previsto': float(forecast.iloc[0])
-                }
+                st.session_state.contexto_json['predicao_leite'] = previsao['resumo']
                 
             except Exception as ex:
                 st.error(f"❌ Erro: {ex}")
         
+        resultado = st.session_state.get('resultado_leite')
+        if resultado:
+            _mostrar_resultado(resultado)
         elif not uploaded_file:
             st.info("📊 Os gráficos aparecerão aqui após o upload")
+
+
+def _mostrar_resultado(resultado):
+    """Renderiza a última previsão guardada em session_state"""
+    st.subheader("📈 Resultados")
+    
+    tab1, tab2, tab3 = st.tabs(["📊 Previsão", "📉 Decomposição", "📋 Dados"])
+    
+    with tab1:
+        st.pyplot(resultado['pic_forecast'])
+        
+        col_m1, col_m2, col_m3 = st.columns(3)
+        with col_m1:
+            st.metric("Média Histórica", f"{resultado['media_historica']:.2f}")
+        with col_m2:
+            st.metric("Média Prevista", f"{resultado['media_prevista']:.2f}")
+        with col_m3:
+            st.metric("Variação", f"{resultado['variacao']:+.2f}%")
+    
+    with tab2:
+        st.pyplot(resultado['pic_decompose'])
+    
+    with tab3:
+        forecast_df = resultado['forecast_df']
+        st.dataframe(forecast_df, use_container_width=True)
+        
+        csv = forecast_df.to_csv(index=False).encode('utf-8')
+        st.download_button(
+            label="📥 Download CSV",
+            data=csv,
+            file_name=f"previsao_leite_{resultado['forecast_period']}meses.csv",
+            mime="text/csv"
+        )
+    
+    st.success(f"✅ Previsão gerada para {resultado['forecast_period']} meses!")
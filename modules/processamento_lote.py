@@ -0,0 +1,337 @@
+"""
+Processamento em Lote de Vídeos de Gado (linha de comando)
+Processa uma pasta de vídeos em paralelo, sem Streamlit
+
+Uso:
+    python -m modules.processamento_lote videos/ --saida resultados/ --workers 4
+    python -m modules.processamento_lote videos/ --dividir   # vídeos longos: divide por frames
+    python -m modules.processamento_lote videos/ --somente-deteccao   # só contagens, sem vídeo
+    python -m modules.processamento_lote videos/ --renderizar         # gera vídeos das detecções salvas
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from modules import instrumentacao
+
+EXTENSOES_VIDEO = ('.mp4', '.avi', '.mov')
+MODELO_PADRAO = Path(__file__).parent.parent / "models" / "best.pt"
+
+ARQUIVO_VIDEO = "video_deteccoes.mp4"
+ARQUIVO_METRICAS = "metricas.csv"
+ARQUIVO_METRICAS_EXCEL = "metricas.xlsx"
+ARQUIVO_DETECCOES = "deteccoes.npz"
+ARQUIVO_RESUMO = "resumo.json"
+ARQUIVO_RELATORIO = "relatorio_throughput.json"
+
+# Vídeos recebidos (aba do Streamlit, API) são copiados em blocos: nunca inteiros na memória
+TAMANHO_BLOCO_UPLOAD = 8 * 1024 * 1024
+
+# Modelo carregado uma vez por processo do pool
+_modelo_worker = None
+
+
+def hash_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    """SHA-256 do conteúdo do arquivo (identifica vídeos já processados)"""
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def listar_videos(pasta):
+    """Lista os vídeos suportados da pasta, em ordem alfabética"""
+    return sorted(p for p in Path(pasta).iterdir()
+                  if p.is_file() and p.suffix.lower() in EXTENSOES_VIDEO)
+
+
+def _iniciar_worker(yolo_model_path, metricas_ativas=False):
+    """Inicializador do pool: cada processo carrega seu próprio YOLO"""
+    global _modelo_worker
+    from modules.motor_deteccao import carregar_modelo
+    instrumentacao.iniciar_worker(metricas_ativas)
+    _modelo_worker = carregar_modelo(yolo_model_path)
+
+
+def _com_metricas(resultado):
+    """Anexa ao resultado de uma tarefa do worker as métricas medidas nela (o pai mescla e exporta)"""
+    resultado['metricas'] = instrumentacao.coletar() if instrumentacao.ativa() else None
+    return resultado
+
+
+def _mesclar_metricas(resultado):
+    metricas = resultado.pop('metricas', None)
+    if metricas:
+        instrumentacao.mesclar(metricas)
+
+
+def _gravar_resultados(df_metricas, pasta_destino, nome_arquivo, gerar_excel=False):
+    """Grava métricas e resumo; o resumo vai por último e marca o vídeo como concluído"""
+    from modules.motor_deteccao import resumir_metricas
+
+    df_metricas.to_csv(pasta_destino / ARQUIVO_METRICAS, index=False)
+    if gerar_excel:
+        df_metricas.to_excel(pasta_destino / ARQUIVO_METRICAS_EXCEL, index=False)
+    resumo = resumir_metricas(df_metricas, nome_arquivo)
+    with open(pasta_destino / ARQUIVO_RESUMO, "w", encoding="utf-8") as f:
+        json.dump(resumo, f, indent=2, ensure_ascii=False)
+    return resumo
+
+
+def _processar_um(video_path, pasta_destino, somente_deteccao=False, gerar_excel=False):
+    """Processa um vídeo no worker e grava detecções, vídeo (opcional), métricas e resumo"""
+    from modules.motor_deteccao import processar_video
+
+    pasta_destino = Path(pasta_destino)
+    pasta_destino.mkdir(parents=True, exist_ok=True)
+    output_video = None if somente_deteccao else pasta_destino / ARQUIVO_VIDEO
+
+    inicio = time.time()
+    df_metricas = processar_video(_modelo_worker, video_path, output_video,
+                                  arquivo_deteccoes=pasta_destino / ARQUIVO_DETECCOES)
+    resumo = _gravar_resultados(df_metricas, pasta_destino, Path(video_path).name, gerar_excel)
+    duracao = time.time() - inicio
+
+    return _com_metricas({'frames': resumo['frames_processados'], 'segundos': duracao})
+
+
+def _processar_um_dividido(video_path, pasta_destino, yolo_model_path, workers, somente_deteccao=False,
+                           gerar_excel=False):
+    """Processa um vídeo dividindo seus frames entre `workers` processos"""
+    from modules.motor_deteccao import processar_video_paralelo
+
+    pasta_destino = Path(pasta_destino)
+    pasta_destino.mkdir(parents=True, exist_ok=True)
+    output_video = None if somente_deteccao else pasta_destino / ARQUIVO_VIDEO
+
+    inicio = time.time()
+    df_metricas = processar_video_paralelo(yolo_model_path, video_path, output_video, workers,
+                                           arquivo_deteccoes=pasta_destino / ARQUIVO_DETECCOES)
+    resumo = _gravar_resultados(df_metricas, pasta_destino, Path(video_path).name, gerar_excel)
+    duracao = time.time() - inicio
+
+    return {'frames': resumo['frames_processados'], 'segundos': duracao}
+
+
+def _renderizar_um(video_path, pasta_destino):
+    """Gera o vídeo anotado a partir de deteccoes.npz, sem inferência"""
+    from modules.motor_deteccao import renderizar_video
+
+    pasta_destino = Path(pasta_destino)
+    inicio = time.time()
+    frames = renderizar_video(video_path, pasta_destino / ARQUIVO_DETECCOES, pasta_destino / ARQUIVO_VIDEO)
+    return _com_metricas({'frames': frames, 'segundos': time.time() - inicio})
+
+
+def _registrar(relatorio, video, destino, r):
+    """Adiciona o resultado de um vídeo ao relatório"""
+    relatorio['videos_processados'] += 1
+    relatorio['frames_processados'] += r['frames']
+    relatorio['videos'].append({
+        'arquivo': video.name,
+        'hash': destino.name,
+        'frames': r['frames'],
+        'segundos': round(r['segundos'], 2),
+        'fps': round(r['frames'] / r['segundos'], 2) if r['segundos'] > 0 else 0
+    })
+    print(f"✅ {video.name}: {r['frames']} frames em {r['segundos']:.1f}s")
+
+
+def _registrar_erro(relatorio, video, erro):
+    """Adiciona uma falha ao relatório"""
+    relatorio['videos_com_erro'] += 1
+    relatorio['videos'].append({'arquivo': video.name, 'erro': str(erro)})
+    print(f"❌ {video.name}: {erro}", file=sys.stderr)
+
+
+def processar_pasta(pasta_videos, pasta_saida, yolo_model_path=MODELO_PADRAO, workers=None,
+                    dividir=False, somente_deteccao=False, gerar_excel=False):
+    """
+    Processa todos os vídeos da pasta com um pool de processos
+
+    Vídeos cujo hash já possui resumo.json em pasta_saida são pulados, assim como
+    cópias idênticas de um vídeo já pendente.
+    Com dividir=True, cada vídeo é dividido em intervalos de frames entre os
+    processos (útil para poucos vídeos longos). Com somente_deteccao=True, grava
+    só detecções e métricas; o vídeo anotado pode ser gerado depois com renderizar_pasta.
+    As métricas vão para CSV; o Excel só é gerado com gerar_excel=True.
+
+    Returns:
+        dict com o relatório de throughput agregado
+    """
+    pasta_saida = Path(pasta_saida)
+    pasta_saida.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    pendentes = []
+    pulados = []
+    destinos = set()
+    for video in listar_videos(pasta_videos):
+        destino = pasta_saida / hash_arquivo(video)
+        # Cópias idênticas na mesma pasta iriam para a mesma pasta de destino: só a primeira roda
+        if (destino / ARQUIVO_RESUMO).exists() or destino in destinos:
+            pulados.append(video.name)
+        else:
+            destinos.add(destino)
+            pendentes.append((video, destino))
+
+    relatorio = {
+        'workers': workers,
+        'modo': 'dividido' if dividir else 'por_video',
+        'somente_deteccao': somente_deteccao,
+        'videos_processados': 0,
+        'videos_pulados': len(pulados),
+        'videos_com_erro': 0,
+        'frames_processados': 0,
+        'tempo_total_s': 0.0,
+        'fps_agregado': 0.0,
+        'videos': []
+    }
+
+    inicio = time.time()
+    if pendentes and dividir:
+        # Um vídeo por vez, com os frames de cada vídeo divididos entre os processos
+        for video, destino in pendentes:
+            try:
+                r = _processar_um_dividido(str(video), str(destino), str(yolo_model_path), workers,
+                                           somente_deteccao, gerar_excel)
+            except Exception as e:
+                _registrar_erro(relatorio, video, e)
+                continue
+            _registrar(relatorio, video, destino, r)
+    elif pendentes:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pendentes)),
+                                 initializer=_iniciar_worker,
+                                 initargs=(str(yolo_model_path), instrumentacao.ativa())) as pool:
+            futuros = {pool.submit(_processar_um, str(video), str(destino),
+                                   somente_deteccao, gerar_excel): (video, destino)
+                       for video, destino in pendentes}
+
+            for futuro in as_completed(futuros):
+                video, destino = futuros[futuro]
+                try:
+                    r = futuro.result()
+                except Exception as e:
+                    _registrar_erro(relatorio, video, e)
+                    continue
+                _mesclar_metricas(r)
+                _registrar(relatorio, video, destino, r)
+
+    _finalizar_relatorio(relatorio, time.time() - inicio, pasta_saida / ARQUIVO_RELATORIO)
+    return relatorio
+
+
+def renderizar_pasta(pasta_videos, pasta_saida, workers=None):
+    """
+    Gera os vídeos anotados de resultados já processados com somente_deteccao
+
+    Usa deteccoes.npz de cada vídeo; nenhuma inferência é refeita.
+
+    Returns:
+        dict com o relatório de throughput da renderização
+    """
+    pasta_saida = Path(pasta_saida)
+    pasta_saida.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    pendentes = []
+    pulados = 0
+    destinos = set()
+    for video in listar_videos(pasta_videos):
+        destino = pasta_saida / hash_arquivo(video)
+        if ((destino / ARQUIVO_DETECCOES).exists() and not (destino / ARQUIVO_VIDEO).exists()
+                and destino not in destinos):
+            destinos.add(destino)
+            pendentes.append((video, destino))
+        else:
+            pulados += 1
+
+    relatorio = {
+        'workers': workers,
+        'modo': 'renderizacao',
+        'videos_processados': 0,
+        'videos_pulados': pulados,
+        'videos_com_erro': 0,
+        'frames_processados': 0,
+        'tempo_total_s': 0.0,
+        'fps_agregado': 0.0,
+        'videos': []
+    }
+
+    inicio = time.time()
+    if pendentes:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pendentes)),
+                                 initializer=instrumentacao.iniciar_worker,
+                                 initargs=(instrumentacao.ativa(),)) as pool:
+            futuros = {pool.submit(_renderizar_um, str(video), str(destino)): (video, destino)
+                       for video, destino in pendentes}
+
+            for futuro in as_completed(futuros):
+                video, destino = futuros[futuro]
+                try:
+                    r = futuro.result()
+                except Exception as e:
+                    _registrar_erro(relatorio, video, e)
+                    continue
+                _mesclar_metricas(r)
+                _registrar(relatorio, video, destino, r)
+
+    _finalizar_relatorio(relatorio, time.time() - inicio, pasta_saida / "relatorio_renderizacao.json")
+    return relatorio
+
+
+def _finalizar_relatorio(relatorio, tempo_total, caminho):
+    """Calcula o throughput agregado e grava o relatório em JSON"""
+    relatorio['tempo_total_s'] = round(tempo_total, 2)
+    relatorio['fps_agregado'] = round(relatorio['frames_processados'] / tempo_total, 2) if tempo_total > 0 else 0
+
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    parser = argparse.ArgumentParser(description="Detecção de gado em lote (pasta de vídeos)")
+    parser.add_argument("pasta", help="Pasta com vídeos (mp4, avi, mov)")
+    parser.add_argument("--saida", default="resultados", help="Pasta de saída (padrão: resultados)")
+    parser.add_argument("--modelo", default=str(MODELO_PADRAO), help="Caminho do modelo YOLO")
+    parser.add_argument("--workers", type=int, default=None, help="Processos paralelos (padrão: nº de núcleos)")
+    parser.add_argument("--dividir", action="store_true",
+                        help="Divide cada vídeo em intervalos de frames entre os processos")
+    parser.add_argument("--somente-deteccao", action="store_true",
+                        help="Grava só detecções e métricas (sem desenhar nem codificar vídeo)")
+    parser.add_argument("--excel", action="store_true",
+                        help="Gera também metricas.xlsx (além do CSV)")
+    parser.add_argument("--renderizar", action="store_true",
+                        help="Gera os vídeos anotados a partir das detecções já salvas (sem inferência)")
+    args = parser.parse_args(argv)
+
+    if args.renderizar:
+        relatorio = renderizar_pasta(args.pasta, args.saida, args.workers)
+        print(f"\n🎬 {relatorio['videos_processados']} vídeos renderizados, "
+              f"{relatorio['videos_com_erro']} com erro ({relatorio['fps_agregado']} FPS agregado)")
+        return 1 if relatorio['videos_com_erro'] else 0
+
+    if not Path(args.modelo).exists():
+        print(f"❌ Modelo YOLO não encontrado em: {args.modelo}", file=sys.stderr)
+        return 1
+
+    relatorio = processar_pasta(args.pasta, args.saida, args.modelo, args.workers,
+                                args.dividir, args.somente_deteccao, args.excel)
+
+    print(f"\n📊 {relatorio['videos_processados']} processados, "
+          f"{relatorio['videos_pulados']} pulados, {relatorio['videos_com_erro']} com erro")
+    print(f"⚡ {relatorio['frames_processados']} frames em {relatorio['tempo_total_s']}s "
+          f"({relatorio['fps_agregado']} FPS agregado, {relatorio['workers']} workers)")
+    return 1 if relatorio['videos_com_erro'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
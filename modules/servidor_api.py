@@ -0,0 +1,633 @@
+"""
+API HTTP do SIA (sem interface)
+Expõe produtividade (individual e em lote), ROI, previsão de leite e jobs de
+detecção de gado como JSON, com modelos pré-carregados na inicialização
+
+Uso:
+    python -m modules.servidor_api --porta 8000 --workers-deteccao 2 --pasta-videos /videos
+
+Rotas:
+    GET  /saude                      prontidão (503 enquanto carrega ou sem capacidade)
+    GET  /metricas                   contadores e latências por rota, jobs e pool
+                                     (?formato=prometheus: spans e contadores de modules.instrumentacao)
+    POST /produtividade              {"dados": {...}}
+    POST /produtividade/lote         {"itens": [{...}, ...]}
+    POST /roi                        {"crop", "prediction", "fertilizer", "irrigation"}
+    POST /leite                      {"valores": [...], "data_inicio": "2011-01-01", "meses": 12}
+    POST /deteccao                   o vídeo no corpo (application/octet-stream,
+                                     ?nome=a.mp4&somente_contagem=1) ou {"caminho": "a.mp4"},
+                                     relativo a --pasta-videos (desativado sem ela)
+    GET  /deteccao/<id>              estado, progresso e resumo do job
+    GET  /deteccao/<id>/<arquivo>    metricas.csv, deteccoes.npz ou video_deteccoes.mp4
+"""
+
+import argparse
+import collections
+import importlib.util
+import json
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from modules import instrumentacao
+from modules.agente_roi import AgenteROI
+from modules.processamento_lote import (ARQUIVO_DETECCOES, ARQUIVO_METRICAS, ARQUIVO_VIDEO,
+                                        MODELO_PADRAO, TAMANHO_BLOCO_UPLOAD)
+
+DATASET_PADRAO = Path(__file__).parent.parent / "data" / "crop_yield.csv"
+MAX_CORPO_JSON = 10 * 1024 * 1024
+MAX_ITENS_LOTE = 10000
+MAX_UPLOAD = 2 * 1024 ** 3
+MAX_JOBS_PENDENTES = 16
+ARQUIVOS_JOB = {ARQUIVO_METRICAS: "text/csv", ARQUIVO_DETECCOES: "application/octet-stream",
+                ARQUIVO_VIDEO: "video/mp4"}
+
+
+class ErroRequisicao(Exception):
+    """Erro com status HTTP; a mensagem volta ao cliente em {"erro": ...}"""
+
+    def __init__(self, status, mensagem, retry_after=None):
+        super().__init__(mensagem)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class PoolModelos:
+    """
+    Instâncias pré-carregadas emprestadas uma por vez
+    (modelos YOLO guardam estado entre chamadas e não são thread-safe)
+    """
+
+    def __init__(self, fabrica, tamanho):
+        self.tamanho = tamanho
+        self._livres = queue.Queue()
+        for _ in range(tamanho):
+            self._livres.put(fabrica())
+
+    @property
+    def livres(self):
+        return self._livres.qsize()
+
+    @contextmanager
+    def emprestar(self, timeout=None):
+        modelo = self._livres.get(timeout=timeout)
+        try:
+            yield modelo
+        finally:
+            self._livres.put(modelo)
+
+
+class MetricasAPI:
+    """Contagem, erros e latência (média, p95, máximo) por rota"""
+
+    def __init__(self, janela=1000):
+        self._lock = threading.Lock()
+        self._janela = janela
+        self._rotas = {}
+
+    def registrar(self, rota, duracao, erro=False):
+        with self._lock:
+            r = self._rotas.get(rota)
+            if r is None:
+                r = self._rotas[rota] = {'requisicoes': 0, 'erros': 0, 'tempo_total_s': 0.0,
+                                         'tempos': collections.deque(maxlen=self._janela)}
+            r['requisicoes'] += 1
+            r['erros'] += int(erro)
+            r['tempo_total_s'] += duracao
+            r['tempos'].append(duracao)
+
+    def resumo(self):
+        with self._lock:
+            saida = {}
+            for rota, r in self._rotas.items():
+                tempos = sorted(r['tempos'])
+                saida[rota] = {
+                    'requisicoes': r['requisicoes'],
+                    'erros': r['erros'],
+                    'tempo_medio_s': round(r['tempo_total_s'] / r['requisicoes'], 4),
+                    'p95_s': round(tempos[int(0.95 * (len(tempos) - 1))], 4),
+                    'max_s': round(tempos[-1], 4)
+                }
+            return saida
+
+
+class GerenciadorJobs:
+    """
+    Fila de jobs de detecção: cada worker empresta um YOLO do pool
+
+    Jobs concluídos ficam consultáveis até passarem de `max_concluidos`
+    (os mais antigos e suas pastas são removidos). A fila aceita até
+    `max_pendentes` jobs ainda não concluídos; acima disso submeter() responde 503.
+    """
+
+    def __init__(self, pool, pasta, max_concluidos=100, max_pendentes=MAX_JOBS_PENDENTES):
+        self.pool = pool
+        self.pasta = Path(pasta)
+        self.max_concluidos = max_concluidos
+        self.max_pendentes = max_pendentes
+        self._executor = ThreadPoolExecutor(max_workers=pool.tamanho, thread_name_prefix="deteccao")
+        self._lock = threading.Lock()
+        self._jobs = collections.OrderedDict()
+
+    def _ativos(self):
+        return sum(j['status'] in ('pendente', 'processando') for j in self._jobs.values())
+
+    def exigir_vaga(self):
+        """503 se a fila já está cheia (checado antes de receber um upload)"""
+        with self._lock:
+            if self._ativos() >= self.max_pendentes:
+                raise ErroRequisicao(503, "Fila de detecção cheia, tente novamente", retry_after=5)
+
+    def submeter(self, video_path, nome_arquivo, somente_contagem=True, remover_video=False):
+        job_id = uuid.uuid4().hex[:12]
+        job = {'id': job_id, 'status': 'pendente', 'arquivo': nome_arquivo, 'progresso': 0.0,
+               'criado_em': time.time(), 'inicio': None, 'fim': None, 'resumo': None,
+               'erro': None, 'arquivos': []}
+        with self._lock:
+            if self._ativos() >= self.max_pendentes:
+                raise ErroRequisicao(503, "Fila de detecção cheia, tente novamente", retry_after=5)
+            self._jobs[job_id] = job
+        pasta_job = self.pasta / job_id
+        pasta_job.mkdir(parents=True)
+        self._executor.submit(self._executar, job, Path(video_path), pasta_job,
+                              somente_contagem, remover_video)
+        return self.consultar(job_id)
+
+    def _executar(self, job, video_path, pasta_job, somente_contagem, remover_video):
+        from modules.motor_deteccao import processar_video, resumir_metricas
+
+        def progresso(frame_count, total_frames, _vacas):
+            job['progresso'] = round(min(frame_count / max(total_frames, 1), 1.0), 4)
+
+        try:
+            with self.pool.emprestar() as model, instrumentacao.span('deteccao_job', perfilavel=True):
+                job['status'], job['inicio'] = 'processando', time.time()
+                output = None if somente_contagem else str(pasta_job / ARQUIVO_VIDEO)
+                df_metricas = processar_video(model, str(video_path), output,
+                                              ao_processar_frame=progresso,
+                                              arquivo_deteccoes=str(pasta_job / ARQUIVO_DETECCOES))
+            df_metricas.to_csv(pasta_job / ARQUIVO_METRICAS, index=False)
+            job['resumo'] = resumir_metricas(df_metricas, job['arquivo'])
+            job['arquivos'] = sorted(p.name for p in pasta_job.iterdir() if p.name in ARQUIVOS_JOB)
+            job['progresso'], job['status'] = 1.0, 'concluido'
+        except Exception as e:
+            job['status'], job['erro'] = 'erro', str(e)
+        finally:
+            job['fim'] = time.time()
+            if remover_video:
+                video_path.unlink(missing_ok=True)
+            self._podar()
+
+    def _podar(self):
+        with self._lock:
+            finalizados = [j for j in self._jobs.values() if j['status'] in ('concluido', 'erro')]
+            for job in finalizados[:max(0, len(finalizados) - self.max_concluidos)]:
+                del self._jobs[job['id']]
+                shutil.rmtree(self.pasta / job['id'], ignore_errors=True)
+
+    def consultar(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def arquivo(self, job_id, nome):
+        job = self.consultar(job_id)
+        if job is None or nome not in job['arquivos']:
+            return None
+        return self.pasta / job_id / nome
+
+    def estatisticas(self):
+        with self._lock:
+            contagem = collections.Counter(j['status'] for j in self._jobs.values())
+        return {status: contagem.get(status, 0) for status in ('pendente', 'processando', 'concluido', 'erro')}
+
+    def fechar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ServicoSIA:
+    """
+    Modelos carregados uma vez por processo e as operações expostas pela API
+
+    Args:
+        dataset_path: crop_yield.csv para treinar o Random Forest
+        yolo_model_path: pesos YOLO; detecção fica desativada se ausente
+        workers_deteccao: instâncias YOLO no pool (= jobs simultâneos)
+        max_concorrencia: chamadas síncronas (produtividade, ROI, leite) ao mesmo tempo;
+            acima disso a API responde 503 para o balanceador tentar outra réplica
+        pasta_videos: única pasta de onde {"caminho": ...} pode ler vídeos; None desativa
+            essa forma (só upload no corpo)
+        max_upload: bytes aceitos num vídeo enviado no corpo (acima disso, 413)
+        max_jobs_pendentes: jobs de detecção aguardando ou em processamento (acima disso, 503)
+    """
+
+    def __init__(self, dataset_path=DATASET_PADRAO, yolo_model_path=MODELO_PADRAO, workers_deteccao=1,
+                 max_concorrencia=4, pasta_jobs=None, espera_maxima=10.0, pasta_videos=None,
+                 max_upload=MAX_UPLOAD, max_jobs_pendentes=MAX_JOBS_PENDENTES):
+        self.dataset_path = Path(dataset_path)
+        self.yolo_model_path = Path(yolo_model_path)
+        self.workers_deteccao = workers_deteccao
+        self.espera_maxima = espera_maxima
+        self.pasta_videos = Path(pasta_videos).resolve() if pasta_videos else None
+        self.max_upload = max_upload
+        self.max_jobs_pendentes = max_jobs_pendentes
+        self.pasta_jobs = Path(pasta_jobs or tempfile.mkdtemp(prefix="sia_api_"))
+        self.pasta_jobs.mkdir(parents=True, exist_ok=True)
+        self.metricas = MetricasAPI()
+        self.modelo = None
+        self.jobs = None
+        self.avisos = []
+        self.pronto = False
+        self.inicio = time.time()
+        self._semaforo = threading.BoundedSemaphore(max_concorrencia)
+
+    def carregar(self):
+        """Treina o modelo de produtividade e pré-carrega o pool YOLO"""
+        from modules.simulador import ModeloML, ler_dataset
+
+        if self.dataset_path.exists():
+            modelo = ModeloML(ler_dataset(self.dataset_path))
+            modelo.treinar()
+            self.modelo = modelo
+        else:
+            self.avisos.append(f"Dataset não encontrado: {self.dataset_path}")
+
+        if not self.yolo_model_path.exists():
+            self.avisos.append(f"Modelo YOLO não encontrado: {self.yolo_model_path}")
+        elif importlib.util.find_spec("ultralytics") is None or importlib.util.find_spec("cv2") is None:
+            self.avisos.append("Detecção indisponível: pip install ultralytics opencv-python")
+        else:
+            from modules.motor_deteccao import carregar_modelo
+            pool = PoolModelos(lambda: carregar_modelo(self.yolo_model_path), self.workers_deteccao)
+            self.jobs = GerenciadorJobs(pool, self.pasta_jobs, max_pendentes=self.max_jobs_pendentes)
+
+        self.pronto = True
+
+    @contextmanager
+    def _capacidade(self):
+        if not self._semaforo.acquire(timeout=self.espera_maxima):
+            raise ErroRequisicao(503, "Servidor ocupado, tente novamente", retry_after=1)
+        try:
+            yield
+        finally:
+            self._semaforo.release()
+
+    # ==================== OPERAÇÕES ====================
+
+    def _exigir_modelo(self):
+        if self.modelo is None:
+            raise ErroRequisicao(503, "Modelo de produtividade indisponível")
+
+    def produtividade(self, corpo):
+        self._exigir_modelo()
+        dados = corpo.get('dados', corpo)
+        if not isinstance(dados, dict):
+            raise ErroRequisicao(400, "'dados' deve ser um objeto")
+        with self._capacidade():
+            resultado = self.modelo.predizer(dados)
+        if 'error' in resultado:
+            raise ErroRequisicao(422, resultado['error'])
+        return resultado
+
+    def produtividade_lote(self, corpo):
+        self._exigir_modelo()
+        itens = corpo.get('itens')
+        if not isinstance(itens, list) or not all(isinstance(i, dict) for i in itens):
+            raise ErroRequisicao(400, "'itens' deve ser uma lista de objetos")
+        if len(itens) > MAX_ITENS_LOTE:
+            raise ErroRequisicao(413, f"Máximo de {MAX_ITENS_LOTE} itens por lote")
+        with self._capacidade():
+            resultados = self.modelo.predizer_lote(itens)
+        return {'resultados': resultados, 'erros': sum('error' in r for r in resultados)}
+
+    def roi(self, corpo):
+        if corpo.get('crop') is None or not isinstance(corpo.get('prediction'), (int, float)):
+            raise ErroRequisicao(400, "Informe 'crop' e 'prediction' (t/ha)")
+        return AgenteROI.calcular_roi(corpo)
+
+    def leite(self, corpo):
+        from modules.predicao_leite import prever_leite
+
+        valores = corpo.get('valores')
+        meses = corpo.get('meses', 12)
+        if not isinstance(valores, list) or len(valores) < 24:
+            raise ErroRequisicao(400, "'valores' deve ter ao menos 24 meses")
+        if not isinstance(meses, int) or not 1 <= meses <= 48:
+            raise ErroRequisicao(400, "'meses' deve estar entre 1 e 48")
+        with self._capacidade():
+            try:
+                previsao = prever_leite(valores, corpo.get('data_inicio', '2011-01-01'), meses)
+            except (ValueError, TypeError) as e:
+                raise ErroRequisicao(422, f"Série inválida: {e}")
+        return {'resumo': previsao['resumo'],
+                'previsao': previsao['forecast_df'].to_dict(orient='records')}
+
+    def _exigir_deteccao(self):
+        if self.jobs is None:
+            raise ErroRequisicao(503, "Detecção indisponível: " + "; ".join(self.avisos))
+
+    def _resolver_caminho(self, caminho):
+        """Caminho de vídeo dentro de pasta_videos (403 fora dela ou se a forma estiver desativada)"""
+        if self.pasta_videos is None:
+            raise ErroRequisicao(403, "Envio por caminho desativado: envie o vídeo no corpo")
+        resolvido = (self.pasta_videos / str(caminho)).resolve()
+        if not resolvido.is_relative_to(self.pasta_videos):
+            raise ErroRequisicao(403, "Caminho fora da pasta de vídeos")
+        if not resolvido.is_file():
+            raise ErroRequisicao(400, f"Vídeo não encontrado: {caminho}")
+        return resolvido
+
+    def submeter_deteccao(self, corpo=None, leitor=None, tamanho=0, parametros=None):
+        """Job a partir de um caminho em pasta_videos (JSON) ou do vídeo enviado no corpo"""
+        self._exigir_deteccao()
+        parametros = parametros or {}
+        if leitor is None:
+            caminho = self._resolver_caminho(corpo.get('caminho', ''))
+            return self.jobs.submeter(caminho, caminho.name, bool(corpo.get('somente_contagem', True)))
+
+        if tamanho <= 0:
+            raise ErroRequisicao(411, "Envie o vídeo com Content-Length")
+        if tamanho > self.max_upload:
+            raise ErroRequisicao(413, f"Vídeo maior que o limite de {self.max_upload} bytes")
+        # Recusa antes de receber o vídeo se a fila já estiver cheia
+        self.jobs.exigir_vaga()
+        nome = Path(parametros.get('nome', 'video.mp4')).name
+        fd, destino = tempfile.mkstemp(suffix=Path(nome).suffix or ".mp4", dir=self.pasta_jobs)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                restante = tamanho
+                while restante:
+                    bloco = leitor.read(min(TAMANHO_BLOCO_UPLOAD, restante))
+                    if not bloco:
+                        break
+                    f.write(bloco)
+                    restante -= len(bloco)
+            if restante:
+                raise ErroRequisicao(400, f"Upload incompleto: faltaram {restante} de {tamanho} bytes")
+            somente_contagem = parametros.get('somente_contagem', '1') not in ('0', 'false')
+            return self.jobs.submeter(destino, nome, somente_contagem, remover_video=True)
+        except BaseException:
+            os.unlink(destino)
+            raise
+
+    def consultar_deteccao(self, job_id):
+        self._exigir_deteccao()
+        job = self.jobs.consultar(job_id)
+        if job is None:
+            raise ErroRequisicao(404, "Job não encontrado")
+        return job
+
+    def saude(self):
+        capacidade = self.jobs.pool.livres if self.jobs else 0
+        return {
+            'status': 'ok' if self.pronto else 'carregando',
+            'uptime_s': round(time.time() - self.inicio, 1),
+            'modelos': {'produtividade': self.modelo is not None,
+                        'deteccao': self.jobs.pool.tamanho if self.jobs else 0},
+            'deteccao_livres': capacidade,
+            'avisos': self.avisos
+        }
+
+    def resumo_metricas(self):
+        return {
+            'rotas': self.metricas.resumo(),
+            'jobs': self.jobs.estatisticas() if self.jobs else {},
+            'pool_deteccao': ({'tamanho': self.jobs.pool.tamanho, 'livres': self.jobs.pool.livres}
+                              if self.jobs else None)
+        }
+
+    def fechar(self):
+        if self.jobs:
+            self.jobs.fechar()
+
+
+class ServidorAPI(ThreadingHTTPServer):
+    """Servidor HTTP/1.1 (keep-alive), uma thread por conexão"""
+
+    daemon_threads = True
+
+    def __init__(self, endereco, servico):
+        super().__init__(endereco, _Manipulador)
+        self.servico = servico
+
+    @property
+    def url(self):
+        host, porta = self.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def iniciar_em_thread(self):
+        """Sobe o servidor em background e retorna a thread"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+ROTAS = {"/saude", "/metricas", "/produtividade", "/produtividade/lote", "/roi", "/leite",
+         "/deteccao", "/deteccao/<id>", "/deteccao/<id>/<arquivo>"}
+
+
+def _rota(partes):
+    """Rota agregada para as métricas (ids de job não viram chaves novas)"""
+    if partes[:1] == ["deteccao"] and len(partes) > 1:
+        partes = ["deteccao", "<id>"] + (["<arquivo>"] if len(partes) > 2 else [])
+    rota = "/" + "/".join(partes)
+    return rota if rota in ROTAS else "<desconhecida>"
+
+
+class _Manipulador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _json(self, status, corpo, headers=None):
+        dados = json.dumps(corpo, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(dados)))
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _texto(self, status, texto, tipo="text/plain; version=0.0.4; charset=utf-8"):
+        dados = texto.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _arquivo(self, caminho, tipo):
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(caminho.stat().st_size))
+        self.send_header("Content-Disposition", f'attachment; filename="{caminho.name}"')
+        self.end_headers()
+        with open(caminho, "rb") as f:
+            shutil.copyfileobj(f, self.wfile, TAMANHO_BLOCO_UPLOAD)
+
+    def _tamanho_corpo(self):
+        """Content-Length como int (0 se ausente); 400 se malformado"""
+        valor = self.headers.get("Content-Length")
+        if valor is None:
+            return 0
+        try:
+            tamanho = int(valor)
+        except ValueError:
+            tamanho = -1
+        if tamanho < 0:
+            raise ErroRequisicao(400, "Content-Length inválido")
+        return tamanho
+
+    def _ler_json(self):
+        tamanho = self._tamanho_corpo()
+        if tamanho > MAX_CORPO_JSON:
+            raise ErroRequisicao(413, "Corpo muito grande")
+        try:
+            corpo = json.loads(self.rfile.read(tamanho) or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise ErroRequisicao(400, "JSON inválido")
+        if not isinstance(corpo, dict):
+            raise ErroRequisicao(400, "O corpo deve ser um objeto JSON")
+        return corpo
+
+    def _atender(self, metodo):
+        servico = self.server.servico
+        url = urlparse(self.path)
+        partes = [p for p in url.path.split("/") if p]
+        rota = f"{metodo} {_rota(partes)}"
+        t0 = time.perf_counter()
+        status = 500
+        try:
+            # Perfilável: com SIA_PERFIL_LIMIAR, requisições lentas geram flame graph
+            with instrumentacao.span('api_requisicao', perfilavel=True, rota=rota):
+                status, resposta = self._despachar(servico, metodo, partes, url)
+            if resposta is not None:
+                self._json(status, resposta)
+        except ErroRequisicao as e:
+            status = e.status
+            headers = {"Retry-After": str(e.retry_after)} if e.retry_after else {}
+            if metodo == "POST":
+                # O corpo pode não ter sido lido (413, 503, upload cortado): não reaproveita a conexão
+                self.close_connection = True
+                headers["Connection"] = "close"
+            self._json(e.status, {"erro": str(e)}, headers)
+        except Exception as e:
+            self._json(500, {"erro": f"Erro interno: {e}"})
+        finally:
+            servico.metricas.registrar(rota, time.perf_counter() - t0, erro=status >= 400)
+
+    def _despachar(self, servico, metodo, partes, url):
+        """Retorna (status, corpo JSON); corpo None quando a resposta já foi escrita"""
+        if metodo == "GET":
+            if partes == ["saude"]:
+                saude = servico.saude()
+                return (200 if servico.pronto else 503), saude
+            if partes == ["metricas"]:
+                if parse_qs(url.query).get("formato") == ["prometheus"]:
+                    self._texto(200, instrumentacao.exportar_prometheus())
+                    return 200, None
+                return 200, servico.resumo_metricas()
+            if len(partes) == 2 and partes[0] == "deteccao":
+                return 200, servico.consultar_deteccao(partes[1])
+            if len(partes) == 3 and partes[0] == "deteccao":
+                servico.consultar_deteccao(partes[1])
+                caminho = servico.jobs.arquivo(partes[1], partes[2])
+                if caminho is None:
+                    raise ErroRequisicao(404, "Arquivo não disponível para este job")
+                self._arquivo(caminho, ARQUIVOS_JOB[partes[2]])
+                return 200, None
+            raise ErroRequisicao(404, "Rota não encontrada")
+
+        if not servico.pronto:
+            raise ErroRequisicao(503, "Carregando modelos", retry_after=2)
+        if partes == ["deteccao"]:
+            tipo = self.headers.get("Content-Type", "")
+            if tipo.startswith("application/json"):
+                job = servico.submeter_deteccao(self._ler_json())
+            else:
+                parametros = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                job = servico.submeter_deteccao(leitor=self.rfile, parametros=parametros,
+                                                tamanho=self._tamanho_corpo())
+            job['status_url'] = f"/deteccao/{job['id']}"
+            return 202, job
+
+        rotas = {("produtividade",): servico.produtividade,
+                 ("produtividade", "lote"): servico.produtividade_lote,
+                 ("roi",): servico.roi,
+                 ("leite",): servico.leite}
+        operacao = rotas.get(tuple(partes))
+        if operacao is None:
+            raise ErroRequisicao(404, "Rota não encontrada")
+        return 200, operacao(self._ler_json())
+
+    def do_GET(self):
+        self._atender("GET")
+
+    def do_POST(self):
+        self._atender("POST")
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    parser = argparse.ArgumentParser(description="API HTTP do SIA (produtividade, ROI, leite e detecção)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8000)
+    parser.add_argument("--dataset", type=Path, default=DATASET_PADRAO, help="crop_yield.csv")
+    parser.add_argument("--modelo", type=Path, default=MODELO_PADRAO, help="Pesos YOLO (.pt)")
+    parser.add_argument("--workers-deteccao", type=int, default=1, help="Instâncias YOLO / jobs simultâneos")
+    parser.add_argument("--max-concorrencia", type=int, default=4,
+                        help="Predições síncronas simultâneas antes de responder 503")
+    parser.add_argument("--pasta-jobs", type=Path, help="Onde guardar os resultados dos jobs")
+    parser.add_argument("--pasta-videos", type=Path,
+                        help='Pasta de onde {"caminho": ...} pode ler vídeos (sem ela, só upload no corpo)')
+    parser.add_argument("--max-upload-mb", type=int, default=MAX_UPLOAD // 1024 ** 2,
+                        help="Tamanho máximo de um vídeo enviado no corpo")
+    parser.add_argument("--max-jobs", type=int, default=MAX_JOBS_PENDENTES,
+                        help="Jobs de detecção na fila antes de responder 503")
+    parser.add_argument("--metricas", action="store_true",
+                        help="Liga spans/contadores (GET /metricas?formato=prometheus)")
+    parser.add_argument("--perfil-limiar", type=float,
+                        help="Grava flame graphs (.folded) de requisições mais lentas que N segundos")
+    parser.add_argument("--perfil-pasta", default="perfis", help="Pasta dos flame graphs")
+    args = parser.parse_args(argv)
+
+    if args.metricas:
+        instrumentacao.ativar()
+    if args.perfil_limiar is not None:
+        instrumentacao.ligar_perfilador(args.perfil_limiar, args.perfil_pasta)
+
+    servico = ServicoSIA(args.dataset, args.modelo, args.workers_deteccao, args.max_concorrencia, args.pasta_jobs,
+                         pasta_videos=args.pasta_videos, max_upload=args.max_upload_mb * 1024 ** 2,
+                         max_jobs_pendentes=args.max_jobs)
+    # Porta aberta já na carga: /saude responde 503 até os modelos estarem prontos
+    servidor = ServidorAPI((args.host, args.porta), servico)
+    servidor.iniciar_em_thread()
+    print(f"🔄 Carregando modelos... (API em {servidor.url})")
+    servico.carregar()
+    for aviso in servico.avisos:
+        print(f"⚠️ {aviso}")
+    print(f"✅ API pronta em {servidor.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.shutdown()
+        servico.fechar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
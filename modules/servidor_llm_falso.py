@@ -0,0 +1,165 @@
+"""
+Servidor LLM Falso (offline)
+Imita o endpoint /v1/chat/completions (compatível com OpenAI/Groq), com e sem
+streaming, para exercitar o ClienteLLM sem internet
+
+Uso:
+    python -m modules.servidor_llm_falso --porta 8099 --atraso 0.3 --falhas 2
+    GROQ_BASE_URL=http://127.0.0.1:8099/v1 GROQ_API_KEY=teste streamlit run app.py
+"""
+
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ServidorLLMFalso(ThreadingHTTPServer):
+    """
+    Servidor HTTP/1.1 (keep-alive) com latência e falhas configuráveis
+
+    Args:
+        resposta: texto devolvido em toda chamada
+        atraso: segundos até a resposta (ou até o primeiro token, no streaming)
+        atraso_token: segundos entre tokens no streaming
+        falhas: as N primeiras requisições recebem 429 (para testar retentativas)
+        retry_after: valor do cabeçalho Retry-After nessas respostas 429
+    """
+
+    daemon_threads = True
+
+    def __init__(self, endereco=("127.0.0.1", 0), resposta="Resposta do servidor de teste.",
+                 atraso=0.2, atraso_token=0.02, falhas=0, retry_after=0.1):
+        super().__init__(endereco, _Manipulador)
+        self.resposta = resposta
+        self.atraso = atraso
+        self.atraso_token = atraso_token
+        self.falhas_restantes = falhas
+        self.retry_after = retry_after
+        self.requisicoes = 0
+        self.conexoes = 0
+        self.em_andamento = 0
+        self.pico_concorrencia = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, porta = self.server_address[:2]
+        return f"http://{host}:{porta}/v1"
+
+    def iniciar_em_thread(self):
+        """Sobe o servidor em background e retorna a thread"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class _Manipulador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server._lock:
+            self.server.conexoes += 1
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _json(self, status, corpo, headers=None):
+        dados = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _pedaco(self, texto):
+        """Escreve um chunk de Transfer-Encoding: chunked"""
+        dados = texto.encode("utf-8")
+        self.wfile.write(f"{len(dados):x}\r\n".encode() + dados + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        servidor = self.server
+        tamanho = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(tamanho) or b"{}")
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": "not found"}})
+            return
+
+        with servidor._lock:
+            servidor.requisicoes += 1
+            falhar = servidor.falhas_restantes > 0
+            if falhar:
+                servidor.falhas_restantes -= 1
+            servidor.em_andamento += 1
+            servidor.pico_concorrencia = max(servidor.pico_concorrencia, servidor.em_andamento)
+
+        try:
+            if falhar:
+                self._json(429, {"error": {"message": "rate limit"}},
+                           {"Retry-After": str(servidor.retry_after)})
+                return
+
+            modelo = payload.get("model", "falso")
+            time.sleep(servidor.atraso)
+
+            if not payload.get("stream"):
+                self._json(200, {
+                    "id": "chatcmpl-falso", "object": "chat.completion", "model": modelo,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": servidor.resposta}}]
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            tokens = re.findall(r"\S+\s*", servidor.resposta)
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(servidor.atraso_token)
+                evento = {"id": "chatcmpl-falso", "object": "chat.completion.chunk", "model": modelo,
+                          "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                self._pedaco(f"data: {json.dumps(evento, ensure_ascii=False)}\n\n")
+            # Como a OpenAI com include_usage: último evento só com o uso, sem choices
+            uso = {"id": "chatcmpl-falso", "object": "chat.completion.chunk", "model": modelo, "choices": [],
+                   "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens)}}
+            self._pedaco(f"data: {json.dumps(uso)}\n\n")
+            self._pedaco("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        finally:
+            with servidor._lock:
+                servidor.em_andamento -= 1
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    parser = argparse.ArgumentParser(description="Servidor falso de chat-completions para testes offline")
+    parser.add_argument("--porta", type=int, default=8099)
+    parser.add_argument("--resposta", default="Resposta do servidor de teste.")
+    parser.add_argument("--atraso", type=float, default=0.2, help="Segundos até a resposta/1º token")
+    parser.add_argument("--atraso-token", type=float, default=0.02, help="Segundos entre tokens")
+    parser.add_argument("--falhas", type=int, default=0, help="Responde 429 nas N primeiras requisições")
+    args = parser.parse_args(argv)
+
+    servidor = ServidorLLMFalso(("127.0.0.1", args.porta), args.resposta, args.atraso,
+                                args.atraso_token, args.falhas)
+    print(f"🧪 Servidor falso em {servidor.url}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,20 +6,25 @@ Carrega dados, treina modelo e faz predições
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_error, r2_score
+
+from modules.instrumentacao import contar, span
+
+# scikit-learn é importado dentro do ModeloML: só pesa na primeira simulação
+
+def ler_dataset(dataset_path, max_linhas=40000):
+    """Lê o crop_yield.csv (amostrado em `max_linhas`) sem depender do Streamlit"""
+    with span('carregar_dados'):
+        df = pd.read_csv(dataset_path)
+        if len(df) > max_linhas:
+            df = df.sample(n=max_linhas, random_state=42)
+        return df.dropna()
 
 @st.cache_data
 def carregar_dados(dataset_path):
     """Carrega dataset de crop_yield.csv"""
     if dataset_path.exists():
         try:
-            df = pd.read_csv(dataset_path)
-            if len(df) > 40000:
-                df = df.sample(n=40000, random_state=42)
-            return df.dropna()
+            return ler_dataset(dataset_path)
         except Exception as e:
             st.error(f"❌ Erro ao carregar dataset: {e}")
             st.stop()
@@ -30,17 +35,24 @@ def carregar_dados(dataset_path):
 class ModeloML:
     """Modelo Random Forest para predição de produtividade"""
     
+    CATEGORICAS = ['Region', 'Soil_Type', 'Crop', 'Weather_Condition']
+    NUMERICAS = ['Rainfall_mm', 'Temperature_Celsius', 'Days_to_Harvest']
+    BOOLEANAS = ['Fertilizer_Used', 'Irrigation_Used']
+    
     def __init__(self, df):
+        from sklearn.ensemble import RandomForestRegressor
+        
         self.df = df
         self.model = RandomForestRegressor(n_estimators=30, max_depth=8, n_jobs=-1, random_state=42)
         self.encoders = {}
         self.trained = False
+        self.predicoes_treino = None  # ordenadas, para o percentil
         
     def preparar(self):
         """Prepara dados para treinamento"""
-        cat_cols = ['Region', 'Soil_Type', 'Crop', 'Weather_Condition']
-        num_cols = ['Rainfall_mm', 'Temperature_Celsius', 'Days_to_Harvest']
-        bool_cols = ['Fertilizer_Used', 'Irrigation_Used']
+        from sklearn.preprocessing import LabelEncoder
+        
+        cat_cols, num_cols, bool_cols = self.CATEGORICAS, self.NUMERICAS, self.BOOLEANAS
         
         X = self.df[cat_cols + num_cols + bool_cols].copy()
         y = self.df['Yield_tons_per_hectare']
@@ -57,12 +69,18 @@ class ModeloML:
     
     def treinar(self):
         """Treina o modelo"""
-        X, y = self.preparar()
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        self.model.fit(X_train, y_train)
-        y_pred = self.model.predict(X_test)
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import mean_absolute_error, r2_score
         
+        with span('treinar'):
+            X, y = self.preparar()
+            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+            
+            self.model.fit(X_train, y_train)
+            y_pred = self.model.predict(X_test)
+            
+            # Distribuição de referência do percentil: calculada uma vez, não a cada predição
+            self.predicoes_treino = np.sort(self.model.predict(X))
         self.trained = True
         return {'mae': mean_absolute_error(y_test, y_pred), 'r2': r2_score(y_test, y_pred)}
     
@@ -72,21 +90,58 @@ class ModeloML:
             return {"error": "Modelo não treinado"}
         
         try:
-            cats = ['Region', 'Soil_Type', 'Crop', 'Weather_Condition']
-            for col in cats:
-                if col in dados:
-                    dados[col] = self.encoders[col].transform([dados[col]])[0]
-            
-            df_input = pd.DataFrame([dados])
-            pred = self.model.predict(df_input)[0]
-            
-            all_preds = self.model.predict(self.preparar()[0])
-            percentil = (np.sum(all_preds <= pred) / len(all_preds)) * 100
-            
-            return {'prediction': pred, 'percentile': percentil}
-            
+            return self.predizer_lote([dados])[0]
         except Exception as e:
             return {"error": f"Erro: {str(e)}"}
+    
+    def predizer_lote(self, lista_dados):
+        """
+        Prediz vários cenários com uma única chamada ao Random Forest
+        
+        Returns:
+            lista na mesma ordem com {'prediction', 'percentile'} ou {'error'} por item
+        """
+        if not self.trained:
+            return [{"error": "Modelo não treinado"} for _ in lista_dados]
+        
+        colunas = self.CATEGORICAS + self.NUMERICAS + self.BOOLEANAS
+        X = pd.DataFrame(list(lista_dados), columns=colunas)
+        invalidos = X.isna().any(axis=1).to_numpy().copy()
+        
+        # Valor não numérico (ex.: "abc", "false") vira NaN e só invalida o próprio item
+        for col in self.NUMERICAS + self.BOOLEANAS:
+            X[col] = pd.to_numeric(X[col], errors='coerce').astype(float)
+        for col in self.BOOLEANAS:
+            X.loc[~X[col].isin([0, 1]), col] = np.nan
+        invalidos |= X[self.NUMERICAS + self.BOOLEANAS].isna().any(axis=1).to_numpy()
+        
+        for col in self.CATEGORICAS:
+            classes = {c: i for i, c in enumerate(self.encoders[col].classes_)}
+            X[col] = X[col].map(classes)
+            invalidos |= X[col].isna().to_numpy()
+        
+        resultados = [None] * len(X)
+        validos = np.flatnonzero(~invalidos)
+        if len(validos):
+            X_validos = X.iloc[validos].astype(float)
+            for col in self.BOOLEANAS:
+                X_validos[col] = X_validos[col].astype(int)
+            with span('predizer'):
+                preds = self.model.predict(X_validos)
+            
+            with span('percentil'):
+                if self.predicoes_treino is None:
+                    self.predicoes_treino = np.sort(self.model.predict(self.preparar()[0]))
+                percentis = np.searchsorted(self.predicoes_treino, preds, side='right') / len(self.predicoes_treino) * 100
+            for i, pred, percentil in zip(validos, preds, percentis):
+                resultados[i] = {'prediction': float(pred), 'percentile': float(percentil)}
+        
+        contar('predicoes', len(validos))
+        contar('predicoes_invalidas', int(invalidos.sum()))
+        for i in np.flatnonzero(invalidos):
+            faltando = [c for c in colunas if pd.isna(X.iloc[i][c])]
+            resultados[i] = {"error": f"Erro: campos ausentes, desconhecidos ou inválidos: {', '.join(faltando)}"}
+        return resultados
 
 # ==================== TRADUÇÕES ====================
 MAPA = {
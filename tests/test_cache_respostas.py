@@ -0,0 +1,52 @@
+from modules import cache_respostas
+from modules.cache_respostas import CacheRespostas, chave_cache, hash_contexto, normalizar_pergunta
+
+
+def test_pergunta_normalizada():
+    assert normalizar_pergunta("  Qual é o ROI?? ") == "qual e o roi"
+    assert chave_cache({'a': 1}, "Qual é o ROI?") == chave_cache({'a': 1}, "qual e o roi")
+
+
+def test_chave_independe_da_ordem_do_contexto():
+    assert hash_contexto({'a': 1, 'b': {'c': 2, 'd': 3}}) == hash_contexto({'b': {'d': 3, 'c': 2}, 'a': 1})
+    assert chave_cache({'a': 1}, "roi") != chave_cache({'a': 2}, "roi")
+    assert chave_cache({'a': 1}, "roi") != chave_cache({'a': 1}, "lucro")
+
+
+def test_ttl_expira(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(cache_respostas.time, "time", lambda: agora[0])
+    cache = CacheRespostas(ttl_segundos=60)
+    cache.guardar("k", "resposta")
+
+    agora[0] += 59
+    assert cache.obter("k") == "resposta"
+    agora[0] += 2
+    assert cache.obter("k") is None
+    assert cache.estatisticas == {'hits_memoria': 1, 'hits_disco': 0, 'misses': 1, 'expirados': 1}
+
+
+def test_lru_descarta_o_menos_usado():
+    cache = CacheRespostas(max_itens=2)
+    cache.guardar("a", "1")
+    cache.guardar("b", "2")
+    cache.obter("a")
+    cache.guardar("c", "3")
+    assert cache.obter("b") is None
+    assert cache.obter("a") == "1" and cache.obter("c") == "3"
+
+
+def test_disco_sobrevive_e_expira(tmp_path, monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(cache_respostas.time, "time", lambda: agora[0])
+    caminho = tmp_path / "cache.sqlite"
+    CacheRespostas(caminho_disco=str(caminho), ttl_segundos=60).guardar("k", "resposta")
+
+    novo = CacheRespostas(caminho_disco=str(caminho), ttl_segundos=60)
+    assert novo.obter("k") == "resposta"
+    assert novo.estatisticas['hits_disco'] == 1
+
+    agora[0] += 120
+    outro = CacheRespostas(caminho_disco=str(caminho), ttl_segundos=60)
+    assert outro.obter("k") is None
+    assert outro.estatisticas['expirados'] == 1
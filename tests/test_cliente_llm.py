@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+from modules.cliente_llm import ClienteLLM, ErroLLM
+from modules.servidor_llm_falso import ServidorLLMFalso
+
+MENSAGENS = [{"role": "user", "content": "Qual o ROI?"}]
+
+
+@pytest.fixture
+def servidor():
+    servidor = ServidorLLMFalso(resposta="Resposta em quatro tokens.", atraso=0.2, atraso_token=0.01)
+    servidor.iniciar_em_thread()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def cliente(servidor):
+    cliente = ClienteLLM("teste", servidor.url, backoff_base=0.01, backoff_max=0.05)
+    yield cliente
+    cliente.fechar()
+
+
+def test_stream_ignora_evento_sem_choices(cliente, servidor):
+    # O servidor falso termina com um evento só de uso (choices vazio), como a OpenAI
+    assert "".join(cliente.completar_stream("m", MENSAGENS)) == servidor.resposta
+
+
+def test_streams_identicos_em_andamento_compartilham_a_requisicao(cliente, servidor):
+    respostas = [None] * 4
+
+    def consumir(i):
+        respostas[i] = "".join(cliente.completar_stream("m", MENSAGENS))
+
+    threads = [threading.Thread(target=consumir, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert respostas == [servidor.resposta] * 4
+    assert servidor.requisicoes == 1
+    assert cliente.estatisticas['coalescidas'] == 3
+
+
+def test_streams_diferentes_nao_sao_unificados(cliente, servidor):
+    "".join(cliente.completar_stream("m", MENSAGENS))
+    "".join(cliente.completar_stream("m", [{"role": "user", "content": "Outra"}]))
+    assert servidor.requisicoes == 2
+
+
+def test_retentativa_apos_429(servidor):
+    servidor.falhas_restantes = 2
+    cliente = ClienteLLM("teste", servidor.url, backoff_base=0.01, backoff_max=0.05)
+    try:
+        assert "".join(cliente.completar_stream("m", MENSAGENS)) == servidor.resposta
+        assert cliente.estatisticas['retentativas'] == 2
+    finally:
+        cliente.fechar()
+
+
+def test_retry_after_limitado_ao_backoff_maximo(servidor):
+    servidor.falhas_restantes = 1
+    servidor.retry_after = 3600
+    cliente = ClienteLLM("teste", servidor.url, backoff_max=0.05)
+    try:
+        assert cliente.completar("m", MENSAGENS) == servidor.resposta
+    finally:
+        cliente.fechar()
+
+
+def test_espera_backoff():
+    cliente = ClienteLLM("teste", "http://127.0.0.1:9", backoff_base=0.5, backoff_max=8.0)
+    try:
+        assert cliente._espera_backoff(0, ErroLLM("x", True, retry_after=2.0)) == 2.0
+        assert cliente._espera_backoff(0, ErroLLM("x", True, retry_after=120.0)) == 8.0
+        assert cliente._espera_backoff(0, ErroLLM("x", True, retry_after=-1.0)) == 0.0
+        # Exponencial com jitter de ±50%, limitado a backoff_max
+        assert 0.25 <= cliente._espera_backoff(0, ErroLLM("x", True)) <= 0.75
+        assert 2.0 <= cliente._espera_backoff(3, ErroLLM("x", True)) <= 6.0
+        assert 4.0 <= cliente._espera_backoff(10, ErroLLM("x", True)) <= 12.0
+    finally:
+        cliente.fechar()
+
+
+
+def test_ouvinte_que_desiste_nao_interrompe_os_outros(cliente, servidor):
+    primeiro = cliente.completar_stream("m", MENSAGENS)
+    assert next(primeiro) == "Resposta "
+    segundo = cliente.completar_stream("m", MENSAGENS)
+    # Quem chega depois recebe primeiro o que já foi emitido
+    assert next(segundo) == "Resposta "
+    primeiro.close()
+    assert "Resposta " + "".join(segundo) == servidor.resposta
+    assert servidor.requisicoes == 1
@@ -0,0 +1,81 @@
+from modules.agente_chat import AgenteChat
+from modules.cache_respostas import CacheRespostas
+from modules.chat_falso import ChatFalso
+from modules.contexto_llm import compactar_contexto, detectar_intencao, estimar_tokens, montar_prompt
+
+CONTEXTO = {
+    'simulacao': {'cultura': 'Rice', 'producao_tha': 4.63, 'regiao': 'North', 'fertilizante': True,
+                  'irrigacao': False, 'chuva': 500, 'temperatura': 25, 'clima': 'Sunny', 'solo': 'Clay'},
+    'roi': {'financeiro': {'roi_percentual': 42.5, 'lucro_liquido': 1200.0}, 'status': 'ok',
+            'mercado': {'preco_tonelada': 1500}},
+    'predicao_leite': {'media_prevista': 310.2, 'variacao_percentual': 3.1},
+    'deteccao_gado': {'media_vacas': 4.2, 'maximo_vacas': 7}
+}
+SECOES = list(CONTEXTO)
+
+
+def test_intencao_casa_palavras_inteiras():
+    assert detectar_intencao("Vale a pena investir?", SECOES) == ['simulacao', 'roi']
+    assert detectar_intencao("Quantas vacas e bois aparecem?", SECOES) == ['deteccao_gado']
+    assert detectar_intencao("Previsão de litros de leite", SECOES) == ['predicao_leite']
+
+
+def test_intencao_ignora_substrings():
+    # 'vale' dentro de "avalie" e 'boi' dentro de "boiar" não indicam assunto: vão todas as seções
+    assert detectar_intencao("avalie isso", SECOES) == SECOES
+    assert detectar_intencao("boiar", SECOES) == SECOES
+
+
+def test_contexto_compacto_respeita_orcamento():
+    completo, _ = compactar_contexto(CONTEXTO, "resumo", orcamento_tokens=10000)
+    texto, secoes = compactar_contexto(CONTEXTO, "resumo", orcamento_tokens=100)
+    assert secoes == SECOES
+    assert estimar_tokens(texto) <= 100 < estimar_tokens(completo)
+    # Campos de maior prioridade ficam; os do fim da lista saem primeiro
+    assert '"cultura"' in texto and '"solo"' not in texto
+
+
+def test_montar_prompt_prioriza_contexto_sobre_historico():
+    historico = [{'role': 'user', 'content': 'pergunta antiga ' * 50},
+                 {'role': 'assistant', 'content': 'resposta ' * 50}]
+    prompt = montar_prompt(CONTEXTO, "Qual o lucro?", historico, orcamento_tokens=120)
+    assert prompt['tamanho']['tokens_total'] <= 120
+    assert '"roi"' in prompt['contexto']
+
+
+def _agente():
+    return AgenteChat(None, llm=ChatFalso(atraso_primeiro_token=0, atraso_token=0), cache=CacheRespostas())
+
+
+def test_cache_compartilha_primeira_pergunta_entre_sessoes():
+    agente = _agente()
+    "".join(agente.responder_stream("Explique a fisiologia da planta", CONTEXTO, []))
+    assert agente.ultima_latencia['origem'] == "llm"
+
+    # Outra sessão, também sem histórico, com a mesma pergunta em outra grafia
+    "".join(agente.responder_stream("explique a FISIOLOGIA da planta!", CONTEXTO, []))
+    assert agente.ultima_latencia['origem'] == "cache"
+
+
+def test_cache_separa_continuacoes_de_conversas_diferentes():
+    agente = _agente()
+    solo = [{'role': 'user', 'content': 'Explique o solo'}, {'role': 'assistant', 'content': 'Solo argiloso.'}]
+    temperatura = [{'role': 'user', 'content': 'E a temperatura?'}, {'role': 'assistant', 'content': '25 °C.'}]
+
+    "".join(agente.responder_stream("Por quê?", CONTEXTO, solo))
+    assert agente.ultima_latencia['origem'] == "llm"
+    # Mesma pergunta de acompanhamento em outra conversa: não pode reaproveitar a resposta
+    "".join(agente.responder_stream("Por quê?", CONTEXTO, temperatura))
+    assert agente.ultima_latencia['origem'] == "llm"
+    # Na mesma conversa, a repetição continua vindo do cache
+    "".join(agente.responder_stream("Por quê?", CONTEXTO, solo))
+    assert agente.ultima_latencia['origem'] == "cache"
+
+
+def test_cache_separa_contextos_diferentes():
+    agente = _agente()
+    pergunta = "Explique a fisiologia da planta"
+    "".join(agente.responder_stream(pergunta, CONTEXTO))
+    outro = {**CONTEXTO, 'simulacao': {**CONTEXTO['simulacao'], 'cultura': 'Maize'}}
+    "".join(agente.responder_stream(pergunta, outro))
+    assert agente.ultima_latencia['origem'] == "llm"
@@ -0,0 +1,106 @@
+import re
+import threading
+import time
+
+import pytest
+
+from modules import instrumentacao
+
+
+@pytest.fixture(autouse=True)
+def registro_limpo():
+    instrumentacao.limpar()
+    instrumentacao.ativar()
+    yield
+    instrumentacao.desligar_perfilador()
+    instrumentacao.desativar()
+    instrumentacao.limpar()
+
+
+def test_desligada_nao_registra():
+    instrumentacao.desativar()
+    with instrumentacao.span('x'):
+        pass
+    instrumentacao.contar('y')
+    assert instrumentacao.instantaneo() == {'contadores': [], 'histogramas': []}
+
+
+def test_exportacao_prometheus():
+    instrumentacao.contar('cache_consultas', resultado='memoria')
+    instrumentacao.contar('cache_consultas', 2, resultado='memoria')
+    instrumentacao.observar('inferencia', 0.003)
+    instrumentacao.observar('inferencia', 0.2)
+    instrumentacao.observar('api requisicao', 0.01, rota='POST /roi "x"')
+    texto = instrumentacao.exportar_prometheus()
+    linhas = texto.splitlines()
+
+    assert "# TYPE sia_cache_consultas_total counter" in linhas
+    assert 'sia_cache_consultas_total{resultado="memoria"} 3' in linhas
+    assert "# TYPE sia_inferencia_segundos histogram" in linhas
+    # Buckets cumulativos, terminando em +Inf = _count
+    assert 'sia_inferencia_segundos_bucket{le="0.0025"} 0' in linhas
+    assert 'sia_inferencia_segundos_bucket{le="0.005"} 1' in linhas
+    assert 'sia_inferencia_segundos_bucket{le="0.25"} 2' in linhas
+    assert 'sia_inferencia_segundos_bucket{le="+Inf"} 2' in linhas
+    assert "sia_inferencia_segundos_sum 0.203000" in linhas
+    assert "sia_inferencia_segundos_count 2" in linhas
+    # Nome saneado e rótulo escapado
+    assert 'sia_api_requisicao_segundos_count{rota="POST /roi \\"x\\""} 1' in linhas
+
+    amostra = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[^}]*\})? [0-9.eE+-]+$')
+    assert all(l.startswith("# TYPE ") or amostra.match(l) for l in linhas)
+    assert texto.endswith("\n")
+
+
+def test_span_conta_erros_mas_nao_controle_de_fluxo():
+    with pytest.raises(ValueError):
+        with instrumentacao.span('op'):
+            raise ValueError()
+    with pytest.raises(KeyboardInterrupt):
+        with instrumentacao.span('op'):
+            raise KeyboardInterrupt()
+    dados = instrumentacao.instantaneo()
+    assert [c['valor'] for c in dados['contadores'] if c['nome'] == 'op_erros'] == [1]
+    assert dados['histogramas'][0]['contagem'] == 2
+
+
+def test_coletar_e_mesclar():
+    instrumentacao.contar('frames', 10)
+    instrumentacao.observar('inferencia', 0.01)
+    worker = instrumentacao.coletar()
+    assert instrumentacao.instantaneo() == {'contadores': [], 'histogramas': []}
+
+    instrumentacao.contar('frames', 5)
+    instrumentacao.observar('inferencia', 0.5)
+    instrumentacao.mesclar(worker)
+    dados = instrumentacao.instantaneo()
+    assert dados['contadores'][0]['valor'] == 15
+    h = dados['histogramas'][0]
+    assert h['contagem'] == 2 and h['max_s'] == 0.5 and sum(h['buckets']) == 2
+
+
+def _threads_perfilador():
+    return [t for t in threading.enumerate() if t.name == "sia-perfilador"]
+
+
+def test_perfilador_grava_span_lento_e_para_ao_desligar(tmp_path):
+    perfilador = instrumentacao.ligar_perfilador(limiar=0.05, pasta=tmp_path, intervalo=0.001)
+    with instrumentacao.span('lento', perfilavel=True, rota='x'):
+        time.sleep(0.1)
+    with instrumentacao.span('rapido', perfilavel=True):
+        pass
+    assert perfilador.gravados == 1
+    arquivo, = tmp_path.glob("*_lento_x_*.folded")
+    assert "test_instrumentacao.py" in arquivo.read_text()
+
+    assert len(_threads_perfilador()) == 1
+    instrumentacao.desligar_perfilador()
+    assert _threads_perfilador() == []
+
+
+def test_variavel_de_ambiente_invalida_avisa(monkeypatch):
+    monkeypatch.setenv("SIA_PERFIL_LIMIAR", "rapido")
+    monkeypatch.setenv("SIA_METRICAS_ARQUIVO", "")
+    with pytest.warns(RuntimeWarning, match="SIA_PERFIL_LIMIAR"):
+        instrumentacao.configurar_por_ambiente()
+    assert instrumentacao._perfilador is None
@@ -0,0 +1,174 @@
+import multiprocessing
+import shutil
+
+import cv2
+import numpy as np
+import pytest
+
+from benchmarks.fixtures import ModeloBlobs, gerar_video_blobs
+from modules import motor_deteccao
+from modules.motor_deteccao import (RegistroDeteccoes, carregar_deteccoes, concatenar_deteccoes,
+                                    concatenar_videos, dividir_intervalos, processar_video,
+                                    propriedades_video, resumir_metricas)
+
+FRAMES = 40
+
+
+@pytest.fixture(scope="module")
+def video(tmp_path_factory):
+    caminho = tmp_path_factory.mktemp("video") / "rebanho.mp4"
+    gerar_video_blobs(caminho, frames=FRAMES)
+    return caminho
+
+
+def _cobertura(intervalos, total):
+    frames = []
+    for inicio, fim in intervalos:
+        frames.extend(range(inicio, total if fim is None else fim))
+    return frames
+
+
+@pytest.mark.parametrize("total, partes", [(100, 4), (101, 4), (103, 7), (3, 8), (1, 1), (10, 1)])
+def test_dividir_intervalos_cobre_todos_os_frames_sem_sobrepor(total, partes):
+    intervalos = dividir_intervalos(total, partes)
+    assert len(intervalos) == min(partes, total)
+    assert intervalos[0][0] == 0 and intervalos[-1][1] is None
+    # Contíguos: cada intervalo começa onde o anterior termina
+    assert all(a[1] == b[0] for a, b in zip(intervalos, intervalos[1:]))
+    assert _cobertura(intervalos, total) == list(range(total))
+
+
+def test_dividir_intervalos_video_vazio():
+    assert dividir_intervalos(0, 4) == [(0, None)]
+
+
+def test_intervalo_de_frames_igual_ao_sequencial(video):
+    completo = processar_video(ModeloBlobs(), video)
+    for inicio, fim in dividir_intervalos(FRAMES, 3):
+        parte = processar_video(ModeloBlobs(), video, frame_inicio=inicio, frame_fim=fim)
+        esperado = completo.iloc[inicio:fim]
+        assert parte['Frame'].tolist() == esperado['Frame'].tolist()
+        assert parte['Vacas no Frame'].tolist() == esperado['Vacas no Frame'].tolist()
+
+
+def test_concatenar_videos_sem_ffmpeg_recodifica(video, tmp_path, monkeypatch):
+    monkeypatch.setattr(motor_deteccao.shutil, "which", lambda _: None)
+    largura, altura, fps, _ = propriedades_video(video)
+    segmentos = []
+    for i, (inicio, fim) in enumerate(dividir_intervalos(FRAMES, 3)):
+        segmentos.append(tmp_path / f"seg{i}.mp4")
+        processar_video(ModeloBlobs(), video, segmentos[-1], frame_inicio=inicio, frame_fim=fim)
+    concatenar_videos(segmentos, tmp_path / "final.mp4", fps, largura, altura)
+    assert propriedades_video(tmp_path / "final.mp4")[3] == FRAMES
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg não instalado")
+def test_concatenar_videos_com_ffmpeg_copia(video, tmp_path):
+    largura, altura, fps, _ = propriedades_video(video)
+    segmentos = []
+    for i, (inicio, fim) in enumerate(dividir_intervalos(FRAMES, 2)):
+        segmentos.append(tmp_path / f"seg{i}.mp4")
+        processar_video(ModeloBlobs(), video, segmentos[-1], frame_inicio=inicio, frame_fim=fim)
+    concatenar_videos(segmentos, tmp_path / "final.mp4", fps, largura, altura)
+    assert propriedades_video(tmp_path / "final.mp4")[3] == FRAMES
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                    reason="o detector falso chega aos workers só por fork")
+def test_paralelo_igual_ao_sequencial(video, tmp_path, monkeypatch):
+    monkeypatch.setattr(motor_deteccao, "carregar_modelo", lambda _: ModeloBlobs())
+    sequencial = processar_video(ModeloBlobs(), video, arquivo_deteccoes=tmp_path / "seq.npz")
+    paralelo = motor_deteccao.processar_video_paralelo("falso.pt", video, tmp_path / "par.mp4", workers=3,
+                                                       arquivo_deteccoes=tmp_path / "par.npz")
+    assert paralelo['Frame'].tolist() == list(range(1, FRAMES + 1))
+    assert paralelo['Vacas no Frame'].tolist() == sequencial['Vacas no Frame'].tolist()
+    seq, par = carregar_deteccoes(tmp_path / "seq.npz"), carregar_deteccoes(tmp_path / "par.npz")
+    assert np.array_equal(seq['frame'], par['frame']) and np.array_equal(seq['caixa'], par['caixa'])
+    assert propriedades_video(tmp_path / "par.mp4")[3] == FRAMES
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                    reason="o detector falso chega aos workers só por fork")
+def test_paralelo_somente_contagem_sem_arquivos_de_saida(video, monkeypatch):
+    monkeypatch.setattr(motor_deteccao, "carregar_modelo", lambda _: ModeloBlobs())
+    df = motor_deteccao.processar_video_paralelo("falso.pt", video, workers=2)
+    assert df['Frame'].tolist() == list(range(1, FRAMES + 1))
+
+
+def test_registro_cresce_e_concatena_remapeando_classes(tmp_path):
+    a = RegistroDeteccoes(capacidade=1)
+    for frame in range(1, 6):
+        a.adicionar(frame, [('cow', 0.9, 1, 2, 3, 4), ('dog', 0.6, 5, 6, 7, 8)])
+    a.salvar(tmp_path / "a.npz")
+    b = RegistroDeteccoes()
+    b.adicionar(6, [('dog', 0.7, 0, 0, 1, 1)])
+    b.adicionar(7, [])
+    b.salvar(tmp_path / "b.npz")
+
+    concatenar_deteccoes([tmp_path / "a.npz", tmp_path / "b.npz"], tmp_path / "ab.npz")
+    dados = carregar_deteccoes(tmp_path / "ab.npz")
+    assert len(dados['frame']) == 11
+    assert [str(n) for n in dados['nomes']] == ['cow', 'dog']
+    assert dados['classe'][-1] == 1 and dados['frame'][-1] == 6
+    assert dados['caixa'].shape == (11, 4)
+
+
+def test_resumo_de_video_sem_frames():
+    vazio = motor_deteccao.MetricasFrames(0).para_dataframe()
+    assert resumir_metricas(vazio, "x.mp4")['frames_processados'] == 0
+
+
+def test_posicionar_confere_o_frame_decodificado(video):
+    captura = cv2.VideoCapture(str(video))
+    frames = []
+    while True:
+        ok, img = captura.read()
+        if not ok:
+            break
+        frames.append(img)
+    captura.release()
+
+    for inicio in (1, 13, FRAMES - 1):
+        captura = cv2.VideoCapture(str(video))
+        motor_deteccao._posicionar(captura, inicio)
+        ok, img = captura.read()
+        captura.release()
+        assert ok and np.array_equal(img, frames[inicio])
+
+
+class _CapturaSeekImpreciso:
+    """Captura cujo seek sempre para no keyframe inicial, mas relata o frame pedido"""
+
+    def __init__(self, caminho):
+        self._captura = cv2.VideoCapture(str(caminho))
+        self._pedido = None
+
+    def set(self, prop, valor):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self._pedido = valor
+            return self._captura.set(prop, 0)
+        return self._captura.set(prop, valor)
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_FRAMES and self._pedido is not None:
+            return self._pedido
+        return self._captura.get(prop)
+
+    def read(self):
+        return self._captura.read()
+
+    def grab(self):
+        return self._captura.grab()
+
+
+def test_posicionar_com_seek_impreciso_avanca_frame_a_frame(video):
+    referencia = cv2.VideoCapture(str(video))
+    for _ in range(20):
+        referencia.grab()
+    _, esperado = referencia.read()
+    referencia.release()
+
+    captura = _CapturaSeekImpreciso(video)
+    motor_deteccao._posicionar(captura, 20)
+    _, img = captura.read()
+    assert np.array_equal(img, esperado)
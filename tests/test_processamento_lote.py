@@ -0,0 +1,49 @@
+import json
+import multiprocessing
+import shutil
+
+import pytest
+
+from benchmarks.fixtures import ModeloBlobs, gerar_video_blobs
+from modules import instrumentacao, motor_deteccao
+from modules.processamento_lote import ARQUIVO_RESUMO, hash_arquivo, processar_pasta
+
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                                reason="o detector falso chega aos workers só por fork")
+
+
+@pytest.fixture
+def pasta_videos(tmp_path, monkeypatch):
+    monkeypatch.setattr(motor_deteccao, "carregar_modelo", lambda _: ModeloBlobs())
+    videos = tmp_path / "videos"
+    videos.mkdir()
+    gerar_video_blobs(videos / "a.mp4", frames=12)
+    gerar_video_blobs(videos / "b.mp4", frames=8, seed=1)
+    # Cópia idêntica de a.mp4: mesmo hash, mesma pasta de destino
+    shutil.copy(videos / "a.mp4", videos / "c.mp4")
+    return videos
+
+
+def test_copias_identicas_processadas_uma_vez(pasta_videos, tmp_path):
+    relatorio = processar_pasta(pasta_videos, tmp_path / "saida", "falso.pt", workers=2)
+    assert relatorio['videos_processados'] == 2
+    assert relatorio['videos_pulados'] == 1
+    resumo = json.loads((tmp_path / "saida" / hash_arquivo(pasta_videos / "a.mp4") / ARQUIVO_RESUMO).read_text())
+    assert resumo['frames_processados'] == 12
+
+    # Reexecução: tudo já tem resumo.json
+    de_novo = processar_pasta(pasta_videos, tmp_path / "saida", "falso.pt", workers=2)
+    assert de_novo['videos_processados'] == 0 and de_novo['videos_pulados'] == 3
+
+
+def test_metricas_dos_workers_voltam_ao_processo_principal(pasta_videos, tmp_path):
+    instrumentacao.limpar()
+    instrumentacao.ativar()
+    try:
+        processar_pasta(pasta_videos, tmp_path / "saida", "falso.pt", workers=2, somente_deteccao=True)
+        exportado = instrumentacao.exportar_arquivo(tmp_path / "sia.prom").read_text()
+    finally:
+        instrumentacao.desativar()
+        instrumentacao.limpar()
+    assert "sia_inferencia_segundos_count 20" in exportado.splitlines()
+    assert "sia_frames_processados_total 20" in exportado.splitlines()
@@ -0,0 +1,155 @@
+import http.client
+import json
+import socket
+import time
+
+import pytest
+
+from benchmarks.fixtures import ModeloBlobs, gerar_crop_yield, gerar_video_blobs
+from modules.servidor_api import GerenciadorJobs, PoolModelos, ServicoSIA, ServidorAPI
+from modules.simulador import ModeloML, ler_dataset
+
+
+@pytest.fixture
+def api(tmp_path):
+    videos = tmp_path / "videos"
+    videos.mkdir()
+    gerar_video_blobs(videos / "rebanho.mp4", frames=10)
+    (tmp_path / "segredo.mp4").write_bytes(b"x")
+
+    servico = ServicoSIA(tmp_path / "sem_dataset.csv", tmp_path / "sem_modelo.pt",
+                         pasta_jobs=tmp_path / "jobs", pasta_videos=videos, max_upload=1024 ** 2)
+    servico.carregar()
+    # Detector de manchas no lugar do YOLO: exercita os jobs sem ultralytics
+    servico.jobs = GerenciadorJobs(PoolModelos(ModeloBlobs, 1), servico.pasta_jobs, max_pendentes=2)
+    servidor = ServidorAPI(("127.0.0.1", 0), servico)
+    servidor.iniciar_em_thread()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+    servico.fechar()
+
+
+def _requisitar(servidor, metodo, caminho, corpo=None, headers=None):
+    host, porta = servidor.server_address[:2]
+    conexao = http.client.HTTPConnection(host, porta, timeout=10)
+    try:
+        if isinstance(corpo, dict):
+            corpo = json.dumps(corpo)
+            headers = {"Content-Type": "application/json", **(headers or {})}
+        conexao.request(metodo, caminho, corpo, headers or {})
+        resposta = conexao.getresponse()
+        return resposta.status, json.loads(resposta.read() or b"{}")
+    finally:
+        conexao.close()
+
+
+def _bruto(servidor, requisicao):
+    """Envia bytes crus e fecha a escrita (simula cliente que desiste no meio do upload)"""
+    with socket.create_connection(servidor.server_address[:2], timeout=10) as s:
+        s.sendall(requisicao)
+        s.shutdown(socket.SHUT_WR)
+        resposta = b""
+        while bloco := s.recv(65536):
+            resposta += bloco
+    return int(resposta.split(b" ", 2)[1])
+
+
+def test_json_invalido(api):
+    status, corpo = _requisitar(api, "POST", "/roi", b"{nao e json",
+                                {"Content-Type": "application/json"})
+    assert status == 400 and "erro" in corpo
+
+
+def test_campos_obrigatorios(api):
+    assert _requisitar(api, "POST", "/roi", {"crop": "Rice"})[0] == 400
+    assert _requisitar(api, "POST", "/leite", {"valores": [1, 2, 3]})[0] == 400
+    assert _requisitar(api, "POST", "/leite", {"valores": list(range(24)), "meses": 99})[0] == 400
+
+
+def test_content_length_malformado(api):
+    requisicao = (b"POST /deteccao HTTP/1.1\r\nHost: x\r\nContent-Type: application/octet-stream\r\n"
+                  b"Content-Length: abc\r\n\r\n")
+    assert _bruto(api, requisicao) == 400
+
+
+def test_upload_incompleto_nao_vira_job(api):
+    requisicao = (b"POST /deteccao?nome=a.mp4 HTTP/1.1\r\nHost: x\r\n"
+                  b"Content-Type: application/octet-stream\r\nContent-Length: 5000\r\n\r\n" + b"x" * 100)
+    assert _bruto(api, requisicao) == 400
+    servico = api.servico
+    assert servico.jobs.estatisticas()['pendente'] == 0
+    assert [p for p in servico.pasta_jobs.iterdir() if p.is_file()] == []
+
+
+def test_upload_acima_do_limite_recusado_antes_de_ler(api):
+    requisicao = (b"POST /deteccao HTTP/1.1\r\nHost: x\r\nContent-Type: application/octet-stream\r\n"
+                  b"Content-Length: " + str(1024 ** 2 + 1).encode() + b"\r\n\r\n")
+    assert _bruto(api, requisicao) == 413
+
+
+def test_caminho_restrito_a_pasta_de_videos(api):
+    assert _requisitar(api, "POST", "/deteccao", {"caminho": "../segredo.mp4"})[0] == 403
+    assert _requisitar(api, "POST", "/deteccao", {"caminho": "/etc/passwd"})[0] == 403
+    assert _requisitar(api, "POST", "/deteccao", {"caminho": "inexistente.mp4"})[0] == 400
+
+
+def test_caminho_desativado_sem_pasta(api):
+    api.servico.pasta_videos = None
+    assert _requisitar(api, "POST", "/deteccao", {"caminho": "rebanho.mp4"})[0] == 403
+
+
+def test_job_por_caminho_e_fila_cheia(api):
+    # Com o único detector emprestado, os jobs ficam pendentes: max_pendentes=2
+    with api.servico.jobs.pool.emprestar():
+        status, job = _requisitar(api, "POST", "/deteccao", {"caminho": "rebanho.mp4"})
+        assert status == 202
+        assert _requisitar(api, "POST", "/deteccao", {"caminho": "rebanho.mp4"})[0] == 202
+        assert _requisitar(api, "POST", "/deteccao", {"caminho": "rebanho.mp4"})[0] == 503
+
+    for _ in range(100):
+        status, estado = _requisitar(api, "GET", job['status_url'])
+        if estado['status'] in ('concluido', 'erro'):
+            break
+        time.sleep(0.05)
+    assert estado['status'] == 'concluido'
+    assert estado['resumo']['frames_processados'] == 10
+
+
+def test_rotas_desconhecidas(api):
+    assert _requisitar(api, "GET", "/nada")[0] == 404
+    assert _requisitar(api, "GET", "/deteccao/naoexiste")[0] == 404
+    assert _requisitar(api, "POST", "/produtividade", {"dados": {}})[0] == 503
+
+
+def test_lote_com_itens_invalidos_erra_so_por_item(api, tmp_path):
+    modelo = ModeloML(ler_dataset(gerar_crop_yield(tmp_path / "crop_yield.csv", linhas=500)))
+    modelo.treinar()
+    api.servico.modelo = modelo
+
+    valido = {"Region": "North", "Soil_Type": "Clay", "Crop": "Rice", "Weather_Condition": "Sunny",
+              "Rainfall_mm": 500, "Temperature_Celsius": 25, "Days_to_Harvest": 100,
+              "Fertilizer_Used": True, "Irrigation_Used": False}
+    itens = [valido, {**valido, "Rainfall_mm": "abc"}, {**valido, "Fertilizer_Used": "false"},
+             {**valido, "Crop": "Banana"}, {**valido, "Rainfall_mm": "650.5", "Irrigation_Used": 1}]
+    status, corpo = _requisitar(api, "POST", "/produtividade/lote", {"itens": itens})
+    assert status == 200 and corpo['erros'] == 3
+    ok, chuva, fertilizante, cultura, texto = corpo['resultados']
+    assert 'prediction' in ok and 'prediction' in texto
+    assert "Rainfall_mm" in chuva['error'] and "Fertilizer_Used" in fertilizante['error']
+    assert "Crop" in cultura['error']
+
+
+def test_upload_completo_vira_job(api, tmp_path):
+    video = (tmp_path / "videos" / "rebanho.mp4").read_bytes()
+    status, job = _requisitar(api, "POST", "/deteccao?nome=rebanho.mp4", video,
+                              {"Content-Type": "application/octet-stream"})
+    assert status == 202
+    for _ in range(100):
+        _, estado = _requisitar(api, "GET", job['status_url'])
+        if estado['status'] in ('concluido', 'erro'):
+            break
+        time.sleep(0.05)
+    assert estado['status'] == 'concluido' and estado['arquivo'] == 'rebanho.mp4'
+    # O vídeo enviado é apagado ao fim do job; só ficam as pastas dos jobs
+    assert [p for p in api.servico.pasta_jobs.iterdir() if p.is_file()] == []